@@ -145,7 +145,7 @@ deploy_w1_process() {
         --entry-point process_oficio_async \
         --memory 1024MB \
         --timeout 540s \
-        --set-env-vars GCP_PROJECT_ID=$PROJECT_ID,GROQ_API_KEY=$GROQ_API_KEY,MAX_RETRIES=3,LLM_PROMPT_VERSION=$LLM_VERSION \
+        --set-env-vars GCP_PROJECT_ID=$PROJECT_ID,GROQ_API_KEY=$GROQ_API_KEY,MAX_RETRIES=3,LLM_PROMPT_VERSION=$LLM_VERSION,TRACING_EXPORTER=log \
         ${SERVICE_ACCOUNT:+--service-account=$SERVICE_ACCOUNT} \
         --quiet
     
@@ -162,6 +162,9 @@ deploy_w2_monitor() {
     cd funcoes/W2_monitoramento_sla
     
     ALERT_WEBHOOK=${ALERT_WEBHOOK_URL:-""}
+    # threads: pool de organizações no processo | pubsub: um shard de organizações por mensagem
+    SLA_MODE=${SLA_MONITOR_MODE:-"threads"}
+    W2_ENV="GCP_PROJECT_ID=$PROJECT_ID,ALERT_WEBHOOK_URL=$ALERT_WEBHOOK,SLA_MONITOR_MODE=$SLA_MODE"
     
     gcloud functions deploy monitor_sla \
         --gen2 \
@@ -171,10 +174,24 @@ deploy_w2_monitor() {
         --entry-point monitor_sla \
         --memory 512MB \
         --timeout 300s \
-        --set-env-vars GCP_PROJECT_ID=$PROJECT_ID,ALERT_WEBHOOK_URL=$ALERT_WEBHOOK \
+        --set-env-vars $W2_ENV \
         ${SERVICE_ACCOUNT:+--service-account=$SERVICE_ACCOUNT} \
         --quiet
     
+    if [ "$SLA_MODE" = "pubsub" ]; then
+        gcloud functions deploy monitor_sla_shard \
+            --gen2 \
+            --runtime python311 \
+            --region $REGION \
+            --trigger-topic sla_monitor_shards \
+            --entry-point monitor_sla_shard \
+            --memory 512MB \
+            --timeout 300s \
+            --set-env-vars $W2_ENV \
+            ${SERVICE_ACCOUNT:+--service-account=$SERVICE_ACCOUNT} \
+            --quiet
+    fi
+    
     cd ../..
     
     log_info "✅ W2_monitoramento_sla deployed"
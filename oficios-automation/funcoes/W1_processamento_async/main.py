@@ -7,9 +7,8 @@ import base64
 import json
 import logging
 import os
-import re
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from google.cloud import pubsub_v1, storage, vision
 from dateutil import parser as date_parser
@@ -18,8 +17,14 @@ from dateutil import parser as date_parser
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 
-from utils.api_clients import FirestoreClient, GroqClient
+from utils.api_clients import FirestoreClient, GroqClient, OficioUnitOfWork, RawTextStorageClient
+from utils.llm_cache import LLMExtractionCache, extraction_cache_key
+from utils.ocr_cache import OCRCache, cache_key_from_blob, cache_key_from_content
+from utils.ocr_engine import MIME_PDF, VisionOCREngine, mime_type_for_path
+from utils.pdf_text import METODO_OCR, METODO_TEXT_LAYER, classificar_paginas, extrair_paginas_pdf, is_pdf
 from utils.schema import OficioData, OficioStatus, TipoResposta
+from utils.text_compaction import SEPARADOR_PAGINAS
+from utils.tracing import Rastro, anotar, span, traced
 from utils.validation import validate_document_fields
 
 # Configuração de logging
@@ -31,6 +36,13 @@ PROJECT_ID = os.getenv('GCP_PROJECT_ID')
 DLQ_TOPIC = os.getenv('PUBSUB_TOPIC_DLQ', 'oficios_dlq')
 MAX_RETRIES = int(os.getenv('MAX_RETRIES', '3'))
 
+# PDFs nativos: usa a camada de texto e envia ao OCR apenas as páginas sem texto utilizável
+PDF_TEXT_LAYER_ENABLED = os.getenv('PDF_TEXT_LAYER_ENABLED', 'true').lower() == 'true'
+# Cache de extração de texto no bucket restrito de raw_text (chave = hash do conteúdo)
+OCR_CACHE_ENABLED = os.getenv('OCR_CACHE_ENABLED', 'true').lower() == 'true'
+# Cache da extração estruturada (texto + versão do prompt + schema + modelo)
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+
 # Versão do prompt LLM para auditabilidade
 LLM_CURRENT_PROMPT_VERSION = os.getenv('LLM_PROMPT_VERSION', 'v1.1_RAG_Initial')
 
@@ -40,125 +52,15 @@ groq_client = GroqClient()
 vision_client = vision.ImageAnnotatorClient()
 storage_client = storage.Client(project=PROJECT_ID)
 pubsub_publisher = pubsub_v1.PublisherClient()
-
-
-def validar_cpf(cpf: str) -> bool:
-    """
-    Valida um CPF brasileiro.
-    
-    Args:
-        cpf: String com o CPF (com ou sem formatação)
-        
-    Returns:
-        True se CPF válido
-    """
-    # Remove caracteres não numéricos
-    cpf = re.sub(r'[^0-9]', '', cpf)
-    
-    # Verifica se tem 11 dígitos
-    if len(cpf) != 11:
-        return False
-    
-    # Verifica se todos os dígitos são iguais
-    if cpf == cpf[0] * 11:
-        return False
-    
-    # Valida primeiro dígito verificador
-    soma = sum(int(cpf[i]) * (10 - i) for i in range(9))
-    digito1 = (soma * 10 % 11) % 10
-    
-    if int(cpf[9]) != digito1:
-        return False
-    
-    # Valida segundo dígito verificador
-    soma = sum(int(cpf[i]) * (11 - i) for i in range(10))
-    digito2 = (soma * 10 % 11) % 10
-    
-    if int(cpf[10]) != digito2:
-        return False
-    
-    return True
-
-
-def validar_cnpj(cnpj: str) -> bool:
-    """
-    Valida um CNPJ brasileiro.
-    
-    Args:
-        cnpj: String com o CNPJ (com ou sem formatação)
-        
-    Returns:
-        True se CNPJ válido
-    """
-    # Remove caracteres não numéricos
-    cnpj = re.sub(r'[^0-9]', '', cnpj)
-    
-    # Verifica se tem 14 dígitos
-    if len(cnpj) != 14:
-        return False
-    
-    # Verifica se todos os dígitos são iguais
-    if cnpj == cnpj[0] * 14:
-        return False
-    
-    # Valida primeiro dígito verificador
-    peso = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-    soma = sum(int(cnpj[i]) * peso[i] for i in range(12))
-    digito1 = (soma % 11)
-    digito1 = 0 if digito1 < 2 else 11 - digito1
-    
-    if int(cnpj[12]) != digito1:
-        return False
-    
-    # Valida segundo dígito verificador
-    peso = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-    soma = sum(int(cnpj[i]) * peso[i] for i in range(13))
-    digito2 = (soma % 11)
-    digito2 = 0 if digito2 < 2 else 11 - digito2
-    
-    if int(cnpj[13]) != digito2:
-        return False
-    
-    return True
-
-
-def validar_documentos_no_texto(texto: str) -> Dict[str, list]:
-    """
-    Encontra e valida CPFs e CNPJs no texto.
-    
-    Args:
-        texto: Texto a ser analisado
-        
-    Returns:
-        Dicionário com listas de documentos válidos e inválidos
-    """
-    # Padrões regex
-    cpf_pattern = r'\b\d{3}[\.\s]?\d{3}[\.\s]?\d{3}[\-\.\s]?\d{2}\b'
-    cnpj_pattern = r'\b\d{2}[\.\s]?\d{3}[\.\s]?\d{3}[\-\/\.\s]?\d{4}[\-\.\s]?\d{2}\b'
-    
-    cpfs_encontrados = re.findall(cpf_pattern, texto)
-    cnpjs_encontrados = re.findall(cnpj_pattern, texto)
-    
-    resultado = {
-        'cpfs_validos': [],
-        'cpfs_invalidos': [],
-        'cnpjs_validos': [],
-        'cnpjs_invalidos': []
-    }
-    
-    for cpf in cpfs_encontrados:
-        if validar_cpf(cpf):
-            resultado['cpfs_validos'].append(cpf)
-        else:
-            resultado['cpfs_invalidos'].append(cpf)
-    
-    for cnpj in cnpjs_encontrados:
-        if validar_cnpj(cnpj):
-            resultado['cnpjs_validos'].append(cnpj)
-        else:
-            resultado['cnpjs_invalidos'].append(cnpj)
-    
-    return resultado
+raw_text_storage = RawTextStorageClient(PROJECT_ID)
+ocr_cache = OCRCache(raw_text_storage) if OCR_CACHE_ENABLED else None
+llm_cache = LLMExtractionCache(firestore_client.db) if LLM_CACHE_ENABLED else None
+# OCR paralelo por página; a saída do OCR assíncrono fica no bucket restrito
+ocr_engine = VisionOCREngine(
+    vision_client,
+    storage_client,
+    output_bucket=os.getenv('OCR_OUTPUT_BUCKET', raw_text_storage.bucket_name)
+)
 
 
 def calcular_prioridade_legacy(prazo_dias: int, tipo_resposta: TipoResposta) -> str:
@@ -192,21 +94,45 @@ def calcular_prioridade_legacy(prazo_dias: int, tipo_resposta: TipoResposta) ->
         return 'BAIXA'
 
 
-def realizar_ocr(bucket: str, file_path: str) -> str:
+def _confianca_paginas(full_text_annotation: Any) -> List[Optional[float]]:
+    """Confiança média reportada pela Vision para cada página da anotação."""
+    if not full_text_annotation:
+        return []
+    
+    return [round(float(page.confidence), 4) for page in full_text_annotation.pages]
+
+
+@traced('w1.realizar_ocr')
+def realizar_ocr(bucket: str, file_path: str, deadline: Optional[float] = None) -> Dict[str, Any]:
     """
     Realiza OCR em um arquivo usando Google Cloud Vision.
     
+    PDFs e TIFFs multipágina usam o OCR assíncrono por arquivo (páginas em
+    paralelo); imagens simples usam document_text_detection.
+    
     Args:
         bucket: Nome do bucket GCS
         file_path: Caminho do arquivo no bucket
+        deadline: Prazo do documento (time.monotonic) para o OCR
         
     Returns:
-        Texto extraído
+        Dicionário com texto e confianca de cada página
     """
     logger.info(f"Realizando OCR em gs://{bucket}/{file_path}")
     
     # Construir URI do GCS
     gcs_uri = f"gs://{bucket}/{file_path}"
+    mime_type = mime_type_for_path(file_path)
+    
+    if mime_type:
+        paginas = list(ocr_engine.ocr_file(gcs_uri, mime_type, deadline=deadline))
+        # Form feed entre páginas: a compactação identifica cabeçalhos/rodapés por página
+        texto = SEPARADOR_PAGINAS.join(pagina['texto'].strip() for pagina in paginas)
+        
+        logger.info(f"OCR concluído. Texto extraído: {len(texto)} caracteres em {len(paginas)} páginas")
+        anotar(caracteres=len(texto), paginas=len(paginas))
+        
+        return {'texto': texto, 'confianca': [pagina['confianca'] for pagina in paginas]}
     
     # Prepara o request para a API Vision
     image = vision.Image()
@@ -222,8 +148,181 @@ def realizar_ocr(bucket: str, file_path: str) -> str:
     texto = response.full_text_annotation.text if response.full_text_annotation else ""
     
     logger.info(f"OCR concluído. Texto extraído: {len(texto)} caracteres")
+    anotar(caracteres=len(texto), paginas=1)
+    
+    return {'texto': texto, 'confianca': _confianca_paginas(response.full_text_annotation)}
+
+
+def extrair_texto_documento(org_id: str, bucket: str, file_path: str) -> Dict[str, Any]:
+    """
+    Extrai o texto do documento pelo caminho mais barato disponível.
+    
+    Consulta antes o cache de OCR (hash do conteúdo nos metadados do GCS).
+    PDFs nativos usam a camada de texto embutida; páginas sem camada de
+    texto ou com score de densidade baixo (digitalizadas) vão para OCR.
+    Demais arquivos (imagens) vão inteiros para OCR.
+    
+    Args:
+        org_id: ID da organização (isolamento do cache)
+        bucket: Nome do bucket GCS
+        file_path: Caminho do arquivo no bucket
+        
+    Returns:
+        Dicionário com texto e extracao_texto (método, caminho e confiança de cada página)
+    """
+    chave_cache = None
+    
+    if ocr_cache is not None:
+        chave_cache = cache_key_from_blob(storage_client.bucket(bucket).get_blob(file_path))
+        cached = ocr_cache.get(org_id, chave_cache)
+        
+        if cached is not None:
+            logger.info(f"Texto obtido do cache de OCR ({chave_cache}): {ocr_cache.stats()}")
+            cached['extracao_texto']['cache_hit'] = True
+            return cached
+    
+    resultado = _extrair_texto_sem_cache(bucket, file_path)
+    
+    if ocr_cache is not None:
+        chave_cache = chave_cache or resultado.pop('chave_conteudo', None)
+        ocr_cache.put(org_id, chave_cache, resultado, source=f"gs://{bucket}/{file_path}")
+        logger.info(f"Cache de OCR: {ocr_cache.stats()}")
+    
+    resultado.pop('chave_conteudo', None)
+    resultado['extracao_texto']['cache_hit'] = False
+    
+    return resultado
+
+
+def _extrair_texto_sem_cache(bucket: str, file_path: str) -> Dict[str, Any]:
+    """
+    Extrai o texto do documento (camada de texto do PDF e/ou OCR).
+    
+    Args:
+        bucket: Nome do bucket GCS
+        file_path: Caminho do arquivo no bucket
+        
+    Returns:
+        Dicionário com texto, extracao_texto e chave_conteudo (sha256, se o arquivo foi baixado)
+    """
+    textos: List[str] = []
+    chave_conteudo = None
+    deadline = ocr_engine.deadline()
+    
+    if PDF_TEXT_LAYER_ENABLED and file_path.lower().endswith('.pdf'):
+        data = storage_client.bucket(bucket).blob(file_path).download_as_bytes()
+        chave_conteudo = cache_key_from_content(data)
+        if is_pdf(data):
+            textos = extrair_paginas_pdf(data)
+    
+    if not textos:
+        ocr = realizar_ocr(bucket, file_path, deadline=deadline)
+        paginas = [
+            {'pagina': numero, 'metodo': METODO_OCR, 'confianca': confianca}
+            for numero, confianca in enumerate(ocr['confianca'], start=1)
+        ]
+        return {
+            'texto': ocr['texto'],
+            'extracao_texto': {
+                'metodo': METODO_OCR,
+                'paginas_text_layer': 0,
+                'paginas_ocr': max(len(paginas), 1),
+                'paginas': paginas
+            },
+            'chave_conteudo': chave_conteudo
+        }
+    
+    paginas = classificar_paginas(textos)
+    paginas_ocr = [p['pagina'] for p in paginas if p['metodo'] == METODO_OCR]
+    
+    if paginas_ocr:
+        logger.info(f"OCR necessário em {len(paginas_ocr)}/{len(paginas)} páginas: {paginas_ocr}")
+        gcs_uri = f"gs://{bucket}/{file_path}"
+        for ocr in ocr_engine.ocr_pages(gcs_uri, MIME_PDF, paginas_ocr, deadline=deadline):
+            textos[ocr['pagina'] - 1] = ocr['texto']
+            paginas[ocr['pagina'] - 1]['confianca'] = ocr['confianca']
+    
+    num_text_layer = len(paginas) - len(paginas_ocr)
+    if not paginas_ocr:
+        metodo = METODO_TEXT_LAYER
+    elif num_text_layer == 0:
+        metodo = METODO_OCR
+    else:
+        metodo = 'misto'
+    
+    texto = SEPARADOR_PAGINAS.join(t.strip() for t in textos)
+    
+    logger.info(
+        f"Texto extraído ({metodo}): {len(texto)} caracteres, "
+        f"{num_text_layer} páginas pela camada de texto, {len(paginas_ocr)} por OCR"
+    )
+    
+    return {
+        'texto': texto,
+        'extracao_texto': {
+            'metodo': metodo,
+            'paginas_text_layer': num_text_layer,
+            'paginas_ocr': len(paginas_ocr),
+            'paginas': paginas
+        },
+        'chave_conteudo': chave_conteudo
+    }
+
+
+def extrair_dados_estruturados(
+    org_id: str,
+    texto: str,
+    system_prompt: str,
+    llm_version: str,
+    bypass_cache: bool = False
+) -> Tuple[OficioData, bool]:
+    """
+    Extrai os dados estruturados via LLM, reaproveitando extrações idênticas.
+    
+    A chave do cache combina sha256 do texto, versão do prompt, prompt de
+    sistema, hash do schema OficioData, modelo e a versão/orçamento da
+    compactação aplicada antes do LLM. Com bypass_cache o LLM é
+    chamado e o resultado novo substitui a entrada do cache.
+    
+    Args:
+        org_id: ID da organização
+        texto: Texto extraído do documento
+        system_prompt: Prompt de sistema
+        llm_version: Versão do prompt LLM
+        bypass_cache: Ignora o resultado em cache (simulações que pedem execução nova)
+        
+    Returns:
+        Tupla (dados extraídos, True se vieram do cache)
+    """
+    chave_cache = None
+    
+    if llm_cache is not None:
+        chave_cache = extraction_cache_key(
+            org_id, texto, llm_version, OficioData, groq_client.model, system_prompt
+        )
+        
+        if not bypass_cache:
+            cached = llm_cache.get(org_id, chave_cache, OficioData)
+            
+            if cached is not None:
+                logger.info(f"Extração obtida do cache ({chave_cache[:12]}): {llm_cache.stats()}")
+                return cached, True
+    
+    dados_extraidos = groq_client.extract_structured_data(
+        text_content=texto,
+        org_id=org_id,
+        pydantic_schema=OficioData,
+        system_prompt=system_prompt
+    )
+    
+    if llm_cache is not None:
+        llm_cache.put(org_id, chave_cache, dados_extraidos, metadata={
+            'prompt_version': llm_version,
+            'modelo': groq_client.model
+        })
+        logger.info(f"Cache de extração LLM: {llm_cache.stats()}")
     
-    return texto
+    return dados_extraidos, False
 
 
 def processar_oficio(
@@ -232,10 +331,11 @@ def processar_oficio(
     bucket: str, 
     file_path: str,
     is_simulation: bool = False,
-    llm_prompt_version_override: Optional[str] = None
+    llm_prompt_version_override: Optional[str] = None,
+    bypass_llm_cache: bool = False
 ) -> None:
     """
-    Processa um ofício: OCR, extração estruturada, validações.
+    Processa um ofício: extração de texto (camada do PDF ou OCR), extração estruturada, validações.
     
     Args:
         oficio_id: ID do ofício
@@ -244,41 +344,145 @@ def processar_oficio(
         file_path: Caminho do arquivo
         is_simulation: Se True, marca logs como [SIMULATION]
         llm_prompt_version_override: Versão específica do prompt (para testes)
+        bypass_llm_cache: Se True, chama o LLM mesmo com extração em cache
     """
     log_prefix = "[SIMULATION] " if is_simulation else ""
     logger.info(f"{log_prefix}Processando ofício {oficio_id} (org: {org_id})")
+    io_inicio = firestore_client.io_stats()
     
-    # 1. Atualiza status para EM_PROCESSAMENTO
+    # Duração, tamanhos e tokens de cada etapa (logs/OpenTelemetry e metricas_processamento)
+    rastro = Rastro(oficio_id=oficio_id, org_id=org_id)
+    
+    with rastro.ativo():
+        # 1. Atualiza status para EM_PROCESSAMENTO
+        iniciar_processamento(org_id, oficio_id)
+        
+        # Etapas seguintes são gravadas juntas (uma leitura de verificação + uma escrita)
+        with firestore_client.unit_of_work(org_id, oficio_id, user_id='system') as uow:
+            _executar_etapas(
+                uow, oficio_id, org_id, bucket, file_path,
+                is_simulation, llm_prompt_version_override, bypass_llm_cache
+            )
+            uow.update({'metricas_processamento': rastro.resumo()})
+    
+    io_fim = firestore_client.io_stats()
+    logger.info(f"{log_prefix}Firestore: {io_fim['reads'] - io_inicio['reads']} leituras, "
+                f"{io_fim['writes'] - io_inicio['writes']} escritas")
+    logger.info(f"{log_prefix}Métricas do processamento: {json.dumps(rastro.resumo(), ensure_ascii=False)}")
+
+
+def iniciar_processamento(org_id: str, oficio_id: str) -> None:
+    """
+    Marca o ofício como EM_PROCESSAMENTO.
+    
+    Args:
+        org_id: ID da organização
+        oficio_id: ID do ofício
+    """
     firestore_client.update_oficio(
         org_id,
         oficio_id,
         {'status': OficioStatus.EM_PROCESSAMENTO.value},
         user_id='system'
     )
+
+
+def _executar_etapas(
+    uow: OficioUnitOfWork,
+    oficio_id: str,
+    org_id: str,
+    bucket: str,
+    file_path: str,
+    is_simulation: bool,
+    llm_prompt_version_override: Optional[str],
+    bypass_llm_cache: bool = False
+) -> None:
+    """
+    Executa extração de texto, extração estruturada e validações,
+    acumulando as atualizações do ofício na unidade de trabalho.
     
-    # 2. Realiza OCR do documento
+    Args:
+        uow: Unidade de trabalho do ofício
+        oficio_id: ID do ofício
+        org_id: ID da organização
+        bucket: Bucket do arquivo
+        file_path: Caminho do arquivo
+        is_simulation: Se True, marca logs como [SIMULATION]
+        llm_prompt_version_override: Versão específica do prompt (para testes)
+        bypass_llm_cache: Se True, chama o LLM mesmo com extração em cache
+    """
+    texto_extraido = etapa_texto(uow, org_id, bucket, file_path)
+    
+    etapa_extracao(
+        uow, oficio_id, org_id, texto_extraido,
+        is_simulation, llm_prompt_version_override, bypass_llm_cache
+    )
+
+
+def etapa_texto(uow: OficioUnitOfWork, org_id: str, bucket: str, file_path: str) -> str:
+    """
+    Etapa de extração de texto (camada de texto do PDF ou OCR).
+    
+    Args:
+        uow: Unidade de trabalho do ofício
+        org_id: ID da organização
+        bucket: Bucket do arquivo
+        file_path: Caminho do arquivo
+        
+    Returns:
+        Texto extraído
+    """
+    # 2. Extrai o texto do documento (camada de texto do PDF ou OCR)
     try:
-        texto_extraido = realizar_ocr(bucket, file_path)
+        with span('w1.extracao_texto', arquivo=file_path) as etapa:
+            extracao = extrair_texto_documento(org_id, bucket, file_path)
+            etapa.set(
+                metodo=extracao['extracao_texto']['metodo'],
+                caracteres=len(extracao['texto']),
+                paginas_ocr=extracao['extracao_texto']['paginas_ocr'],
+                paginas_text_layer=extracao['extracao_texto']['paginas_text_layer'],
+                cache_hit=extracao['extracao_texto'].get('cache_hit', False)
+            )
+        texto_extraido = extracao['texto']
         
-        # Salva o texto bruto no Firestore
-        firestore_client.update_oficio(
-            org_id,
-            oficio_id,
-            {'conteudo_bruto': texto_extraido},
-            user_id='system'
-        )
+        # Texto bruto e caminho de extração de cada página (gravados junto com as demais etapas)
+        uow.update({'conteudo_bruto': texto_extraido, 'extracao_texto': extracao['extracao_texto']})
     except Exception as e:
         logger.error(f"Erro no OCR: {e}")
         raise
     
+    return texto_extraido
+
+
+def etapa_extracao(
+    uow: OficioUnitOfWork,
+    oficio_id: str,
+    org_id: str,
+    texto_extraido: str,
+    is_simulation: bool,
+    llm_prompt_version_override: Optional[str],
+    bypass_llm_cache: bool = False
+) -> None:
+    """
+    Etapa de extração estruturada via LLM e validações.
+    
+    Args:
+        uow: Unidade de trabalho do ofício
+        oficio_id: ID do ofício
+        org_id: ID da organização
+        texto_extraido: Texto da etapa anterior
+        is_simulation: Se True, marca logs como [SIMULATION]
+        llm_prompt_version_override: Versão específica do prompt (para testes)
+        bypass_llm_cache: Se True, chama o LLM mesmo com extração em cache
+    """
+    log_prefix = "[SIMULATION] " if is_simulation else ""
+    
+    # Versão do prompt LLM (auditabilidade e chave do cache de extração)
+    llm_version = llm_prompt_version_override or LLM_CURRENT_PROMPT_VERSION
+    
     # 3. Extração estruturada via LLM (Groq) com Chain-of-Thought + Inferência de Intenção
     logger.info("Iniciando extração estruturada via LLM com inferência cognitiva")
     
-    # Obtém dados do ofício para contexto
-    oficio_bruto = firestore_client.get_oficio(org_id, oficio_id)
-    thread_id = oficio_bruto.get('thread_id', 'unknown')
-    message_id = oficio_bruto.get('message_id', 'unknown')
-    
     # Prompt customizado com inferência de intenção para RAG
     system_prompt_rag = f"""Você é um assistente especializado em análise de ofícios judiciais brasileiros.
 
@@ -311,12 +515,15 @@ Retorne APENAS o JSON final na seção de EXTRAÇÃO."""
     
     try:
         # Extrai dados estruturados usando Chain-of-Thought + Inferência
-        dados_extraidos = groq_client.extract_structured_data(
-            text_content=texto_extraido,
-            org_id=org_id,
-            pydantic_schema=OficioData,
-            system_prompt=system_prompt_rag
-        )
+        with span('w1.extracao_llm', caracteres=len(texto_extraido), prompt_version=llm_version) as etapa:
+            dados_extraidos, llm_cache_hit = extrair_dados_estruturados(
+                org_id,
+                texto_extraido,
+                system_prompt_rag,
+                llm_version,
+                bypass_cache=bypass_llm_cache
+            )
+            etapa.set(cache_hit=llm_cache_hit)
         
         logger.info(f"Dados extraídos com confiança {dados_extraidos.confianca}")
         logger.info(f"Tipo de resposta: {dados_extraidos.tipo_resposta_provavel}")
@@ -331,7 +538,9 @@ Retorne APENAS o JSON final na seção de EXTRAÇÃO."""
     # Usa a função validate_document_fields do validation.py
     logger.info("Validando documentos e calculando prioridade...")
     
-    is_valid, informacoes_adicionais = validate_document_fields(dados_extraidos)
+    with span('w1.validate_document_fields', caracteres=len(dados_extraidos.raw_text)) as etapa:
+        is_valid, informacoes_adicionais = validate_document_fields(dados_extraidos)
+        etapa.set(documentos=sum(len(docs) for docs in informacoes_adicionais['documentos_validados'].values()))
     
     if not is_valid:
         logger.error("Validação de documentos falhou")
@@ -349,12 +558,10 @@ Retorne APENAS o JSON final na seção de EXTRAÇÃO."""
     if informacoes_adicionais.get('tem_documentos_invalidos'):
         logger.warning("Atenção: Foram encontrados documentos inválidos no texto")
     
-    # 5. Determina versão do prompt LLM (para auditabilidade)
-    llm_version = llm_prompt_version_override or LLM_CURRENT_PROMPT_VERSION
-    
+    # 5. Versão do prompt LLM (para auditabilidade)
     logger.info(f"{log_prefix}Versão do prompt LLM: {llm_version}")
     
-    # 6. Atualiza o Firestore com todos os dados processados
+    # 6. Registra os dados processados (gravados pela unidade de trabalho)
     update_data = {
         'status': OficioStatus.AGUARDANDO_COMPLIANCE.value,
         'dados_extraidos': dados_extraidos.model_dump(mode='json'),
@@ -365,10 +572,11 @@ Retorne APENAS o JSON final na seção de EXTRAÇÃO."""
         'processamento_completo_em': datetime.utcnow().isoformat(),
         'confianca_extracao': dados_extraidos.confianca,
         'llm_prompt_version': llm_version,  # Auditabilidade
+        'llm_cache_hit': llm_cache_hit,
         'is_simulation': is_simulation  # Marca se é simulação
     }
     
-    firestore_client.update_oficio(org_id, oficio_id, update_data, user_id='system')
+    uow.update(update_data)
     
     logger.info(f"{log_prefix}Ofício {oficio_id} processado com sucesso!")
     logger.info(f"{log_prefix}Resumo: Prioridade={prioridade}, Tipo={dados_extraidos.tipo_resposta_provavel}, "
@@ -429,6 +637,8 @@ def handle_pubsub_message(event: Dict[str, Any], context: Any) -> None:
         event: Dados do evento Pub/Sub
         context: Contexto da execução
     """
+    message_data: Dict[str, Any] = {}
+    
     try:
         # Decodifica a mensagem Pub/Sub
         if 'data' in event:
@@ -436,35 +646,19 @@ def handle_pubsub_message(event: Dict[str, Any], context: Any) -> None:
         else:
             raise ValueError("Mensagem Pub/Sub sem campo 'data'")
         
-        oficio_id = message_data.get('oficio_id')
-        org_id = message_data.get('org_id')
-        bucket = message_data.get('bucket')
-        file_path = message_data.get('file_path')
-        is_simulation = message_data.get('is_simulation', False)
-        llm_prompt_version_override = message_data.get('llm_prompt_version_override')
-        
-        # Valida campos obrigatórios
-        if not all([oficio_id, org_id, bucket, file_path]):
-            raise ValueError(f"Mensagem com campos faltando: {message_data}")
+        parametros = parametros_da_mensagem(message_data)
         
         # Obtém o número de tentativas
         attributes = event.get('attributes', {})
         delivery_attempt = int(attributes.get('googclient.deliveryAttempt', 1))
         
-        log_prefix = "[SIMULATION] " if is_simulation else ""
+        log_prefix = "[SIMULATION] " if parametros['is_simulation'] else ""
         logger.info(f"{log_prefix}Processando mensagem (tentativa {delivery_attempt}): {message_data}")
         
         # Processa o ofício
-        processar_oficio(
-            oficio_id, 
-            org_id, 
-            bucket, 
-            file_path,
-            is_simulation=is_simulation,
-            llm_prompt_version_override=llm_prompt_version_override
-        )
+        processar_oficio(**parametros)
         
-        logger.info(f"Processamento concluído para ofício {oficio_id}")
+        logger.info(f"Processamento concluído para ofício {parametros['oficio_id']}")
         
     except Exception as e:
         logger.error(f"Erro ao processar mensagem: {e}", exc_info=True)
@@ -472,14 +666,61 @@ def handle_pubsub_message(event: Dict[str, Any], context: Any) -> None:
         # Verifica se deve enviar para DLQ
         delivery_attempt = int(event.get('attributes', {}).get('googclient.deliveryAttempt', 1))
         
-        if delivery_attempt >= MAX_RETRIES:
-            enviar_para_dlq(message_data, str(e), delivery_attempt)
-        else:
+        if not tratar_falha(message_data, str(e), delivery_attempt):
             # Re-raise para que o Pub/Sub faça retry
-            logger.info(f"Tentativa {delivery_attempt}/{MAX_RETRIES}, permitindo retry")
             raise
 
 
+def parametros_da_mensagem(message_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extrai e valida os parâmetros de processamento de uma mensagem.
+    
+    Args:
+        message_data: Payload JSON da mensagem
+        
+    Returns:
+        Argumentos de processar_oficio
+        
+    Raises:
+        ValueError: Se faltarem campos obrigatórios
+    """
+    parametros = {
+        'oficio_id': message_data.get('oficio_id'),
+        'org_id': message_data.get('org_id'),
+        'bucket': message_data.get('bucket'),
+        'file_path': message_data.get('file_path'),
+        'is_simulation': message_data.get('is_simulation', False),
+        'llm_prompt_version_override': message_data.get('llm_prompt_version_override'),
+        'bypass_llm_cache': message_data.get('bypass_llm_cache', False)
+    }
+    
+    # Valida campos obrigatórios
+    if not all([parametros['oficio_id'], parametros['org_id'], parametros['bucket'], parametros['file_path']]):
+        raise ValueError(f"Mensagem com campos faltando: {message_data}")
+    
+    return parametros
+
+
+def tratar_falha(message_data: Dict[str, Any], error: str, delivery_attempt: int) -> bool:
+    """
+    Decide entre DLQ e nova tentativa após uma falha.
+    
+    Args:
+        message_data: Payload da mensagem
+        error: Descrição do erro
+        delivery_attempt: Tentativa atual (1-based)
+        
+    Returns:
+        True se a mensagem foi para a DLQ (não deve ser reentregue)
+    """
+    if delivery_attempt >= MAX_RETRIES:
+        enviar_para_dlq(message_data, error, delivery_attempt)
+        return True
+    
+    logger.info(f"Tentativa {delivery_attempt}/{MAX_RETRIES}, permitindo retry")
+    return False
+
+
 # Entry point para Cloud Functions
 def process_oficio_async(event, context):
     """Entry point para Cloud Function (Pub/Sub Trigger)"""
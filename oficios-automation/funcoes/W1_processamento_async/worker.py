@@ -0,0 +1,266 @@
+"""
+W1 Worker: Processamento contínuo via Streaming Pull
+Processo de longa duração (container ao lado do backend) que consome a
+assinatura de processamento em lote, em vez de uma invocação por mensagem.
+
+Cada mensagem passa por três estágios com pools limitados:
+  OCR (extração de texto) → LLM (extração estruturada e validações) → escrita (Firestore)
+
+O controle de fluxo limita as mensagens em andamento; o cliente Pub/Sub
+estende o prazo de ack delas enquanto são processadas, e cada mensagem é
+confirmada (ack) individualmente ao final da escrita.
+
+Uso:
+    python worker.py
+"""
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+from google.cloud import pubsub_v1
+from google.cloud.pubsub_v1.subscriber.scheduler import ThreadScheduler
+
+import main as w1
+# utils/ entra no path pelo main
+from utils.tracing import Rastro
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+SUBSCRIPTION = os.getenv('PUBSUB_SUBSCRIPTION_PROCESSAMENTO', 'oficios_para_processamento-worker')
+# Mensagens em andamento (recebidas e ainda não confirmadas)
+WORKER_MAX_MESSAGES = int(os.getenv('W1_WORKER_MAX_MESSAGES', '32'))
+WORKER_OCR_WORKERS = int(os.getenv('W1_WORKER_OCR_WORKERS', '8'))
+WORKER_LLM_WORKERS = int(os.getenv('W1_WORKER_LLM_WORKERS', '8'))
+WORKER_WRITER_WORKERS = int(os.getenv('W1_WORKER_WRITER_WORKERS', '4'))
+# Tempo máximo que o prazo de ack de uma mensagem é estendido
+WORKER_MAX_LEASE_SECONDS = int(os.getenv('W1_WORKER_MAX_LEASE_SECONDS', '900'))
+# Tempo para concluir as mensagens em andamento ao receber SIGTERM
+WORKER_SHUTDOWN_SECONDS = int(os.getenv('W1_WORKER_SHUTDOWN_SECONDS', '60'))
+WORKER_STATS_INTERVAL_SECONDS = int(os.getenv('W1_WORKER_STATS_INTERVAL_SECONDS', '60'))
+
+
+class W1Worker:
+    """Consumidor Streaming Pull com estágios OCR → LLM → escrita em pools limitados."""
+
+    def __init__(
+        self,
+        subscriber: Any,
+        subscription_path: str,
+        max_messages: int = WORKER_MAX_MESSAGES,
+        ocr_workers: int = WORKER_OCR_WORKERS,
+        llm_workers: int = WORKER_LLM_WORKERS,
+        writer_workers: int = WORKER_WRITER_WORKERS,
+        max_lease_seconds: int = WORKER_MAX_LEASE_SECONDS
+    ):
+        """
+        Inicializa o worker.
+
+        Args:
+            subscriber: pubsub_v1.SubscriberClient
+            subscription_path: Caminho completo da assinatura
+            max_messages: Mensagens em andamento (controle de fluxo)
+            ocr_workers: Documentos em extração de texto simultânea
+            llm_workers: Chamadas simultâneas ao LLM
+            writer_workers: Escritas simultâneas no Firestore
+            max_lease_seconds: Extensão máxima do prazo de ack por mensagem
+        """
+        self.subscriber = subscriber
+        self.subscription_path = subscription_path
+        self.max_messages = max_messages
+        self.max_lease_seconds = max_lease_seconds
+
+        self.ocr_pool = ThreadPoolExecutor(max_workers=ocr_workers, thread_name_prefix='w1-ocr')
+        self.llm_pool = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix='w1-llm')
+        self.writer_pool = ThreadPoolExecutor(max_workers=writer_workers, thread_name_prefix='w1-writer')
+
+        self._lock = threading.Lock()
+        self._em_andamento = 0
+        self._parando = threading.Event()
+        self.stats = Counter()
+
+    def _on_message(self, message: Any) -> None:
+        """Callback do Streaming Pull: apenas valida e enfileira no estágio de OCR."""
+        if self._parando.is_set():
+            message.nack()
+            return
+
+        with self._lock:
+            self._em_andamento += 1
+
+        job: Dict[str, Any] = {'message': message, 'message_data': {}, 'inicio': time.monotonic()}
+
+        try:
+            job['message_data'] = json.loads(message.data.decode('utf-8'))
+            job['parametros'] = w1.parametros_da_mensagem(job['message_data'])
+            job['rastro'] = Rastro(oficio_id=job['parametros']['oficio_id'], org_id=job['parametros']['org_id'])
+        except Exception as e:
+            self._falha(job, e)
+            return
+
+        self.ocr_pool.submit(self._etapa_ocr, job)
+
+    def _etapa_ocr(self, job: Dict[str, Any]) -> None:
+        parametros = job['parametros']
+
+        try:
+            with job['rastro'].ativo():
+                w1.iniciar_processamento(parametros['org_id'], parametros['oficio_id'])
+
+                job['uow'] = w1.firestore_client.unit_of_work(
+                    parametros['org_id'], parametros['oficio_id'], user_id='system'
+                )
+                job['texto'] = w1.etapa_texto(
+                    job['uow'], parametros['org_id'], parametros['bucket'], parametros['file_path']
+                )
+        except Exception as e:
+            self._falha(job, e)
+            return
+
+        self.llm_pool.submit(self._etapa_llm, job)
+
+    def _etapa_llm(self, job: Dict[str, Any]) -> None:
+        parametros = job['parametros']
+
+        try:
+            with job['rastro'].ativo():
+                w1.etapa_extracao(
+                    job['uow'],
+                    parametros['oficio_id'],
+                    parametros['org_id'],
+                    job['texto'],
+                    parametros['is_simulation'],
+                    parametros['llm_prompt_version_override'],
+                    parametros['bypass_llm_cache']
+                )
+        except Exception as e:
+            self._falha(job, e)
+            return
+
+        self.writer_pool.submit(self._etapa_escrita, job)
+
+    def _etapa_escrita(self, job: Dict[str, Any]) -> None:
+        try:
+            with job['rastro'].ativo():
+                # Inclui o tempo de espera nas filas dos estágios (duracao_total_ms)
+                job['uow'].update({'metricas_processamento': job['rastro'].resumo()})
+                job['uow'].commit()
+        except Exception as e:
+            self._falha(job, e)
+            return
+
+        job['message'].ack()
+        logger.info(
+            f"Ofício {job['parametros']['oficio_id']} processado em "
+            f"{time.monotonic() - job['inicio']:.1f}s: {json.dumps(job['rastro'].resumo(), ensure_ascii=False)}"
+        )
+        self._concluir('processadas')
+
+    def _falha(self, job: Dict[str, Any], erro: Exception) -> None:
+        """Grava as etapas concluídas e decide entre DLQ (ack) e nova entrega (nack)."""
+        message = job['message']
+        logger.error(f"Erro ao processar mensagem {message.message_id}: {erro}", exc_info=erro)
+
+        # Como o context manager da unidade de trabalho: etapas concluídas são gravadas
+        uow = job.get('uow')
+        if uow is not None:
+            try:
+                uow.commit()
+            except Exception as commit_error:
+                logger.error(f"Falha ao gravar etapas pendentes: {commit_error}")
+
+        try:
+            if w1.tratar_falha(job['message_data'], str(erro), message.delivery_attempt or 1):
+                message.ack()
+            else:
+                message.nack()
+        except Exception as e:
+            logger.error(f"Falha ao tratar erro da mensagem {message.message_id}: {e}")
+            message.nack()
+
+        self._concluir('falhas')
+
+    def _concluir(self, resultado: str) -> None:
+        with self._lock:
+            self._em_andamento -= 1
+            self.stats[resultado] += 1
+
+    def em_andamento(self) -> int:
+        """Mensagens recebidas e ainda não confirmadas."""
+        with self._lock:
+            return self._em_andamento
+
+    def parar(self, *_args) -> None:
+        """Para de aceitar mensagens (as novas recebem nack)."""
+        logger.info("Encerrando worker: aguardando mensagens em andamento")
+        self._parando.set()
+
+    def executar(self, shutdown_seconds: int = WORKER_SHUTDOWN_SECONDS) -> None:
+        """
+        Consome a assinatura até receber SIGTERM/SIGINT.
+
+        Args:
+            shutdown_seconds: Tempo para concluir as mensagens em andamento ao encerrar
+        """
+        flow_control = pubsub_v1.types.FlowControl(
+            max_messages=self.max_messages,
+            max_lease_duration=self.max_lease_seconds
+        )
+        # O callback só enfileira; o trabalho pesado roda nos pools dos estágios
+        scheduler = ThreadScheduler(executor=ThreadPoolExecutor(max_workers=2, thread_name_prefix='w1-pull'))
+
+        streaming_pull = self.subscriber.subscribe(
+            self.subscription_path,
+            callback=self._on_message,
+            flow_control=flow_control,
+            scheduler=scheduler
+        )
+
+        signal.signal(signal.SIGTERM, self.parar)
+        signal.signal(signal.SIGINT, self.parar)
+
+        logger.info(f"Worker W1 consumindo {self.subscription_path} (até {self.max_messages} mensagens em andamento)")
+
+        try:
+            while not self._parando.wait(WORKER_STATS_INTERVAL_SECONDS):
+                if streaming_pull.done():
+                    # Erro não recuperável do stream: encerra para o container reiniciar
+                    streaming_pull.result()
+                    raise RuntimeError("Streaming pull encerrado inesperadamente")
+
+                logger.info(f"Worker W1: {self.em_andamento()} em andamento, {dict(self.stats)}")
+
+            prazo = time.monotonic() + shutdown_seconds
+            while self.em_andamento() > 0 and time.monotonic() < prazo:
+                time.sleep(0.5)
+        finally:
+            streaming_pull.cancel()
+            try:
+                streaming_pull.result(timeout=30)
+            except Exception:
+                pass
+
+            for pool in (self.ocr_pool, self.llm_pool, self.writer_pool):
+                pool.shutdown(wait=False, cancel_futures=True)
+
+            self.subscriber.close()
+
+        logger.info(f"Worker W1 encerrado: {dict(self.stats)}, {self.em_andamento()} sem ack (serão reentregues)")
+
+
+def main():
+    """Inicia o worker"""
+    subscriber = pubsub_v1.SubscriberClient()
+    subscription_path = subscriber.subscription_path(w1.PROJECT_ID, SUBSCRIPTION)
+
+    W1Worker(subscriber, subscription_path).executar()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,19 +3,26 @@ W2: Monitoramento de SLA - Alertas Inteligentes
 Cloud Function acionada por Cloud Scheduler (Cron) para monitorar prazos.
 Responsabilidades: Verificar ofícios próximos do vencimento, enviar alertas direcionados.
 """
+import base64
 import json
 import logging
 import os
+import random
 import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from datetime import datetime, timedelta
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from google.cloud import firestore
 
 # Importa os utilitários
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 
-from utils.api_clients import FirestoreClient
+from utils.alert_delivery import ALERT_OUTBOX_REPLAY_BUDGET_SECONDS, AlertOutbox, WebhookDelivery
+from utils.api_clients import FirestoreClient, PubSubClient
 from utils.schema import OficioStatus
 
 # Configuração de logging
@@ -25,11 +32,71 @@ logger = logging.getLogger(__name__)
 # Configurações
 PROJECT_ID = os.getenv('GCP_PROJECT_ID')
 ALERT_WEBHOOK_URL = os.getenv('ALERT_WEBHOOK_URL', '')  # Slack/Teams webhook
+# Horizonte de alerta: ofícios com prazo além dele são OK (classificar_urgencia)
+SLA_ALERT_HORIZON_HOURS = float(os.getenv('SLA_ALERT_HORIZON_HOURS', '72'))
+SLA_SCAN_PAGE_SIZE = int(os.getenv('SLA_SCAN_PAGE_SIZE', '200'))
+
+# Execução entre organizações: threads (pool no processo) ou pubsub (uma mensagem por shard)
+SLA_MONITOR_MODE = os.getenv('SLA_MONITOR_MODE', 'threads').lower()
+SLA_MAX_WORKERS = int(os.getenv('SLA_MAX_WORKERS', '8'))
+SLA_SHARD_SIZE = int(os.getenv('SLA_SHARD_SIZE', '25'))
+SLA_SHARD_TOPIC = os.getenv('PUBSUB_TOPIC_SLA_SHARDS', 'sla_monitor_shards')
+# Orçamento por organização: um tenant grande não atrasa os demais
+SLA_ORG_BUDGET_SECONDS = float(os.getenv('SLA_ORG_BUDGET_SECONDS', '60'))
+# Orçamento da invocação (abaixo do --timeout de 300s): deixa tempo para gravar sla_runs
+SLA_RUN_BUDGET_SECONDS = float(os.getenv('SLA_RUN_BUDGET_SECONDS', '240'))
+# Tempo de envio dos digests após o orçamento da organização (o que não sair vai para o outbox)
+SLA_DELIVERY_GRACE_SECONDS = float(os.getenv('SLA_DELIVERY_GRACE_SECONDS', '10'))
+SLA_RUNS_COLLECTION = 'sla_runs'
+
+# Usuários buscados com get_all em lotes; cache compartilhado entre invocações quentes (0 = só na execução)
+SLA_USER_BATCH_SIZE = int(os.getenv('SLA_USER_BATCH_SIZE', '100'))
+SLA_USER_CACHE_TTL_SECONDS = float(os.getenv('SLA_USER_CACHE_TTL_SECONDS', '300'))
+CAMPOS_USUARIO = ['email', 'name', 'notification_enabled']
+
+# Mesma urgência não é realertada antes do cooldown; aumento de urgência alerta na hora
+SLA_ALERT_COOLDOWN_HOURS = float(os.getenv('SLA_ALERT_COOLDOWN_HOURS', '24'))
+FIRESTORE_MAX_BATCH_WRITES = 500
+
+# Ordem de gravidade (escalonamento = transição para um nível maior)
+NIVEL_URGENCIA = {'OK': 0, 'ATENCAO': 1, 'URGENTE': 2, 'CRITICO': 3, 'VENCIDO': 4}
+EMOJI_URGENCIA = {
+    'VENCIDO': '🔴',
+    'CRITICO': '⚠️',
+    'URGENTE': '🟠',
+    'ATENCAO': '🟡',
+    'OK': '🟢'
+}
+
+# Status que requerem monitoramento
+STATUS_MONITORADOS = [
+    OficioStatus.AGUARDANDO_COMPLIANCE.value,
+    OficioStatus.EM_ANALISE_COMPLIANCE.value,
+    OficioStatus.EM_REVISAO.value,
+    OficioStatus.AGUARDANDO_RESPOSTA.value,
+    OficioStatus.AGUARDANDO_ENVIO.value
+]
+
+# Projeção: apenas os campos usados na classificação e no alerta
+CAMPOS_ALERTA = [
+    'status',
+    'data_limite',
+    'prioridade',
+    'assigned_user_id',
+    'dados_extraidos.autoridade_nome',
+    'dados_extraidos.processo_numero',
+    # Estado do último alerta (lido na mesma consulta, sem leitura extra)
+    'urgencia_atual',
+    'ultimo_alerta_enviado'
+]
 
 # Clientes
 firestore_client = FirestoreClient(project_id=PROJECT_ID)
 db = firestore.Client(project=PROJECT_ID)
 
+# Sessão HTTP e pool de envios reaproveitados entre invocações quentes
+alert_delivery = WebhookDelivery(ALERT_WEBHOOK_URL) if ALERT_WEBHOOK_URL else None
+
 
 def calcular_horas_restantes(data_limite_iso: str) -> float:
     """
@@ -81,144 +148,385 @@ def classificar_urgencia(horas_restantes: float, prioridade: str) -> str:
     return 'OK'
 
 
-def buscar_usuario_info(user_id: str, org_id: str) -> Dict[str, Any]:
+class CacheUsuarios:
+    """Informações de usuários por user_id com expiração (thread-safe)."""
+    
+    def __init__(self, ttl_seconds: float):
+        """
+        Inicializa o cache.
+        
+        Args:
+            ttl_seconds: Validade das entradas (0 desabilita o cache)
+        """
+        self.ttl_seconds = ttl_seconds
+        self._entradas: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entrada = self._entradas.get(user_id)
+            if entrada is None:
+                return None
+            if entrada[0] <= time.monotonic():
+                del self._entradas[user_id]
+                return None
+            return entrada[1]
+    
+    def put(self, user_id: str, info: Dict[str, Any]) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entradas[user_id] = (time.monotonic() + self.ttl_seconds, info)
+
+
+usuarios_cache = CacheUsuarios(SLA_USER_CACHE_TTL_SECONDS)
+
+
+def _usuario_info(user_id: str, user_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Destinatário a partir do documento do usuário (padrões se não existir)."""
+    user_data = user_data or {}
+    return {
+        'user_id': user_id,
+        'email': user_data.get('email', ''),
+        'name': user_data.get('name', user_id),
+        'notification_enabled': user_data.get('notification_enabled', True)
+    }
+
+
+def buscar_usuarios(user_ids: Iterable[str], memo: Dict[str, Dict[str, Any]]) -> int:
     """
-    Busca informações do usuário no Firestore.
+    Carrega no memo os usuários ainda não conhecidos, com get_all em lotes.
+    
+    Consulta antes o cache compartilhado entre invocações; usuários
+    inexistentes ou com erro de leitura recebem os valores padrão.
     
     Args:
-        user_id: ID do usuário
-        org_id: ID da organização
+        user_ids: IDs de usuário (repetidos e vazios são ignorados)
+        memo: Usuários já carregados nesta execução (atualizado)
         
     Returns:
-        Dicionário com email, nome, etc.
+        Leituras de documentos feitas no Firestore
     """
-    try:
-        # Busca na coleção users
-        user_doc = db.collection('users').document(user_id).get()
-        
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
-            return {
-                'user_id': user_id,
-                'email': user_data.get('email', ''),
-                'name': user_data.get('name', user_id),
-                'notification_enabled': user_data.get('notification_enabled', True)
-            }
+    faltantes = []
+    
+    for user_id in dict.fromkeys(user_ids):
+        if not user_id or user_id in memo:
+            continue
+        
+        cached = usuarios_cache.get(user_id)
+        if cached is not None:
+            memo[user_id] = cached
         else:
-            return {
-                'user_id': user_id,
-                'email': '',
-                'name': user_id,
-                'notification_enabled': True
-            }
-    except Exception as e:
-        logger.error(f"Erro ao buscar usuário {user_id}: {e}")
-        return {
-            'user_id': user_id,
-            'email': '',
-            'name': user_id,
-            'notification_enabled': True
-        }
+            faltantes.append(user_id)
+    
+    leituras = 0
+    
+    for inicio in range(0, len(faltantes), SLA_USER_BATCH_SIZE):
+        lote = faltantes[inicio:inicio + SLA_USER_BATCH_SIZE]
+        refs = [db.collection('users').document(user_id) for user_id in lote]
+        
+        try:
+            for user_doc in db.get_all(refs, field_paths=CAMPOS_USUARIO):
+                info = _usuario_info(user_doc.id, user_doc.to_dict() if user_doc.exists else None)
+                memo[user_doc.id] = info
+                usuarios_cache.put(user_doc.id, info)
+            # Documentos inexistentes também contam como leitura
+            leituras += len(lote)
+        except Exception as e:
+            logger.error(f"Erro ao buscar usuários {lote}: {e}")
+        
+        for user_id in lote:
+            memo.setdefault(user_id, _usuario_info(user_id, None))
+    
+    return leituras
 
 
-def enviar_alerta(
-    oficio: Dict[str, Any],
-    urgencia: str,
-    destinatarios: List[Dict[str, Any]],
-    sem_responsavel: bool = False
-) -> bool:
+def decidir_alerta(oficio: Dict[str, Any], urgencia: str, agora: datetime) -> Optional[bool]:
     """
-    Envia alerta para destinatários.
+    Decide se o ofício entra no alerta desta execução.
+    
+    Usa o estado gravado no próprio ofício (urgencia_atual e
+    ultimo_alerta_enviado), que vem na projeção da consulta.
     
     Args:
-        oficio: Dados do ofício
-        urgencia: Nível de urgência
-        destinatarios: Lista de destinatários com email/nome
-        sem_responsavel: Se True, alerta é marcado como SEM RESPONSÁVEL
+        oficio: Ofício (projeção CAMPOS_ALERTA)
+        urgencia: Urgência calculada agora
+        agora: Momento da execução (UTC)
         
     Returns:
-        True se alerta enviado com sucesso
+        True se é escalonamento (urgência maior que a do último alerta),
+        False se é lembrete (cooldown vencido ou primeiro alerta),
+        None se deve ser suprimido
     """
+    anterior = oficio.get('urgencia_atual')
+    ultimo = oficio.get('ultimo_alerta_enviado')
+    
+    if not anterior or not ultimo:
+        return False
+    
+    if NIVEL_URGENCIA.get(urgencia, 0) > NIVEL_URGENCIA.get(anterior, 0):
+        return True
+    
     try:
-        oficio_id = oficio.get('oficio_id')
-        dados_extraidos = oficio.get('dados_extraidos', {})
-        autoridade = dados_extraidos.get('autoridade_nome', 'Desconhecida')
-        processo = dados_extraidos.get('processo_numero', 'N/A')
-        data_limite = oficio.get('data_limite', '')
-        horas_restantes = calcular_horas_restantes(data_limite)
-        
-        # Emoji por urgência
-        emoji_map = {
-            'VENCIDO': '🔴',
-            'CRITICO': '⚠️',
-            'URGENTE': '🟠',
-            'ATENCAO': '🟡',
-            'OK': '🟢'
-        }
-        emoji = emoji_map.get(urgencia, '⚪')
-        
-        # Monta mensagem
-        if sem_responsavel:
-            titulo = f"{emoji} ALERTA: Ofício SEM RESPONSÁVEL - {urgencia}"
-        else:
-            titulo = f"{emoji} ALERTA SLA: {urgencia}"
-        
-        mensagem = f"""
-{titulo}
+        ultimo_dt = datetime.fromisoformat(ultimo.replace('Z', '+00:00')).replace(tzinfo=None)
+    except (AttributeError, ValueError):
+        return False
+    
+    if agora - ultimo_dt >= timedelta(hours=SLA_ALERT_COOLDOWN_HOURS):
+        return False
+    
+    return None
 
-📋 Ofício ID: {oficio_id}
-👤 Autoridade: {autoridade}
-📑 Processo: {processo}
-⏰ Prazo: {abs(horas_restantes):.1f}h {'VENCIDAS' if horas_restantes < 0 else 'restantes'}
-📅 Data Limite: {data_limite[:10]}
 
-{'⚠️ ATENÇÃO: Este ofício NÃO possui responsável atribuído!' if sem_responsavel else ''}
+def _linha_oficio(item: Dict[str, Any]) -> str:
+    """Linha do digest para um ofício."""
+    oficio = item['oficio']
+    dados_extraidos = oficio.get('dados_extraidos', {})
+    horas_restantes = calcular_horas_restantes(oficio.get('data_limite', ''))
+    
+    marcadores = []
+    if item['escalonado']:
+        marcadores.append(f"⬆️ {oficio.get('urgencia_atual')} → {item['urgencia']}")
+    if item['sem_responsavel']:
+        marcadores.append('SEM RESPONSÁVEL')
+    
+    return (
+        f"{EMOJI_URGENCIA.get(item['urgencia'], '⚪')} {item['urgencia']} | {oficio.get('oficio_id')} | "
+        f"{dados_extraidos.get('autoridade_nome', 'Desconhecida')} | "
+        f"Processo {dados_extraidos.get('processo_numero', 'N/A')} | "
+        f"{abs(horas_restantes):.1f}h {'VENCIDAS' if horas_restantes < 0 else 'restantes'} "
+        f"({oficio.get('data_limite', '')[:10]})"
+        + (f" | {', '.join(marcadores)}" if marcadores else '')
+    )
 
-Destinatários:
-"""
-        for dest in destinatarios:
-            mensagem += f"- {dest['name']} ({dest['email']})\n"
-        
-        mensagem += f"\n🔗 Acesse o portal para gerenciar: /dashboard"
-        
-        # Log do alerta
-        logger.warning(f"ALERTA {urgencia}: {oficio_id} - {autoridade}")
-        logger.info(f"Destinatários: {[d['email'] for d in destinatarios]}")
-        
-        # Envia para webhook (Slack/Teams) se configurado
-        if ALERT_WEBHOOK_URL:
-            import requests
-            payload = {
-                'text': mensagem,
-                'urgencia': urgencia,
-                'oficio_id': oficio_id,
-                'sem_responsavel': sem_responsavel
+
+def montar_digest(org_id: str, destinatario: Dict[str, Any], itens: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Monta um único alerta com todos os ofícios de um destinatário nesta execução.
+    
+    Args:
+        org_id: ID da organização
+        destinatario: Destinatário (email, nome)
+        itens: Ofícios do alerta ({oficio, urgencia, sem_responsavel, escalonado})
+        
+    Returns:
+        Payload do webhook (text, org_id, destinatario, urgencia, oficios)
+    """
+    # Mais graves primeiro; escalonamentos antes de lembretes no mesmo nível
+    itens = sorted(
+        itens,
+        key=lambda item: (-NIVEL_URGENCIA.get(item['urgencia'], 0), not item['escalonado'],
+                          item['oficio'].get('data_limite', ''))
+    )
+    urgencia_maxima = itens[0]['urgencia']
+    escalonados = sum(1 for item in itens if item['escalonado'])
+    
+    titulo = (
+        f"{EMOJI_URGENCIA.get(urgencia_maxima, '⚪')} ALERTA SLA: {len(itens)} ofício(s), "
+        f"maior urgência {urgencia_maxima}"
+        + (f" ({escalonados} escalonado(s))" if escalonados else '')
+    )
+    
+    mensagem = f"{titulo}\n\nPara: {destinatario['name']} ({destinatario['email']})\n\n"
+    mensagem += "\n".join(_linha_oficio(item) for item in itens)
+    
+    if any(item['sem_responsavel'] for item in itens):
+        mensagem += "\n\n⚠️ ATENÇÃO: Há ofícios sem responsável atribuído!"
+    
+    mensagem += f"\n\n🔗 Acesse o portal para gerenciar: /dashboard"
+    
+    # Log do alerta
+    logger.warning(f"ALERTA {urgencia_maxima}: {len(itens)} ofícios para {destinatario['email']}")
+    
+    return {
+        'text': mensagem,
+        'org_id': org_id,
+        'destinatario': destinatario['email'],
+        'urgencia': urgencia_maxima,
+        'oficios': [
+            {
+                'oficio_id': item['oficio'].get('oficio_id'),
+                'urgencia': item['urgencia'],
+                'escalonado': item['escalonado'],
+                'sem_responsavel': item['sem_responsavel'],
+                'data_limite': item['oficio'].get('data_limite')
             }
-            
-            response = requests.post(ALERT_WEBHOOK_URL, json=payload, timeout=10)
-            
-            if response.status_code == 200:
-                logger.info(f"Alerta enviado para webhook: {oficio_id}")
-            else:
-                logger.error(f"Erro ao enviar para webhook: {response.status_code}")
+            for item in itens
+        ]
+    }
+
+
+def entregar_digests(
+    org_id: str,
+    payloads: List[Dict[str, Any]],
+    deadline: Optional[float] = None
+) -> List[bool]:
+    """
+    Envia os digests da organização em paralelo (pool de alert_delivery).
+    
+    Digests que esgotam as tentativas, o prazo ou que encontram o disjuntor
+    aberto vão para o alert_outbox e são reenviados na próxima execução;
+    contam como entregues para que o ofício não gere um segundo alerta pelo
+    monitoramento.
+    
+    Args:
+        org_id: ID da organização
+        payloads: Payloads de montar_digest
+        deadline: Prazo (time.monotonic) para os envios (None = sem limite)
         
-        # TODO: Integrar com serviço de e-mail (SendGrid, SES, etc)
-        # send_email(to=destinatarios, subject=titulo, body=mensagem)
+    Returns:
+        Para cada payload, True se enviado ou enfileirado no outbox
+    """
+    # Sem webhook configurado o alerta fica apenas no log
+    if alert_delivery is None:
+        return [True] * len(payloads)
+    
+    entregues = []
+    
+    for payload, resultado in zip(payloads, alert_delivery.enviar_lote(payloads, deadline=deadline)):
+        if resultado['ok']:
+            logger.info(f"Alerta enviado para webhook: {payload['destinatario']} ({len(payload['oficios'])} ofícios)")
+            entregues.append(True)
+            continue
         
-        return True
+        if resultado['tentativas']:
+            logger.error(f"Erro ao enviar para webhook após {resultado['tentativas']} tentativas: {resultado['erro']}")
+        else:
+            logger.warning(f"Alerta para {payload['destinatario']} não enviado ({resultado['erro']}), enfileirado no outbox")
+        
+        try:
+            AlertOutbox(db).adicionar(org_id, payload['destinatario'], payload, resultado['erro'])
+            entregues.append(True)
+        except Exception as e:
+            logger.error(f"Falha ao gravar alerta no outbox: {e}")
+            entregues.append(False)
+    
+    return entregues
+
+
+def reenviar_alertas_pendentes(run_deadline: Optional[float] = None) -> Dict[str, int]:
+    """
+    Reenvia os alertas do alert_outbox que falharam em execuções anteriores.
+    
+    O reenvio dura no máximo ALERT_OUTBOX_REPLAY_BUDGET_SECONDS (e não passa
+    de run_deadline); os alertas não tentados ficam para a próxima execução.
+    
+    Args:
+        run_deadline: Prazo (time.monotonic) da execução (None = sem limite)
         
+    Returns:
+        Estatísticas do outbox (pendentes, reenviados, mantidos, adiados, descartados)
+    """
+    if alert_delivery is None:
+        return {}
+    
+    deadline = time.monotonic() + ALERT_OUTBOX_REPLAY_BUDGET_SECONDS
+    if run_deadline is not None:
+        deadline = min(deadline, run_deadline)
+    
+    try:
+        stats = AlertOutbox(db).reenviar(alert_delivery, deadline=deadline)
     except Exception as e:
-        logger.error(f"Erro ao enviar alerta: {e}", exc_info=True)
-        return False
+        logger.error(f"Erro ao reenviar alertas pendentes: {e}", exc_info=True)
+        return {}
+    
+    if stats['pendentes']:
+        logger.info(f"Outbox de alertas: {stats}")
+    
+    return stats
+
+
+def registrar_alertas(estados: Dict[str, str], enviado_em: str) -> int:
+    """
+    Grava o estado do alerta nos ofícios alertados (lotes de até 500 escritas).
+    
+    Args:
+        estados: Urgência alertada por oficio_id
+        enviado_em: Momento do envio (ISO 8601)
+        
+    Returns:
+        Escritas feitas
+    """
+    ids = list(estados)
+    
+    for inicio in range(0, len(ids), FIRESTORE_MAX_BATCH_WRITES):
+        batch = db.batch()
+        for oficio_id in ids[inicio:inicio + FIRESTORE_MAX_BATCH_WRITES]:
+            batch.update(db.collection('oficios').document(oficio_id), {
+                'ultimo_alerta_enviado': enviado_em,
+                'urgencia_atual': estados[oficio_id]
+            })
+        batch.commit()
+    
+    return len(ids)
 
 
-def monitorar_organizacao(org_id: str, org_name: str) -> Dict[str, int]:
+def iterar_paginas_em_risco(
+    org_id: str,
+    horizonte_horas: float = SLA_ALERT_HORIZON_HOURS
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Percorre, página a página, os ofícios abertos com prazo dentro do horizonte de alerta.
+    
+    O custo da consulta acompanha o trabalho em aberto, não o histórico
+    (ofícios RESPONDIDO e prazos distantes não são lidos).
+    
+    Args:
+        org_id: ID da organização
+        horizonte_horas: Horas à frente consideradas para alerta
+        
+    Yields:
+        Páginas de ofícios (projeção CAMPOS_ALERTA + oficio_id), do prazo mais antigo ao mais novo
+    """
+    horizonte = (datetime.utcnow() + timedelta(hours=horizonte_horas)).isoformat()
+    cursor = None
+    
+    while True:
+        oficios, cursor = firestore_client.list_oficios_em_risco(
+            org_id,
+            STATUS_MONITORADOS,
+            horizonte,
+            fields=CAMPOS_ALERTA,
+            limit=SLA_SCAN_PAGE_SIZE,
+            cursor=cursor
+        )
+        
+        yield oficios
+        
+        if cursor is None:
+            break
+
+
+def _oficios_com_usuarios(
+    org_id: str,
+    usuarios: Dict[str, Dict[str, Any]],
+    stats: Dict[str, Any]
+) -> Iterator[Dict[str, Any]]:
+    """Ofícios em risco; os responsáveis de cada página são carregados antes, em lote."""
+    for pagina in iterar_paginas_em_risco(org_id):
+        stats['leituras_firestore'] += max(len(pagina), 1)
+        stats['leituras_firestore'] += buscar_usuarios((oficio.get('assigned_user_id') for oficio in pagina), usuarios)
+        
+        yield from pagina
+
+
+def monitorar_organizacao(org_id: str, org_name: str, deadline: Optional[float] = None) -> Dict[str, int]:
     """
     Monitora ofícios de uma organização.
     
+    Os ofícios chegam do prazo mais antigo ao mais novo; se o orçamento de
+    tempo terminar, os mais urgentes já foram tratados e o restante fica
+    para a próxima execução (interrompido=True).
+    
+    Os alertas são agrupados por destinatário e enviados em um único digest
+    ao final. Ofícios com a mesma urgência do último alerta são suprimidos
+    até o cooldown (SLA_ALERT_COOLDOWN_HOURS); aumento de urgência é
+    escalonado na hora.
+    
     Args:
         org_id: ID da organização
         org_name: Nome da organização
+        deadline: Prazo (time.monotonic) para esta organização (None = sem limite)
         
     Returns:
         Estatísticas de alertas
@@ -231,49 +539,44 @@ def monitorar_organizacao(org_id: str, org_name: str) -> Dict[str, int]:
         'criticos': 0,
         'urgentes': 0,
         'sem_responsavel': 0,
-        'alertas_enviados': 0
+        'alertas_enviados': 0,
+        'alertas_escalonados': 0,
+        'alertas_suprimidos': 0,
+        'digests_enviados': 0,
+        'interrompido': False,
+        'leituras_firestore': 0
     }
     
-    # Status que requerem monitoramento
-    status_monitorados = [
-        OficioStatus.AGUARDANDO_COMPLIANCE.value,
-        OficioStatus.EM_ANALISE_COMPLIANCE.value,
-        OficioStatus.EM_REVISAO.value,
-        OficioStatus.AGUARDANDO_RESPOSTA.value,
-        OficioStatus.AGUARDANDO_ENVIO.value
-    ]
-    
-    # Busca ofícios da organização
-    query = db.collection('oficios').where('org_id', '==', org_id)
-    
     # Busca info do Admin Org (fallback para alertas)
-    org_doc = db.collection('organizations').document(org_id).get()
+    org_doc = db.collection('organizations').document(org_id).get(field_paths=['admin_email'])
+    stats['leituras_firestore'] += 1
     org_admin_email = ''
     
     if org_doc.exists:
         org_data = org_doc.to_dict()
         org_admin_email = org_data.get('admin_email', '')
     
-    for oficio_doc in query.stream():
-        oficio = oficio_doc.to_dict()
-        oficio['oficio_id'] = oficio_doc.id
-        
-        status = oficio.get('status')
-        
-        # Pula se não está em status monitorado
-        if status not in status_monitorados:
-            continue
+    # Usuários já carregados nesta execução (cada responsável é lido uma vez)
+    usuarios: Dict[str, Dict[str, Any]] = {}
+    
+    # Digest por destinatário (email)
+    digests: Dict[str, Dict[str, Any]] = {}
+    escalonados = set()
+    agora = datetime.utcnow()
+    
+    for oficio in _oficios_com_usuarios(org_id, usuarios, stats):
+        if deadline is not None and time.monotonic() >= deadline:
+            stats['interrompido'] = True
+            logger.warning(f"Organização {org_name}: orçamento de {SLA_ORG_BUDGET_SECONDS:.0f}s esgotado, "
+                           f"{stats['total_oficios']} ofícios tratados")
+            break
         
         stats['total_oficios'] += 1
         
         # Calcula urgência
-        data_limite = oficio.get('data_limite', '')
+        data_limite = oficio['data_limite']
         prioridade = oficio.get('prioridade', 'MEDIA')
         
-        if not data_limite:
-            logger.warning(f"Ofício {oficio_doc.id} sem data_limite")
-            continue
-        
         horas_restantes = calcular_horas_restantes(data_limite)
         urgencia = classificar_urgencia(horas_restantes, prioridade)
         
@@ -296,16 +599,22 @@ def monitorar_organizacao(org_id: str, org_name: str) -> Dict[str, int]:
         if sem_responsavel:
             stats['sem_responsavel'] += 1
         
+        # Mesma urgência dentro do cooldown: não realerta
+        escalonado = decidir_alerta(oficio, urgencia, agora)
+        
+        if escalonado is None:
+            stats['alertas_suprimidos'] += 1
+            continue
+        
         # Monta lista de destinatários
         destinatarios = []
         
         if assigned_user_id:
             # Envia para o responsável
-            user_info = buscar_usuario_info(assigned_user_id, org_id)
+            user_info = usuarios[assigned_user_id]
             
             if user_info['notification_enabled'] and user_info['email']:
                 destinatarios.append(user_info)
-                logger.info(f"Alerta para responsável: {user_info['name']}")
         
         # Se crítico ou sem responsável, inclui Admin Org
         if urgencia in ['VENCIDO', 'CRITICO'] or sem_responsavel:
@@ -316,31 +625,292 @@ def monitorar_organizacao(org_id: str, org_name: str) -> Dict[str, int]:
                     'name': 'Admin da Organização',
                     'notification_enabled': True
                 })
-                logger.info("Alerta também para Admin Org (crítico ou sem responsável)")
         
-        # Envia alerta
-        if destinatarios:
-            enviado = enviar_alerta(oficio, urgencia, destinatarios, sem_responsavel)
-            
-            if enviado:
-                stats['alertas_enviados'] += 1
-                
-                # Registra alerta no Firestore
-                oficio_ref = db.collection('oficios').document(oficio_doc.id)
-                oficio_ref.update({
-                    'ultimo_alerta_enviado': datetime.utcnow().isoformat(),
-                    'urgencia_atual': urgencia
-                })
+        item = {
+            'oficio': oficio,
+            'urgencia': urgencia,
+            'sem_responsavel': sem_responsavel,
+            'escalonado': escalonado
+        }
+        
+        for destinatario in destinatarios:
+            digest = digests.setdefault(destinatario['email'], {'destinatario': destinatario, 'itens': []})
+            digest['itens'].append(item)
+        
+        if escalonado and destinatarios:
+            escalonados.add(oficio['oficio_id'])
+    
+    # Um alerta por destinatário; o estado só é gravado para ofícios entregues
+    alertados: Dict[str, str] = {}
+    
+    lista = list(digests.values())
+    payloads = [montar_digest(org_id, digest['destinatario'], digest['itens']) for digest in lista]
+    
+    # Envio com prazo próprio: mesmo uma organização interrompida entrega (ou enfileira) os digests
+    prazo_entrega = None if deadline is None else max(deadline, time.monotonic()) + SLA_DELIVERY_GRACE_SECONDS
+    
+    for digest, entregue in zip(lista, entregar_digests(org_id, payloads, deadline=prazo_entrega)):
+        if entregue:
+            stats['digests_enviados'] += 1
+            for item in digest['itens']:
+                alertados[item['oficio']['oficio_id']] = item['urgencia']
+    
+    if alertados:
+        try:
+            registrar_alertas(alertados, datetime.utcnow().isoformat())
+        except Exception as e:
+            # Sem o estado, os ofícios voltam a ser alertados na próxima execução
+            logger.error(f"Organização {org_name}: falha ao registrar alertas enviados: {e}")
+    
+    stats['alertas_enviados'] = len(alertados)
+    stats['alertas_escalonados'] = len(escalonados.intersection(alertados))
     
     logger.info(f"Organização {org_name}: {stats}")
     
     return stats
 
 
+def listar_organizacoes() -> List[Tuple[str, str]]:
+    """
+    Lista as organizações a monitorar.
+    
+    Returns:
+        Lista de (org_id, nome)
+    """
+    return [
+        (org_doc.id, (org_doc.to_dict() or {}).get('name', org_doc.id))
+        for org_doc in db.collection('organizations').select(['name']).stream()
+    ]
+
+
+def _monitorar_com_orcamento(org_id: str, org_name: str, run_deadline: Optional[float] = None) -> Dict[str, Any]:
+    """Monitora uma organização dentro do orçamento; falhas ficam no resultado da organização."""
+    inicio = time.monotonic()
+    
+    # Organização que não começou antes do fim da execução fica para a próxima
+    if run_deadline is not None and inicio >= run_deadline:
+        return {'pulada': True, 'duracao_s': 0.0}
+    
+    deadline = inicio + SLA_ORG_BUDGET_SECONDS
+    if run_deadline is not None:
+        deadline = min(deadline, run_deadline)
+    
+    try:
+        stats = monitorar_organizacao(org_id, org_name, deadline=deadline)
+    except Exception as e:
+        logger.error(f"Erro ao monitorar organização {org_name} ({org_id}): {e}", exc_info=True)
+        stats = {'erro': str(e)}
+    
+    stats['duracao_s'] = round(time.monotonic() - inicio, 2)
+    
+    return stats
+
+
+def monitorar_organizacoes(
+    orgs: List[Tuple[str, str]],
+    max_workers: int = SLA_MAX_WORKERS,
+    run_deadline: Optional[float] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Monitora várias organizações em paralelo (pool limitado de threads).
+    
+    Com run_deadline, organizações que não começaram até o prazo são
+    marcadas como puladas (pulada=True) e as que ainda estão em andamento
+    não são aguardadas além dele, para que o resumo da execução seja gravado
+    antes do timeout da função. A ordem é embaralhada para que as mesmas
+    organizações não fiquem sempre no fim da fila.
+    
+    Args:
+        orgs: Lista de (org_id, nome)
+        max_workers: Organizações monitoradas simultaneamente
+        run_deadline: Prazo (time.monotonic) da execução (None = sem limite)
+        
+    Returns:
+        Estatísticas por org_id
+    """
+    if not orgs:
+        return {}
+    
+    orgs = list(orgs)
+    random.shuffle(orgs)
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(orgs))), thread_name_prefix='w2-org')
+    
+    try:
+        futures = {
+            org_id: executor.submit(_monitorar_com_orcamento, org_id, org_name, run_deadline)
+            for org_id, org_name in orgs
+        }
+        
+        resultados = {}
+        for org_id, future in futures.items():
+            # Folga para a organização em andamento enviar os digests e gravar o estado dos alertas
+            timeout = None if run_deadline is None else (
+                max(0.0, run_deadline - time.monotonic()) + SLA_DELIVERY_GRACE_SECONDS + 5
+            )
+            
+            try:
+                resultados[org_id] = future.result(timeout=timeout)
+            except FuturesTimeoutError:
+                logger.error(f"Organização {org_id} não concluiu dentro do orçamento da execução")
+                resultados[org_id] = {'erro': 'orçamento da execução esgotado', 'interrompido': True}
+        
+        return resultados
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def resumir_resultados(resultados: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Totaliza as estatísticas das organizações.
+    
+    Args:
+        resultados: Estatísticas por org_id
+        
+    Returns:
+        Totais da execução
+    """
+    totais = {
+        'organizacoes_monitoradas': len(resultados),
+        'total_oficios': 0,
+        'total_alertas': 0,
+        'total_alertas_escalonados': 0,
+        'total_alertas_suprimidos': 0,
+        'total_digests': 0,
+        'total_vencidos': 0,
+        'total_criticos': 0,
+        'total_sem_responsavel': 0,
+        'organizacoes_interrompidas': 0,
+        'organizacoes_puladas': 0,
+        'organizacoes_com_erro': 0,
+        'total_leituras_firestore': 0
+    }
+    
+    for stats in resultados.values():
+        totais['total_oficios'] += stats.get('total_oficios', 0)
+        totais['total_alertas'] += stats.get('alertas_enviados', 0)
+        totais['total_alertas_escalonados'] += stats.get('alertas_escalonados', 0)
+        totais['total_alertas_suprimidos'] += stats.get('alertas_suprimidos', 0)
+        totais['total_digests'] += stats.get('digests_enviados', 0)
+        totais['total_vencidos'] += stats.get('vencidos', 0)
+        totais['total_criticos'] += stats.get('criticos', 0)
+        totais['total_sem_responsavel'] += stats.get('sem_responsavel', 0)
+        totais['organizacoes_interrompidas'] += int(bool(stats.get('interrompido')))
+        totais['organizacoes_puladas'] += int(bool(stats.get('pulada')))
+        totais['organizacoes_com_erro'] += int('erro' in stats)
+        totais['total_leituras_firestore'] += stats.get('leituras_firestore', 0)
+    
+    totais['organizacoes_monitoradas'] -= totais['organizacoes_puladas']
+    
+    return totais
+
+
+def iniciar_execucao(run_id: str, modo: str, total_organizacoes: int, total_shards: int) -> None:
+    """
+    Cria o documento de resumo da execução (sla_runs/{run_id}).
+    
+    Args:
+        run_id: ID da execução
+        modo: threads ou pubsub
+        total_organizacoes: Organizações a monitorar
+        total_shards: Shards publicados (1 no modo threads)
+    """
+    db.collection(SLA_RUNS_COLLECTION).document(run_id).set({
+        'run_id': run_id,
+        'modo': modo,
+        'iniciado_em': datetime.utcnow(),
+        'total_organizacoes': total_organizacoes,
+        'total_shards': total_shards,
+        'shards_concluidos': 0,
+        'shards_registrados': [],
+        # Leituras da listagem de organizações; as demais ficam em totais.total_leituras_firestore
+        'leituras_listagem': max(total_organizacoes, 1),
+        'orcamento_por_organizacao_s': SLA_ORG_BUDGET_SECONDS,
+        'totais': {},
+        'organizacoes': {}
+    })
+
+
+def registrar_resultados(run_id: str, resultados: Dict[str, Dict[str, Any]], shard: int = 0) -> bool:
+    """
+    Grava os resultados de um shard no resumo da execução (uma escrita por shard).
+    
+    Os totais são somados com Increment, então shards concorrentes não se
+    sobrescrevem; uma reentrega do mesmo shard (Pub/Sub) não é somada de novo.
+    
+    Args:
+        run_id: ID da execução
+        resultados: Estatísticas por org_id
+        shard: Índice do shard
+        
+    Returns:
+        False se o shard já estava registrado
+    """
+    run_ref = db.collection(SLA_RUNS_COLLECTION).document(run_id)
+    
+    update = {f'organizacoes.{org_id}': stats for org_id, stats in resultados.items()}
+    update.update({
+        f'totais.{chave}': firestore.Increment(valor)
+        for chave, valor in resumir_resultados(resultados).items()
+    })
+    update['shards_concluidos'] = firestore.Increment(1)
+    update['shards_registrados'] = firestore.ArrayUnion([shard])
+    update['atualizado_em'] = datetime.utcnow()
+    
+    transaction = db.transaction()
+    
+    @firestore.transactional
+    def aplicar(transaction):
+        snapshot = run_ref.get(field_paths=['shards_registrados'], transaction=transaction)
+        
+        if shard in ((snapshot.to_dict() or {}).get('shards_registrados') or []):
+            return False
+        
+        transaction.update(run_ref, update)
+        return True
+    
+    registrado = aplicar(transaction)
+    
+    if not registrado:
+        logger.warning(f"Execução {run_id}: shard {shard} já registrado (reentrega)")
+    
+    return registrado
+
+
+def publicar_shards(run_id: str, orgs: List[Tuple[str, str]], shard_size: int = SLA_SHARD_SIZE) -> int:
+    """
+    Publica uma mensagem por shard de organizações (processadas por monitor_sla_shard).
+    
+    Args:
+        run_id: ID da execução
+        orgs: Lista de (org_id, nome)
+        shard_size: Organizações por mensagem
+        
+    Returns:
+        Número de shards publicados
+    """
+    pubsub_client = PubSubClient(PROJECT_ID)
+    shards = [orgs[i:i + shard_size] for i in range(0, len(orgs), shard_size)]
+    
+    for indice, shard in enumerate(shards):
+        pubsub_client.publish_message(SLA_SHARD_TOPIC, {
+            'run_id': run_id,
+            'shard': indice,
+            'orgs': [{'org_id': org_id, 'name': org_name} for org_id, org_name in shard]
+        })
+    
+    return len(shards)
+
+
 def handle_cron_trigger(event: Dict[str, Any], context: Any) -> None:
     """
     Handler principal para execução Cron.
     
+    No modo threads monitora as organizações em um pool limitado; no modo
+    pubsub apenas distribui shards de organizações (monitor_sla_shard).
+    Antes, reenvia os alertas pendentes do alert_outbox. O resumo fica em
+    sla_runs/{run_id}.
+    
     Args:
         event: Dados do evento Pub/Sub do Cloud Scheduler
         context: Contexto da execução
@@ -350,43 +920,48 @@ def handle_cron_trigger(event: Dict[str, Any], context: Any) -> None:
         logger.info("INICIANDO MONITORAMENTO DE SLA")
         logger.info("=" * 60)
         
-        # Busca todas as organizações
-        orgs_query = db.collection('organizations').stream()
+        run_deadline = time.monotonic() + SLA_RUN_BUDGET_SECONDS
+        run_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
         
-        stats_global = {
-            'organizacoes_monitoradas': 0,
-            'total_oficios': 0,
-            'total_alertas': 0,
-            'total_vencidos': 0,
-            'total_criticos': 0,
-            'total_sem_responsavel': 0
-        }
+        # Alertas que falharam em execuções anteriores saem antes dos novos
+        outbox_stats = reenviar_alertas_pendentes(run_deadline)
         
-        for org_doc in orgs_query:
-            org_data = org_doc.to_dict()
-            org_id = org_doc.id
-            org_name = org_data.get('name', org_id)
-            
-            # Monitora organização
-            stats = monitorar_organizacao(org_id, org_name)
-            
-            # Acumula estatísticas globais
-            stats_global['organizacoes_monitoradas'] += 1
-            stats_global['total_oficios'] += stats['total_oficios']
-            stats_global['total_alertas'] += stats['alertas_enviados']
-            stats_global['total_vencidos'] += stats['vencidos']
-            stats_global['total_criticos'] += stats['criticos']
-            stats_global['total_sem_responsavel'] += stats['sem_responsavel']
+        orgs = listar_organizacoes()
+        
+        if SLA_MONITOR_MODE == 'pubsub':
+            total_shards = -(-len(orgs) // SLA_SHARD_SIZE)
+            iniciar_execucao(run_id, SLA_MONITOR_MODE, len(orgs), total_shards)
+            publicar_shards(run_id, orgs)
+            logger.info(f"Execução {run_id}: {len(orgs)} organizações em {total_shards} shards publicados")
+            return
+        
+        iniciar_execucao(run_id, 'threads', len(orgs), 1)
+        resultados = monitorar_organizacoes(orgs, run_deadline=run_deadline)
+        registrar_resultados(run_id, resultados)
+        
+        stats_global = resumir_resultados(resultados)
         
         # Log final
         logger.info("=" * 60)
-        logger.info("MONITORAMENTO CONCLUÍDO")
+        logger.info(f"MONITORAMENTO CONCLUÍDO ({run_id})")
         logger.info(f"Organizações: {stats_global['organizacoes_monitoradas']}")
         logger.info(f"Ofícios monitorados: {stats_global['total_oficios']}")
-        logger.info(f"Alertas enviados: {stats_global['total_alertas']}")
+        logger.info(f"Alertas enviados: {stats_global['total_alertas']} em {stats_global['total_digests']} digests "
+                    f"({stats_global['total_alertas_escalonados']} escalonados, "
+                    f"{stats_global['total_alertas_suprimidos']} suprimidos pelo cooldown)")
+        if outbox_stats.get('pendentes'):
+            logger.info(f"Outbox: {outbox_stats['reenviados']} reenviados, {outbox_stats['mantidos']} pendentes, "
+                        f"{outbox_stats['adiados']} adiados, {outbox_stats['descartados']} descartados")
         logger.info(f"Vencidos: {stats_global['total_vencidos']}")
         logger.info(f"Críticos: {stats_global['total_criticos']}")
         logger.info(f"Sem responsável: {stats_global['total_sem_responsavel']}")
+        logger.info(f"Interrompidas por orçamento: {stats_global['organizacoes_interrompidas']}, "
+                    f"puladas: {stats_global['organizacoes_puladas']}, "
+                    f"com erro: {stats_global['organizacoes_com_erro']}")
+        if stats_global['organizacoes_puladas']:
+            logger.warning(f"{stats_global['organizacoes_puladas']} organizações ficaram para a próxima execução: "
+                           f"considere SLA_MONITOR_MODE=pubsub ou mais SLA_MAX_WORKERS")
+        logger.info(f"Leituras no Firestore: {stats_global['total_leituras_firestore'] + max(len(orgs), 1)}")
         logger.info("=" * 60)
         
     except Exception as e:
@@ -394,12 +969,38 @@ def handle_cron_trigger(event: Dict[str, Any], context: Any) -> None:
         raise
 
 
+def handle_shard_message(event: Dict[str, Any], context: Any) -> None:
+    """
+    Monitora um shard de organizações publicado por handle_cron_trigger.
+    
+    Args:
+        event: Evento Pub/Sub com run_id e orgs
+        context: Contexto da execução
+    """
+    run_deadline = time.monotonic() + SLA_RUN_BUDGET_SECONDS
+    message_data = json.loads(base64.b64decode(event['data']).decode('utf-8'))
+    run_id = message_data['run_id']
+    orgs = [(org['org_id'], org.get('name', org['org_id'])) for org in message_data['orgs']]
+    
+    logger.info(f"Execução {run_id}, shard {message_data.get('shard')}: {len(orgs)} organizações")
+    
+    resultados = monitorar_organizacoes(orgs, run_deadline=run_deadline)
+    registrar_resultados(run_id, resultados, shard=message_data.get('shard', 0))
+    
+    logger.info(f"Execução {run_id}, shard {message_data.get('shard')}: {resumir_resultados(resultados)}")
+
+
 # Entry point para Cloud Functions
 def monitor_sla(event, context):
     """Entry point para Cloud Function (Pub/Sub Trigger via Cloud Scheduler)"""
     return handle_cron_trigger(event, context)
 
 
+def monitor_sla_shard(event, context):
+    """Entry point para Cloud Function (Pub/Sub Trigger no tópico de shards)"""
+    return handle_shard_message(event, context)
+
+
 
 
 
@@ -27,6 +27,8 @@ logger = logging.getLogger(__name__)
 # Configurações
 PROJECT_ID = os.getenv('GCP_PROJECT_ID')
 USE_GPT4_FOR_RESPONSE = os.getenv('USE_GPT4_FOR_RESPONSE', 'false').lower() == 'true'
+# Tipos de conhecimento consultados (ex: "legislacao,politica_interna"); vazio = todos
+RAG_TIPOS = [tipo.strip() for tipo in os.getenv('RAG_TIPOS', '').split(',') if tipo.strip()]
 
 # Clientes
 firestore_client = FirestoreClient(project_id=PROJECT_ID)
@@ -178,10 +180,12 @@ def compor_resposta_rag(
         query_text=query_text,
         org_id=org_id,
         top_k=3,
-        min_similarity=0.7
+        min_similarity=0.7,
+        filters={'tipos': RAG_TIPOS} if RAG_TIPOS else None
     )
     
     logger.info(f"RAG: {rag_results['num_results']} documentos relevantes encontrados")
+    logger.info(f"Caches RAG (hit={rag_results['cache_hit']}): {rag_client.cache_stats()}")
     
     # 3. Coleta dados de apoio do compliance
     dados_apoio = oficio.get('dados_de_apoio_compliance')
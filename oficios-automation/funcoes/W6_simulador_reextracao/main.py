@@ -47,7 +47,8 @@ def handle_simulation(request: Request, auth_context: AuthContext) -> tuple[Dict
         "target_domain": "empresa.com.br",
         "raw_text": "OFÍCIO N° 123/2024...",
         "simulation_name": "Teste Bloqueio Judicial",
-        "llm_prompt_version": "v1.2.0"  # Opcional
+        "llm_prompt_version": "v1.2.0",  # Opcional
+        "bypass_llm_cache": true  # Opcional: ignora extração em cache
     }
     
     Args:
@@ -71,6 +72,7 @@ def handle_simulation(request: Request, auth_context: AuthContext) -> tuple[Dict
         raw_text = payload.get('raw_text')
         simulation_name = payload.get('simulation_name', 'Simulação Manual')
         llm_prompt_version = payload.get('llm_prompt_version')
+        bypass_llm_cache = bool(payload.get('bypass_llm_cache', False))
         
         if not all([org_id, target_domain, raw_text]):
             return {
@@ -165,6 +167,10 @@ def handle_simulation(request: Request, auth_context: AuthContext) -> tuple[Dict
         if llm_prompt_version:
             message_data['llm_prompt_version_override'] = llm_prompt_version
         
+        # Execução nova do LLM mesmo que o mesmo texto/prompt já esteja em cache
+        if bypass_llm_cache:
+            message_data['bypass_llm_cache'] = True
+        
         # Publica no Pub/Sub
         pubsub_message_id = pubsub_client.publish_message(PUBSUB_TOPIC, message_data)
         logger.info(f"Simulação publicada no Pub/Sub: {pubsub_message_id}")
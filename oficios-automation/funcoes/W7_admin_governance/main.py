@@ -17,6 +17,7 @@ from google.cloud import firestore, secretmanager
 # Importa os utilitários
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 
+from utils.api_clients import FirestoreClient
 from utils.auth_rbac import (
     rbac_required, 
     ROLE_ORG_ADMIN, 
@@ -35,6 +36,7 @@ PROJECT_ID = os.getenv('GCP_PROJECT_ID')
 # Clientes
 db = firestore.Client(project=PROJECT_ID)
 secret_client = secretmanager.SecretManagerServiceClient()
+firestore_client = FirestoreClient(PROJECT_ID)
 
 
 def validar_dominio(domain: str) -> bool:
@@ -454,7 +456,8 @@ def handle_get_audit_trail(request: Request, auth_context: AuthContext) -> tuple
     Query params:
     - org_id: ID da organização
     - target_id: Filtrar por ID específico (opcional)
-    - limit: Número de resultados (padrão: 100)
+    - limit: Número de resultados (padrão: 100, máximo: 500)
+    - cursor: next_cursor da página anterior (opcional)
     """
     try:
         org_id = request.args.get('org_id')
@@ -470,40 +473,39 @@ def handle_get_audit_trail(request: Request, auth_context: AuthContext) -> tuple
             return {'error': 'Acesso negado'}, 403
         
         target_id = request.args.get('target_id')
-        limit = int(request.args.get('limit', 100))
-        
-        # Busca ofícios com auditoria
-        query = db.collection('oficios').where('org_id', '==', org_id)
-        
-        if target_id:
-            query = query.where('oficio_id', '==', target_id)
-        
-        query = query.limit(limit).order_by('updated_at', direction=firestore.Query.DESCENDING)
+        limit = min(int(request.args.get('limit', 100)), 500)
+        cursor = request.args.get('cursor')
+        
+        # Entradas append-only em oficios/{id}/audit, paginadas por cursor
+        try:
+            entries, next_cursor = firestore_client.list_audit_entries(
+                org_id, oficio_id=target_id, limit=limit, cursor=cursor
+            )
+        except ValueError as e:
+            return {'error': str(e)}, 404 if target_id and not cursor else 400
+        except PermissionError:
+            return {'error': 'Acesso negado'}, 403
         
         audit_records = []
         
-        for doc in query.stream():
-            oficio = doc.to_dict()
-            audit_trail = oficio.get('audit_trail', [])
-            
-            for entry in audit_trail:
-                audit_records.append({
-                    'oficio_id': doc.id,
-                    'user_id': entry.get('user_id'),
-                    'timestamp': entry.get('timestamp'),
-                    'action': entry.get('action'),
-                    'target_id': entry.get('target_id', doc.id),
-                    'details': entry.get('details')
-                })
-        
-        # Ordena por timestamp
-        audit_records.sort(key=lambda x: x['timestamp'], reverse=True)
+        for entry in entries:
+            timestamp = entry.get('timestamp')
+            audit_records.append({
+                'oficio_id': entry.get('oficio_id'),
+                'user_id': entry.get('user_id'),
+                'timestamp': timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp,
+                'action': entry.get('action'),
+                'target_id': entry.get('target_id', entry.get('oficio_id')),
+                'details': entry.get('details'),
+                'changes': entry.get('changes')
+            })
         
         return {
             'status': 'success',
             'org_id': org_id,
             'count': len(audit_records),
-            'audit_trail': audit_records[:limit]
+            'audit_trail': audit_records,
+            'next_cursor': next_cursor
         }, 200
         
     except Exception as e:
@@ -7,10 +7,12 @@ import base64
 import io
 import json
 import logging
+import mimetypes
 import os
 import sys
+import zipfile
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from flask import Request
 from google.cloud import storage
@@ -19,6 +21,7 @@ from google.cloud import storage
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 
 from utils.auth_rbac import rbac_required, ROLE_ORG_ADMIN, ROLE_PLATFORM_ADMIN, AuthContext
+from utils.knowledge_filters import apply_firestore_filters, matches_filters, normalize_filters
 from utils.rag_client import RAGClient
 from utils.schema import KnowledgeDocument
 
@@ -30,6 +33,9 @@ logger = logging.getLogger(__name__)
 PROJECT_ID = os.getenv('GCP_PROJECT_ID')
 KNOWLEDGE_BUCKET = os.getenv('KNOWLEDGE_BUCKET', f'{PROJECT_ID}-knowledge-docs')
 
+MIN_CONTENT_LENGTH = 50
+SUPPORTED_ARCHIVE_MEMBERS = ('.txt', '.md', '.pdf')
+
 # Clientes
 rag_client = RAGClient(project_id=PROJECT_ID)
 storage_client = storage.Client(project=PROJECT_ID)
@@ -140,6 +146,9 @@ def process_and_vectorize(
     """
     Processa e vetoriza um documento de conhecimento.
     
+    Documentos longos são indexados integralmente em chunks (ver
+    utils/chunking.py); o ID retornado é o do registro pai.
+    
     Args:
         org_id: ID da organização
         title: Título do documento
@@ -155,14 +164,8 @@ def process_and_vectorize(
     logger.info(f"Tamanho do conteúdo: {len(content_text)} caracteres")
     
     # Valida tamanho mínimo
-    if len(content_text) < 50:
-        raise ValueError("Conteúdo muito curto (mínimo: 50 caracteres)")
-    
-    # Limita tamanho máximo (para embeddings)
-    MAX_LENGTH = 50000  # ~50KB de texto
-    if len(content_text) > MAX_LENGTH:
-        logger.warning(f"Conteúdo truncado de {len(content_text)} para {MAX_LENGTH} caracteres")
-        content_text = content_text[:MAX_LENGTH]
+    if len(content_text) < MIN_CONTENT_LENGTH:
+        raise ValueError(f"Conteúdo muito curto (mínimo: {MIN_CONTENT_LENGTH} caracteres)")
     
     # Adiciona file_url aos metadados
     if metadata is None:
@@ -192,6 +195,127 @@ def process_and_vectorize(
         raise
 
 
+def is_archive(content_type: str, filename: str) -> bool:
+    """Verifica se o upload é um arquivo compactado com vários documentos."""
+    return content_type in ['application/zip', 'application/x-zip-compressed'] or filename.lower().endswith('.zip')
+
+
+def extract_documents_from_archive(
+    file_content: bytes
+) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    """
+    Extrai o texto de cada documento suportado (TXT, MD, PDF) de um ZIP.
+    
+    Args:
+        file_content: Conteúdo do arquivo ZIP
+        
+    Returns:
+        Tupla (documentos [{arquivo, conteudo}], falhas [{arquivo, erro}])
+    """
+    documentos = []
+    falhas = []
+    
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(file_content))
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Arquivo ZIP inválido: {e}")
+    
+    with archive:
+        for info in archive.infolist():
+            member_name = os.path.basename(info.filename)
+            
+            # Ignora diretórios, arquivos ocultos e metadados do macOS
+            if info.is_dir() or not member_name or member_name.startswith('.') or '__MACOSX' in info.filename:
+                continue
+            
+            if not member_name.lower().endswith(SUPPORTED_ARCHIVE_MEMBERS):
+                falhas.append({'arquivo': info.filename, 'erro': 'Tipo de arquivo não suportado'})
+                continue
+            
+            content_type = mimetypes.guess_type(member_name)[0] or 'application/octet-stream'
+            
+            try:
+                text = extract_text_from_file(archive.read(info), content_type, member_name)
+                documentos.append({'arquivo': info.filename, 'conteudo': text})
+            except Exception as e:
+                falhas.append({'arquivo': info.filename, 'erro': str(e)})
+    
+    logger.info(f"ZIP extraído: {len(documentos)} documentos, {len(falhas)} falhas")
+    
+    return documentos, falhas
+
+
+def process_and_vectorize_archive(
+    org_id: str,
+    title: str,
+    archive_content: bytes,
+    tipo: str,
+    metadata: Optional[Dict[str, Any]] = None,
+    file_url: str = ""
+) -> Dict[str, Any]:
+    """
+    Processa e vetoriza todos os documentos de um ZIP em lote.
+    
+    Embeddings são gerados em lotes e gravados com escritas agrupadas;
+    falhas de um documento não abortam os demais.
+    
+    Args:
+        org_id: ID da organização
+        title: Título base (cada documento recebe "título - arquivo")
+        archive_content: Conteúdo do ZIP
+        tipo: Tipo dos documentos
+        metadata: Metadados comuns a todos os documentos
+        file_url: URL do ZIP no Storage
+        
+    Returns:
+        Dicionário com document_ids e falhas por arquivo
+    """
+    extraidos, falhas = extract_documents_from_archive(archive_content)
+    
+    documentos = []
+    arquivos = []
+    
+    for item in extraidos:
+        content_text = item['conteudo']
+        
+        if len(content_text) < MIN_CONTENT_LENGTH:
+            falhas.append({
+                'arquivo': item['arquivo'],
+                'erro': f"Conteúdo muito curto (mínimo: {MIN_CONTENT_LENGTH} caracteres)"
+            })
+            continue
+        
+        doc_metadata = dict(metadata or {})
+        doc_metadata['archive_member'] = item['arquivo']
+        doc_metadata['content_length'] = len(content_text)
+        doc_metadata['indexed_at'] = datetime.utcnow().isoformat()
+        
+        if file_url:
+            doc_metadata['file_url'] = file_url
+        
+        documentos.append({
+            'titulo': f"{title} - {os.path.basename(item['arquivo'])}",
+            'conteudo': content_text,
+            'tipo': tipo,
+            'metadata': doc_metadata
+        })
+        arquivos.append(item['arquivo'])
+    
+    resultado = rag_client.bulk_import_documents(org_id=org_id, documents=documentos)
+    
+    for falha in resultado['falhas']:
+        falhas.append({'arquivo': arquivos[falha['index']], 'erro': falha['erro']})
+    
+    document_ids = [doc_id for doc_id in resultado['doc_ids'] if doc_id]
+    
+    logger.info(f"ZIP vetorizado: {len(document_ids)} documentos indexados, {len(falhas)} falhas")
+    
+    return {
+        'document_ids': document_ids,
+        'falhas': falhas
+    }
+
+
 @rbac_required(
     allowed_roles=[ROLE_ORG_ADMIN, ROLE_PLATFORM_ADMIN],
     allow_cross_org=False,
@@ -210,6 +334,9 @@ def handle_knowledge_upload(request: Request, auth_context: AuthContext) -> tupl
         "file": <binary> ou "content_text": <string>
     }
     
+    Um arquivo .zip com vários documentos (TXT, MD, PDF) é importado em lote;
+    a resposta lista document_ids e falhas por arquivo (207 se parcial).
+    
     Args:
         request: Request HTTP do Flask
         auth_context: Contexto de autenticação injetado pelo decorator
@@ -247,14 +374,19 @@ def handle_knowledge_upload(request: Request, auth_context: AuthContext) -> tupl
             except:
                 metadata = {}
             
-            # Extrai texto do arquivo
-            try:
-                content_text = extract_text_from_file(file_content, content_type, filename)
-            except Exception as e:
-                return {
-                    'error': 'Erro ao extrair texto do arquivo',
-                    'message': str(e)
-                }, 400
+            # ZIP com vários documentos: extraído e vetorizado em lote após as validações
+            if is_archive(content_type, filename):
+                archive_content = file_content
+                content_text = None
+            else:
+                # Extrai texto do arquivo
+                try:
+                    content_text = extract_text_from_file(file_content, content_type, filename)
+                except Exception as e:
+                    return {
+                        'error': 'Erro ao extrair texto do arquivo',
+                        'message': str(e)
+                    }, 400
             
             # Salva arquivo no Storage (backup)
             file_url = save_file_to_storage(file_content, org_id, filename, content_type)
@@ -273,6 +405,7 @@ def handle_knowledge_upload(request: Request, auth_context: AuthContext) -> tupl
             content_text = payload.get('content_text')
             metadata = payload.get('metadata', {})
             file_url = ""
+            archive_content = None
             
             if not content_text:
                 return {'error': 'Campo "content_text" obrigatório quando não há arquivo'}, 400
@@ -289,10 +422,48 @@ def handle_knowledge_upload(request: Request, auth_context: AuthContext) -> tupl
                 'error': 'Você só pode fazer upload de documentos para sua própria organização'
             }, 403
         
+        # 4a. ZIP com vários documentos (importação em lote)
+        if archive_content is not None:
+            try:
+                resultado = process_and_vectorize_archive(
+                    org_id=org_id,
+                    title=titulo,
+                    archive_content=archive_content,
+                    tipo=tipo,
+                    metadata=metadata,
+                    file_url=file_url
+                )
+            except Exception as e:
+                logger.error(f"Erro ao processar ZIP: {e}")
+                return {
+                    'error': 'Erro ao processar e vetorizar documentos do ZIP',
+                    'message': str(e)
+                }, 400
+            
+            importados = len(resultado['document_ids'])
+            
+            if importados == 0:
+                return {
+                    'error': 'Nenhum documento do ZIP pôde ser indexado',
+                    'falhas': resultado['falhas']
+                }, 400
+            
+            return {
+                'status': 'success' if not resultado['falhas'] else 'partial',
+                'document_ids': resultado['document_ids'],
+                'falhas': resultado['falhas'],
+                'org_id': org_id,
+                'titulo': titulo,
+                'tipo': tipo,
+                'uploaded_by': auth_context.user_id,
+                'file_url': file_url if file_url else None,
+                'message': f'{importados} documento(s) vetorizado(s) e indexado(s)'
+            }, 201 if not resultado['falhas'] else 207
+        
         logger.info(f"Processando documento: {titulo} (tipo: {tipo})")
         logger.info(f"Tamanho: {len(content_text)} caracteres")
         
-        # 4. Processa e vetoriza o documento
+        # 4b. Processa e vetoriza o documento
         try:
             document_id = process_and_vectorize(
                 org_id=org_id,
@@ -340,11 +511,13 @@ def handle_knowledge_upload(request: Request, auth_context: AuthContext) -> tupl
 )
 def handle_list_documents(request: Request, auth_context: AuthContext) -> tuple[Dict[str, Any], int]:
     """
-    Lista documentos de conhecimento da organização.
+    Lista documentos de conhecimento da organização (chunks não são listados).
     
     Query params:
     - org_id: ID da organização (obrigatório se Platform Admin)
-    - tipo: Filtrar por tipo (opcional)
+    - tipo: Filtrar por tipo; aceita vários separados por vírgula (opcional)
+    - tags: Filtrar por tags em metadata.tags, separadas por vírgula (opcional)
+    - data_inicio / data_fim: Período de created_at em ISO 8601 (opcional)
     - limit: Número de resultados (padrão: 50)
     
     Args:
@@ -374,24 +547,47 @@ def handle_list_documents(request: Request, auth_context: AuthContext) -> tuple[
             }, 403
         
         # Parâmetros de filtro
-        tipo = request.args.get('tipo')
         limit = int(request.args.get('limit', 50))
         
+        try:
+            filters = normalize_filters({
+                'tipos': [t for t in request.args.get('tipo', '').split(',') if t],
+                'tags': [t for t in request.args.get('tags', '').split(',') if t],
+                'data_inicio': request.args.get('data_inicio'),
+                'data_fim': request.args.get('data_fim')
+            })
+        except ValueError as e:
+            return {'error': 'Filtro inválido', 'message': str(e)}, 400
+        
         # Busca no Firestore via RAGClient
         from google.cloud import firestore
         db = firestore.Client(project=PROJECT_ID)
         
-        query = db.collection('knowledge_base').where('org_id', '==', org_id)
+        # Apenas documentos: chunks (is_chunk=True) não são lidos
+        query = (
+            db.collection('knowledge_base')
+            .where('org_id', '==', org_id)
+            .where('is_chunk', '==', False)
+        )
+        
+        # Filtros suportados vão para a consulta; o restante é verificado em memória
+        query, residual_filters = apply_firestore_filters(query, filters)
         
-        if tipo:
-            query = query.where('tipo', '==', tipo)
+        query = query.order_by('created_at', direction=firestore.Query.DESCENDING)
         
-        query = query.limit(limit).order_by('created_at', direction=firestore.Query.DESCENDING)
+        if not residual_filters:
+            query = query.limit(limit)
         
         # Monta resultado
         documents = []
         for doc in query.stream():
+            if len(documents) >= limit:
+                break
+            
             doc_data = doc.to_dict()
+            if not matches_filters(doc_data, residual_filters):
+                continue
+            
             # Remove embedding da resposta (muito grande)
             doc_data.pop('embedding', None)
             doc_data['document_id'] = doc.id
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos formatos de armazenamento de embeddings (list, float16, int8).
+Mede bytes transferidos por documento, tempo de decodificação e o impacto
+da quantização no ranking (recall@k contra os vetores originais).
+
+Os bytes transferidos usam a codificação protobuf real quando o cliente
+do Firestore está instalado; caso contrário, uma estimativa equivalente
+(11 bytes por número no array, 3 de cabeçalho para bytes).
+
+Uso:
+    python scripts/bench_embedding_format.py --docs 5000 --dim 768
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Adiciona o diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from utils.embedding_codec import STORAGE_FORMATS, decode_embedding, encode_embedding
+
+
+def bytes_no_protocolo(valor) -> int:
+    """Tamanho do campo embedding codificado como Value do Firestore."""
+    try:
+        from google.cloud.firestore_v1 import _helpers
+        return _helpers.encode_value(valor)._pb.ByteSize()
+    except ImportError:
+        pass
+
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor) + 3
+
+    # double_value (1 + 8 bytes) dentro de cada Value do ArrayValue (+2 bytes)
+    return 11 * len(valor) + 3
+
+
+def main():
+    """Executa o benchmark e imprime a tabela por formato"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=5000, help='Número de documentos')
+    parser.add_argument('--dim', type=int, default=768, help='Dimensão dos embeddings')
+    parser.add_argument('--queries', type=int, default=100, help='Queries para o recall')
+    parser.add_argument('--top-k', type=int, default=3, help='k do recall@k')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK DE FORMATO DE EMBEDDINGS")
+    print("=" * 60)
+    print(f"Documentos: {args.docs} | Dimensão: {args.dim}")
+
+    rng = np.random.default_rng(42)
+    vetores = rng.normal(size=(args.docs, args.dim)).astype(np.float32)
+    vetores /= np.linalg.norm(vetores, axis=1, keepdims=True)
+    listas = vetores.astype(float).tolist()
+
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    verdade = np.argsort(-(queries @ vetores.T), axis=1)[:, :args.top_k]
+
+    print(f"\n{'formato':<10}{'bytes/doc':>12}{'total (MB)':>12}{'decode (ms)':>13}{'recall@k':>10}")
+
+    for storage_format in STORAGE_FORMATS:
+        docs = [encode_embedding(lista, storage_format) for lista in listas]
+        bytes_doc = bytes_no_protocolo(docs[0]['embedding'])
+
+        inicio = time.perf_counter()
+        matriz = np.asarray([decode_embedding(doc) for doc in docs], dtype=np.float32)
+        decode_ms = (time.perf_counter() - inicio) * 1000
+
+        matriz /= np.linalg.norm(matriz, axis=1, keepdims=True)
+        aproximado = np.argsort(-(queries @ matriz.T), axis=1)[:, :args.top_k]
+        recall = np.mean([len(set(a) & set(v)) / args.top_k for a, v in zip(aproximado, verdade)])
+
+        print(f"{storage_format:<10}{bytes_doc:>12}{bytes_doc * args.docs / 1e6:>12.2f}"
+              f"{decode_ms:>13.1f}{recall:>10.3f}")
+
+    print("\n💡 Migre com: python scripts/migrate_embedding_format.py --format float16")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Benchmark de recuperação da camada RAG (latência, memória e recall@k).
+Executa offline: Firestore em memória (scripts/fake_firestore.py) e um
+embedder determinístico por hashing de tokens, sem Vertex AI/OpenAI.
+
+Corpora sintéticos por tópico (1k, 10k, 100k documentos) com queries
+rotuladas:
+  - tópico: palavras do vocabulário de um tópico; relevantes = documentos do tópico
+  - termo exato: número de ato único ("Resolução 4512/2019"); relevante = 1 documento
+
+Para cada configuração (exact/ivf, vetorial/híbrida) mede:
+  - build: tempo e pico de memória (tracemalloc) da construção do índice
+  - p50/p95: latência de search_and_retrieve com caches desligados
+  - recall@k (exato): sobreposição com a busca exata por força bruta
+  - recall@k (rótulos): |recuperados ∩ relevantes| / min(k, |relevantes|)
+
+Uso:
+    python scripts/bench_rag.py --sizes 1000,10000,100000 --queries 200 --top-k 5
+    pytest scripts/bench_rag.py --benchmark-only    # com pytest-benchmark
+"""
+import argparse
+import functools
+import hashlib
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# Adiciona o diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from scripts.fake_firestore import FakeFirestoreClient
+from utils.bm25_index import tokenize
+from utils.embedding_cache import EmbeddingCache
+from utils.embedding_codec import FORMAT_FLOAT16, encode_embedding
+from utils.query_cache import QueryResultCache
+from utils.rag_client import RAGClient, VectorDBClient
+from utils.vector_index import BACKEND_EXACT, BACKEND_IVF
+
+ORG_ID = "org_bench"
+TIPOS = ['legislacao', 'politica_interna', 'precedente']
+SILABAS = ['ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'ni', 'po', 'ru', 'sa', 'te', 'vi', 'xo', 'zu', 'qua']
+# (backend, busca híbrida)
+CONFIGURACOES = [
+    (BACKEND_EXACT, False),
+    (BACKEND_EXACT, True),
+    (BACKEND_IVF, False),
+    (BACKEND_IVF, True),
+]
+
+
+class HashingEmbedder:
+    """
+    Embedder determinístico: soma de vetores aleatórios fixos por token
+    (semente = hash do token), normalizada. Textos com tokens em comum
+    ficam próximos, como num modelo real de embeddings.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self._tokens: Dict[str, np.ndarray] = {}
+        self.__name__ = f"hashing_{dim}"
+
+    def _vetor_token(self, token: str) -> np.ndarray:
+        vetor = self._tokens.get(token)
+        if vetor is None:
+            seed = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+            vetor = self._tokens[token] = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return vetor
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embedding normalizado de um texto."""
+        vetor = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text):
+            vetor += self._vetor_token(token)
+
+        norma = np.linalg.norm(vetor)
+        return vetor / norma if norma > 0 else vetor
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed(text).tolist() for text in texts]
+
+
+def _palavra(rng: np.random.Generator) -> str:
+    """Pseudo-palavra de 3 a 4 sílabas."""
+    return ''.join(rng.choice(SILABAS, size=int(rng.integers(3, 5))))
+
+
+def gerar_corpus(num_docs: int, seed: int = 42) -> Dict[str, Any]:
+    """
+    Gera documentos sintéticos agrupados por tópico (~25 documentos por tópico).
+
+    Args:
+        num_docs: Tamanho do corpus
+        seed: Semente
+
+    Returns:
+        Dicionário com docs (doc_id, titulo, conteudo, tipo, tags, topico, ato)
+        e o vocabulário de cada tópico
+    """
+    rng = np.random.default_rng(seed)
+    num_topicos = max(num_docs // 25, 4)
+    vocabulario = [[_palavra(rng) for _ in range(12)] for _ in range(num_topicos)]
+    comuns = [_palavra(rng) for _ in range(300)]
+    inicio = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+    docs = []
+    for i in range(num_docs):
+        topico = int(rng.integers(num_topicos))
+        palavras = list(rng.choice(vocabulario[topico], size=10)) + list(rng.choice(comuns, size=30))
+        rng.shuffle(palavras)
+        ato = f"{1000 + i}/{2000 + i % 25}"
+
+        docs.append({
+            'doc_id': f"kb_{i:06d}",
+            'titulo': f"Documento {i}",
+            'conteudo': f"Resolução {ato}. " + ' '.join(palavras) + '.',
+            'tipo': TIPOS[i % len(TIPOS)],
+            'tags': [f"tema_{topico % 10}"],
+            'created_at': inicio + timedelta(hours=i),
+            'topico': topico,
+            'ato': ato,
+        })
+
+    return {'docs': docs, 'vocabulario': vocabulario}
+
+
+def gerar_queries(corpus: Dict[str, Any], num_queries: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """
+    Gera queries rotuladas (metade por tópico, metade por termo exato).
+
+    Returns:
+        Lista de {texto, relevantes (conjunto de doc_ids), tipo}
+    """
+    rng = np.random.default_rng(seed)
+    docs = corpus['docs']
+    por_topico: Dict[int, set] = {}
+    for doc in docs:
+        por_topico.setdefault(doc['topico'], set()).add(doc['doc_id'])
+
+    queries = []
+    for i in range(num_queries):
+        if i % 2 == 0:
+            topico = int(rng.choice(list(por_topico)))
+            palavras = rng.choice(corpus['vocabulario'][topico], size=4, replace=False)
+            queries.append({'texto': ' '.join(palavras), 'relevantes': por_topico[topico], 'tipo': 'topico'})
+        else:
+            doc = docs[int(rng.integers(len(docs)))]
+            queries.append({'texto': f"Resolução {doc['ato']}", 'relevantes': {doc['doc_id']}, 'tipo': 'termo'})
+
+    return queries
+
+
+def popular_firestore(corpus: Dict[str, Any], embedder: HashingEmbedder) -> Tuple[FakeFirestoreClient, np.ndarray]:
+    """
+    Grava o corpus no Firestore em memória (embeddings float16) e o carimbo de versão.
+
+    Returns:
+        Tupla (cliente Firestore, matriz de embeddings normalizados na ordem dos docs)
+    """
+    db = FakeFirestoreClient()
+    documentos = {}
+    matriz = np.zeros((len(corpus['docs']), embedder.dim), dtype=np.float32)
+
+    for i, doc in enumerate(corpus['docs']):
+        matriz[i] = embedder.embed(doc['conteudo'])
+        documentos[doc['doc_id']] = {
+            'org_id': ORG_ID,
+            'titulo': doc['titulo'],
+            'conteudo': doc['conteudo'],
+            'tipo': doc['tipo'],
+            'metadata': {'tags': doc['tags']},
+            'created_at': doc['created_at'],
+            **encode_embedding(matriz[i].tolist(), FORMAT_FLOAT16),
+        }
+
+    db.load('knowledge_base', documentos)
+    db.load('knowledge_base_versions', {ORG_ID: {'version': 1}})
+
+    return db, matriz
+
+
+def criar_cliente(db: FakeFirestoreClient, embedder: HashingEmbedder, backend: str, hibrida: bool) -> RAGClient:
+    """Cliente RAG sobre o Firestore em memória, com caches desligados."""
+    vector_db = VectorDBClient(
+        index_backend=backend,
+        embedding_cache=EmbeddingCache(max_bytes=0),
+        db=db,
+        embedding_fn=embedder
+    )
+    # Sempre constrói o índice (sem RAG_INDEX_STORE) e usa IVF mesmo em corpora pequenos
+    vector_db.index_store = None
+    vector_db.ann_min_docs = 0
+    vector_db.hybrid_search = hibrida
+
+    return RAGClient(vector_db=vector_db, query_cache=QueryResultCache(max_entries=0))
+
+
+def forca_bruta(matriz: np.ndarray, doc_ids: List[str], query: np.ndarray, top_k: int) -> set:
+    """Top-k exato por similaridade de cosseno."""
+    scores = matriz @ query
+    top = np.argpartition(-scores, min(top_k, len(scores) - 1))[:top_k]
+    return {doc_ids[pos] for pos in top}
+
+
+def medir_configuracao(
+    db: FakeFirestoreClient,
+    embedder: HashingEmbedder,
+    matriz: np.ndarray,
+    doc_ids: List[str],
+    queries: List[Dict[str, Any]],
+    backend: str,
+    hibrida: bool,
+    top_k: int
+) -> Dict[str, float]:
+    """
+    Mede build, latência e recall de uma configuração.
+
+    Returns:
+        Métricas da configuração
+    """
+    rag = criar_cliente(db, embedder, backend, hibrida)
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    index = rag.vector_db.get_org_index(ORG_ID)
+    if hibrida:
+        rag.vector_db.get_org_lexical_index(ORG_ID, index)
+    build_s = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencias = []
+    recall_exato = []
+    recall_rotulos = {'topico': [], 'termo': []}
+
+    for query in queries:
+        inicio = time.perf_counter()
+        resposta = rag.search_and_retrieve(query['texto'], ORG_ID, top_k=top_k, min_similarity=0.0)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+        recuperados = {r['doc_id'] for r in resposta['results']}
+        verdade = forca_bruta(matriz, doc_ids, embedder.embed(query['texto']), top_k)
+        recall_exato.append(len(recuperados & verdade) / top_k)
+
+        relevantes = query['relevantes']
+        recall_rotulos[query['tipo']].append(len(recuperados & relevantes) / min(top_k, len(relevantes)))
+
+    indice_mb = index.matrix.nbytes / 1e6
+    if hibrida:
+        indice_mb += len(rag.vector_db.get_org_lexical_index(ORG_ID, index).to_bytes()) / 1e6
+
+    return {
+        'build_s': build_s,
+        'pico_mb': pico / 1e6,
+        'indice_mb': indice_mb,
+        'p50_ms': float(np.percentile(latencias, 50)),
+        'p95_ms': float(np.percentile(latencias, 95)),
+        'recall_exato': float(np.mean(recall_exato)),
+        'recall_topico': float(np.mean(recall_rotulos['topico'])) if recall_rotulos['topico'] else 0.0,
+        'recall_termo': float(np.mean(recall_rotulos['termo'])) if recall_rotulos['termo'] else 0.0,
+        'leituras': db.reads,
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def cenario(num_docs: int, num_queries: int = 50, dim: int = 256):
+    """Corpus, Firestore populado e queries (reaproveitados entre configurações)."""
+    embedder = HashingEmbedder(dim)
+    corpus = gerar_corpus(num_docs)
+    db, matriz = popular_firestore(corpus, embedder)
+    doc_ids = [doc['doc_id'] for doc in corpus['docs']]
+
+    return embedder, db, matriz, doc_ids, gerar_queries(corpus, num_queries)
+
+
+def _bench_pytest(benchmark, backend: str, hibrida: bool) -> None:
+    """Latência de search_and_retrieve em 1k documentos (pytest-benchmark)."""
+    embedder, db, _, _, queries = cenario(1000)
+    rag = criar_cliente(db, embedder, backend, hibrida)
+    rag.vector_db.get_org_index(ORG_ID)
+    textos = iter([query['texto'] for query in queries] * 1000)
+
+    benchmark(lambda: rag.search_and_retrieve(next(textos), ORG_ID, top_k=5, min_similarity=0.0))
+
+
+def test_bench_exact(benchmark):
+    _bench_pytest(benchmark, BACKEND_EXACT, False)
+
+
+def test_bench_exact_hibrida(benchmark):
+    _bench_pytest(benchmark, BACKEND_EXACT, True)
+
+
+def test_bench_ivf(benchmark):
+    _bench_pytest(benchmark, BACKEND_IVF, False)
+
+
+def test_bench_ivf_hibrida(benchmark):
+    _bench_pytest(benchmark, BACKEND_IVF, True)
+
+
+def main():
+    """Executa o benchmark e imprime a tabela por tamanho de corpus e configuração"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Tamanhos de corpus (separados por vírgula)')
+    parser.add_argument('--queries', type=int, default=200, help='Número de queries rotuladas')
+    parser.add_argument('--top-k', type=int, default=5, help='k do recall@k')
+    parser.add_argument('--dim', type=int, default=256, help='Dimensão do embedder determinístico')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK DE RECUPERAÇÃO RAG (offline)")
+    print("=" * 60)
+    print(f"Queries: {args.queries} | k={args.top_k} | Dimensão: {args.dim}")
+
+    for num_docs in [int(v) for v in args.sizes.split(',')]:
+        inicio = time.perf_counter()
+        embedder, db, matriz, doc_ids, queries = cenario(num_docs, args.queries, args.dim)
+        print(f"\n📚 {num_docs} documentos (corpus gerado em {time.perf_counter() - inicio:.1f}s)")
+        print(f"{'config':<14}{'build (s)':>10}{'pico (MB)':>11}{'índice (MB)':>12}{'p50 (ms)':>10}"
+              f"{'p95 (ms)':>10}{'rec exato':>10}{'rec tópico':>11}{'rec termo':>10}")
+
+        for backend, hibrida in CONFIGURACOES:
+            db.reset_counters()
+            m = medir_configuracao(db, embedder, matriz, doc_ids, queries, backend, hibrida, args.top_k)
+            nome = f"{backend}{'+bm25' if hibrida else ''}"
+            print(f"{nome:<14}{m['build_s']:>10.2f}{m['pico_mb']:>11.1f}{m['indice_mb']:>12.1f}"
+                  f"{m['p50_ms']:>10.2f}{m['p95_ms']:>10.2f}{m['recall_exato']:>10.3f}"
+                  f"{m['recall_topico']:>11.3f}{m['recall_termo']:>10.3f}")
+
+        cenario.cache_clear()
+
+    print("\n💡 rec exato: sobreposição com a força bruta; rec tópico/termo: contra os rótulos das queries")
+
+
+if __name__ == "__main__":
+    main()
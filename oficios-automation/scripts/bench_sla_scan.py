@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark da varredura de SLA do W2 (Firestore em memória).
+
+Compara a varredura anterior (todos os ofícios da organização, filtro de
+status e prazo em Python) com a consulta por índice (status in [...] e
+data_limite < horizonte, com projeção e cursor). Mede documentos lidos,
+bytes transferidos e tempo; os documentos lidos são o que o Firestore
+cobra, e crescem com o histórico apenas na varredura anterior.
+
+Uso:
+    python scripts/bench_sla_scan.py --orgs 5 --historico 20000 --abertos 300
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from scripts.fake_firestore import FakeFirestoreClient
+from utils.api_clients import FirestoreClient
+from utils.schema import OficioStatus
+
+STATUS_MONITORADOS = [
+    OficioStatus.AGUARDANDO_COMPLIANCE.value,
+    OficioStatus.EM_ANALISE_COMPLIANCE.value,
+    OficioStatus.EM_REVISAO.value,
+    OficioStatus.AGUARDANDO_RESPOSTA.value,
+    OficioStatus.AGUARDANDO_ENVIO.value
+]
+STATUS_FECHADOS = [OficioStatus.RESPONDIDO.value, OficioStatus.REPROVADO_COMPLIANCE.value]
+
+CAMPOS_ALERTA = [
+    'status',
+    'data_limite',
+    'prioridade',
+    'assigned_user_id',
+    'dados_extraidos.autoridade_nome',
+    'dados_extraidos.processo_numero'
+]
+
+
+def popular(orgs: int, historico: int, abertos: int, tamanho_texto: int) -> FakeFirestoreClient:
+    """Ofícios fechados (histórico de anos) e abertos com prazos de -5 a +30 dias."""
+    rng = random.Random(42)
+    agora = datetime.utcnow()
+    texto = 'x' * tamanho_texto
+    db = FakeFirestoreClient()
+
+    for o in range(orgs):
+        org_id = f"org{o}"
+        docs = {}
+
+        for i in range(historico + abertos):
+            aberto = i >= historico
+            data_limite = agora + (
+                timedelta(hours=rng.uniform(-120, 720)) if aberto else timedelta(days=-rng.uniform(10, 1500))
+            )
+            docs[f"{org_id}-{i:06d}"] = {
+                'org_id': org_id,
+                'status': rng.choice(STATUS_MONITORADOS if aberto else STATUS_FECHADOS),
+                'data_limite': data_limite.isoformat(),
+                'prioridade': rng.choice(['ALTA', 'MEDIA', 'BAIXA']),
+                'assigned_user_id': f"user{rng.randint(0, 20)}" if rng.random() < 0.8 else None,
+                'conteudo_bruto': texto,
+                'dados_extraidos': {
+                    'autoridade_nome': 'Juiz Federal',
+                    'processo_numero': f"{i:07d}-00.2024.4.03.6100",
+                    'solicitacoes': ['Extratos bancários'] * 5,
+                    'raw_text': texto
+                }
+            }
+
+        db.load('oficios', docs)
+
+    return db
+
+
+def _bytes(oficio: dict) -> int:
+    return len(json.dumps(oficio, default=str))
+
+
+def varredura_anterior(db: FakeFirestoreClient, org_id: str, horizonte: str):
+    """Versão anterior: stream de todos os ofícios da organização."""
+    em_risco, transferidos = [], 0
+
+    for doc in db.collection('oficios').where('org_id', '==', org_id).stream():
+        oficio = doc.to_dict()
+        transferidos += _bytes(oficio)
+        if oficio.get('status') in STATUS_MONITORADOS and oficio.get('data_limite', '') < horizonte:
+            em_risco.append(doc.id)
+
+    return em_risco, transferidos
+
+
+def varredura_indexada(client: FirestoreClient, org_id: str, horizonte: str, page_size: int):
+    """Consulta por índice com projeção e cursor (iterar_oficios_em_risco do W2)."""
+    em_risco, transferidos, cursor = [], 0, None
+
+    while True:
+        oficios, cursor = client.list_oficios_em_risco(
+            org_id, STATUS_MONITORADOS, horizonte, fields=CAMPOS_ALERTA, limit=page_size, cursor=cursor
+        )
+        for oficio in oficios:
+            transferidos += _bytes(oficio)
+            em_risco.append(oficio['oficio_id'])
+        if cursor is None:
+            break
+
+    return em_risco, transferidos
+
+
+def medir(db: FakeFirestoreClient, funcao, orgs: int, horizonte: str, *args):
+    db.reset_counters()
+    inicio = time.perf_counter()
+    encontrados, transferidos = {}, 0
+
+    for o in range(orgs):
+        ids, total = funcao(f"org{o}", horizonte, *args)
+        encontrados[f"org{o}"] = sorted(ids)
+        transferidos += total
+
+    return encontrados, db.reads, transferidos, time.perf_counter() - inicio
+
+
+def main():
+    """Executa o benchmark e imprime a comparação"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orgs', type=int, default=5, help='Organizações')
+    parser.add_argument('--historico', type=int, default=20000, help='Ofícios fechados por organização')
+    parser.add_argument('--abertos', type=int, default=300, help='Ofícios abertos por organização')
+    parser.add_argument('--texto-kb', type=int, default=8, help='Tamanho do conteudo_bruto (KB)')
+    parser.add_argument('--page-size', type=int, default=200, help='Ofícios por página na consulta indexada')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK DA VARREDURA DE SLA (W2)")
+    print("=" * 60)
+    print(f"Organizações: {args.orgs} | Histórico: {args.historico} | Abertos: {args.abertos} por organização")
+
+    db = popular(args.orgs, args.historico, args.abertos, args.texto_kb * 1024)
+    client = FirestoreClient(db=db)
+    horizonte = (datetime.utcnow() + timedelta(hours=72)).isoformat()
+
+    anterior = medir(db, lambda org_id, h: varredura_anterior(db, org_id, h), args.orgs, horizonte)
+    indexada = medir(
+        db, lambda org_id, h: varredura_indexada(client, org_id, h, args.page_size), args.orgs, horizonte
+    )
+
+    if anterior[0] != indexada[0]:
+        print("❌ As varreduras encontraram ofícios diferentes")
+        sys.exit(1)
+
+    print(f"✅ Mesmos ofícios em risco: {sum(len(ids) for ids in anterior[0].values())}")
+
+    print(f"\n{'Varredura':<20}{'leituras':>12}{'MB transferidos':>18}{'tempo (s)':>12}")
+    for nome, (_, leituras, transferidos, tempo) in (('anterior', anterior), ('indexada', indexada)):
+        print(f"{nome:<20}{leituras:>12}{transferidos / 1024 / 1024:>18.2f}{tempo:>12.2f}")
+
+    print(f"\n📊 Leituras: {anterior[1] / max(indexada[1], 1):.0f}x menos; "
+          f"bytes: {anterior[2] / max(indexada[2], 1):.0f}x menos")
+    print("   (o tempo em memória não reflete o índice: o Firestore não examina os documentos fora dele)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark da varredura de CPF/CNPJ em textos de OCR.
+
+Compara a implementação anterior (dois re.findall com padrões compilados a
+cada chamada e dígitos verificadores via int() por caractere) com a
+varredura única de utils.validation, em textos sintéticos de ~1 MB com
+documentos válidos, inválidos, repetidos e ruído de OCR. Confere que os dois
+caminhos encontram os mesmos documentos.
+
+Uso:
+    python scripts/bench_validation.py --size-mb 1 --textos 5
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from utils.validation import extrair_e_validar_documentos, extrair_e_validar_documentos_em_lote
+
+PALAVRAS = (
+    "ofício processo autos vara juízo requisição informações bancárias extrato "
+    "conta corrente agência titular período movimentação prazo dias úteis "
+    "sob pena desobediência encaminhar fornecer bloqueio valores"
+).split()
+
+
+def _legado_cpf(cpf: str) -> bool:
+    cpf = re.sub(r'[^0-9]', '', cpf)
+    if len(cpf) != 11 or cpf == cpf[0] * 11:
+        return False
+    soma = sum(int(cpf[i]) * (10 - i) for i in range(9))
+    if int(cpf[9]) != (soma * 10 % 11) % 10:
+        return False
+    soma = sum(int(cpf[i]) * (11 - i) for i in range(10))
+    return int(cpf[10]) == (soma * 10 % 11) % 10
+
+
+def _legado_cnpj(cnpj: str) -> bool:
+    cnpj = re.sub(r'[^0-9]', '', cnpj)
+    if len(cnpj) != 14 or cnpj == cnpj[0] * 14:
+        return False
+    peso = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
+    digito = sum(int(cnpj[i]) * peso[i] for i in range(12)) % 11
+    if int(cnpj[12]) != (0 if digito < 2 else 11 - digito):
+        return False
+    peso = [6] + peso
+    digito = sum(int(cnpj[i]) * peso[i] for i in range(13)) % 11
+    return int(cnpj[13]) == (0 if digito < 2 else 11 - digito)
+
+
+def legado(texto: str) -> dict:
+    """Implementação anterior de extrair_e_validar_documentos (referência)."""
+    cpfs = re.findall(r'\b\d{3}[\.\s]?\d{3}[\.\s]?\d{3}[\-\.\s]?\d{2}\b', texto)
+    cnpjs = re.findall(r'\b\d{2}[\.\s]?\d{3}[\.\s]?\d{3}[\-\/\.\s]?\d{4}[\-\.\s]?\d{2}\b', texto)
+
+    resultado = {'cpfs_validos': [], 'cpfs_invalidos': [], 'cnpjs_validos': [], 'cnpjs_invalidos': []}
+    for cpf in cpfs:
+        resultado['cpfs_validos' if _legado_cpf(cpf) else 'cpfs_invalidos'].append(cpf)
+    for cnpj in cnpjs:
+        resultado['cnpjs_validos' if _legado_cnpj(cnpj) else 'cnpjs_invalidos'].append(cnpj)
+
+    return resultado
+
+
+def _gerar_cpf(rng: random.Random) -> str:
+    d = [rng.randint(0, 9) for _ in range(9)]
+    for pesos in (range(10, 1, -1), range(11, 1, -1)):
+        d.append(sum(x * p for x, p in zip(d, pesos)) * 10 % 11 % 10)
+    if rng.random() < 0.2:
+        d[-1] = (d[-1] + 1) % 10
+    s = ''.join(map(str, d))
+    return f"{s[:3]}.{s[3:6]}.{s[6:9]}-{s[9:]}" if rng.random() < 0.7 else s
+
+
+def _gerar_cnpj(rng: random.Random) -> str:
+    d = [rng.randint(0, 9) for _ in range(8)] + [0, 0, 0, 1]
+    for pesos in ([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]):
+        resto = sum(x * p for x, p in zip(d, pesos)) % 11
+        d.append(0 if resto < 2 else 11 - resto)
+    if rng.random() < 0.2:
+        d[-1] = (d[-1] + 1) % 10
+    s = ''.join(map(str, d))
+    return f"{s[:2]}.{s[2:5]}.{s[5:8]}/{s[8:12]}-{s[12:]}" if rng.random() < 0.7 else s
+
+
+def gerar_texto(rng: random.Random, tamanho: int) -> str:
+    """Texto de OCR sintético: prosa, valores, datas e documentos (parte repetida)."""
+    recorrentes = [_gerar_cpf(rng) for _ in range(20)] + [_gerar_cnpj(rng) for _ in range(10)]
+    partes = []
+    total = 0
+
+    while total < tamanho:
+        sorteio = rng.random()
+        if sorteio < 0.02:
+            parte = rng.choice(recorrentes)
+        elif sorteio < 0.03:
+            parte = _gerar_cpf(rng) if rng.random() < 0.6 else _gerar_cnpj(rng)
+        elif sorteio < 0.08:
+            parte = f"R$ {rng.randint(1, 99999)},{rng.randint(0, 99):02d} em {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2024"
+        elif sorteio < 0.10:
+            parte = f"\nPágina {rng.randint(1, 300)} de 300\n"
+        else:
+            parte = rng.choice(PALAVRAS)
+
+        partes.append(parte)
+        total += len(parte) + 1
+
+    return ' '.join(partes)
+
+
+def cronometrar(funcao, *args, repeticoes: int) -> float:
+    """Melhor tempo (segundos) entre as repetições."""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(*args)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    """Executa o benchmark e imprime a comparação"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=1.0, help='Tamanho de cada texto em MB')
+    parser.add_argument('--textos', type=int, default=5, help='Textos no lote')
+    parser.add_argument('--repeticoes', type=int, default=5, help='Repetições (vale o melhor tempo)')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK DA VARREDURA DE CPF/CNPJ")
+    print("=" * 60)
+
+    rng = random.Random(42)
+    textos = [gerar_texto(rng, int(args.size_mb * 1024 * 1024)) for _ in range(args.textos)]
+    print(f"Textos: {len(textos)} x {len(textos[0]) / 1024 / 1024:.2f} MB")
+
+    for texto in textos:
+        esperado = {k: sorted(v) for k, v in legado(texto).items()}
+        obtido = {k: sorted(v) for k, v in extrair_e_validar_documentos(texto).items()}
+        if esperado != obtido:
+            print("❌ Resultados divergentes da implementação anterior")
+            sys.exit(1)
+
+    documentos = sum(len(v) for v in legado(textos[0]).values())
+    print(f"✅ Mesmos documentos da implementação anterior ({documentos} no primeiro texto)")
+
+    t_legado = cronometrar(lambda: [legado(t) for t in textos], repeticoes=args.repeticoes)
+    t_novo = cronometrar(lambda: [extrair_e_validar_documentos(t) for t in textos], repeticoes=args.repeticoes)
+    t_lote = cronometrar(extrair_e_validar_documentos_em_lote, textos, repeticoes=args.repeticoes)
+
+    print(f"\n{'Implementação':<28}{'ms/texto':>12}{'MB/s':>10}{'speedup':>10}")
+    for nome, tempo in (('anterior (2x findall)', t_legado), ('varredura única', t_novo), ('varredura única (lote)', t_lote)):
+        mb = args.size_mb * len(textos)
+        print(f"{nome:<28}{tempo / len(textos) * 1000:>12.1f}{mb / tempo:>10.1f}{t_legado / tempo:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
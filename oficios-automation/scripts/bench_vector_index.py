@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark de recall e latência dos backends de índice vetorial.
+Compara o índice aproximado (IVF-flat) com a busca exata para escolher
+nlist/nprobe por organização.
+
+Uso:
+    python scripts/bench_vector_index.py --docs 20000 --dim 768 --nlist 64,128 --nprobe 4,8,16
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Adiciona o diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from utils.vector_index import BACKEND_EXACT, BACKEND_IVF, build_index
+
+
+def gerar_corpus(num_docs: int, dim: int, num_topicos: int, seed: int = 42):
+    """
+    Gera um corpus sintético agrupado por tópicos (similar a chunks de legislação).
+
+    Returns:
+        Tupla (embeddings, centros dos tópicos)
+    """
+    rng = np.random.default_rng(seed)
+    centros = rng.normal(scale=0.6, size=(num_topicos, dim)).astype(np.float32)
+    topicos = rng.integers(0, num_topicos, size=num_docs)
+    ruido = rng.normal(scale=1.0, size=(num_docs, dim)).astype(np.float32)
+
+    return centros[topicos] + ruido, centros
+
+
+def gerar_queries(centros: np.ndarray, num_queries: int, seed: int = 7) -> np.ndarray:
+    """Gera queries como perturbações dos tópicos (vizinhos espalhados entre grupos)."""
+    rng = np.random.default_rng(seed)
+    base = centros[rng.integers(0, len(centros), size=num_queries)]
+
+    return base + rng.normal(scale=1.0, size=base.shape).astype(np.float32)
+
+
+def medir(index, queries: np.ndarray, top_k: int):
+    """
+    Executa as queries no índice.
+
+    Returns:
+        Tupla (lista de conjuntos de posições, latências em ms)
+    """
+    resultados = []
+    latencias = []
+
+    for query in queries:
+        inicio = time.perf_counter()
+        hits = index.search(query, top_k)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        resultados.append({pos for pos, _ in hits})
+
+    return resultados, np.array(latencias)
+
+
+def main():
+    """Executa o benchmark e imprime a tabela de recall/latência"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=20000, help='Tamanho do corpus')
+    parser.add_argument('--dim', type=int, default=768, help='Dimensão dos embeddings')
+    parser.add_argument('--topicos', type=int, default=200, help='Número de tópicos sintéticos')
+    parser.add_argument('--queries', type=int, default=200, help='Número de queries')
+    parser.add_argument('--top-k', type=int, default=3, help='k do recall@k')
+    parser.add_argument('--nlist', default='64,128', help='Valores de nlist (separados por vírgula)')
+    parser.add_argument('--nprobe', default='4,8,16', help='Valores de nprobe (separados por vírgula)')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK DE ÍNDICE VETORIAL (exact vs ivf)")
+    print("=" * 60)
+    print(f"Documentos: {args.docs} | Dimensão: {args.dim} | Queries: {args.queries} | k={args.top_k}")
+
+    embeddings, centros = gerar_corpus(args.docs, args.dim, args.topicos)
+    queries = gerar_queries(centros, args.queries)
+    doc_ids = [f"doc_{i}" for i in range(args.docs)]
+    payloads = [{} for _ in range(args.docs)]
+
+    inicio = time.perf_counter()
+    exato = build_index(BACKEND_EXACT, doc_ids, embeddings, payloads)
+    build_exato = time.perf_counter() - inicio
+
+    verdade, lat_exato = medir(exato, queries, args.top_k)
+
+    print(f"\n{'backend':<22}{'build (s)':>10}{'recall@k':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}")
+    print(f"{'exact':<22}{build_exato:>10.2f}{1.0:>10.3f}"
+          f"{np.percentile(lat_exato, 50):>10.3f}{np.percentile(lat_exato, 95):>10.3f}")
+
+    for nlist in [int(v) for v in args.nlist.split(',')]:
+        inicio = time.perf_counter()
+        ivf = build_index(BACKEND_IVF, doc_ids, embeddings, payloads, nlist=nlist)
+        build_ivf = time.perf_counter() - inicio
+
+        for nprobe in [int(v) for v in args.nprobe.split(',')]:
+            ivf.nprobe = nprobe
+            aproximado, lat_ivf = medir(ivf, queries, args.top_k)
+
+            recall = np.mean([
+                len(a & v) / max(len(v), 1) for a, v in zip(aproximado, verdade)
+            ])
+
+            nome = f"ivf nlist={nlist} np={nprobe}"
+            print(f"{nome:<22}{build_ivf:>10.2f}{recall:>10.3f}"
+                  f"{np.percentile(lat_ivf, 50):>10.3f}{np.percentile(lat_ivf, 95):>10.3f}")
+
+    print("\n💡 Configure por organização em organizations/{org_id}.settings.rag_index")
+    print('   ex: {"backend": "ivf", "nlist": 128, "nprobe": 8}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Firestore em memória para benchmarks offline.
+Implementa o subconjunto da API usado pelos clientes do projeto: coleções e
+subcoleções, consultas (where/order_by/limit/start_after/select) e collection
+groups, escritas em lote, transações, get_all e os sentinelas SERVER_TIMESTAMP,
+DELETE_FIELD, Increment e ArrayUnion. Conta leituras e escritas de documentos.
+"""
+import copy
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from google.cloud import firestore
+
+_DELETE = object()
+
+
+def _get_field(data: Dict[str, Any], path: str) -> Any:
+    """Lê um campo com caminho pontilhado (ex: metadata.tags)."""
+    value: Any = data
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _set_field(data: Dict[str, Any], path: str, value: Any) -> None:
+    """Grava um campo com caminho pontilhado, criando mapas intermediários."""
+    parts = path.split('.')
+    target = data
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+
+    if value is _DELETE:
+        target.pop(parts[-1], None)
+    else:
+        target[parts[-1]] = value
+
+
+def _project(data: Dict[str, Any], field_paths: List[str]) -> Dict[str, Any]:
+    """Projeção de campos (select / get(field_paths=...))."""
+    projected: Dict[str, Any] = {}
+    for path in field_paths:
+        value = _get_field(data, path)
+        if value is not None:
+            _set_field(projected, path, value)
+    return projected
+
+
+def _resolve(current: Any, value: Any) -> Any:
+    """Aplica sentinelas do Firestore ao valor atual do campo."""
+    if value is firestore.SERVER_TIMESTAMP:
+        return datetime.now(timezone.utc)
+    if value is firestore.DELETE_FIELD:
+        return _DELETE
+    if isinstance(value, firestore.Increment):
+        return (current or 0) + value.value
+    if isinstance(value, firestore.ArrayUnion):
+        items = list(current or [])
+        items.extend(item for item in value.values if item not in items)
+        return items
+    if isinstance(value, firestore.ArrayRemove):
+        return [item for item in (current or []) if item not in value.values]
+    if isinstance(value, dict):
+        base = current if isinstance(current, dict) else {}
+        return {key: _resolve(base.get(key), item) for key, item in value.items()}
+    return value
+
+
+def _merge(target: Dict[str, Any], data: Dict[str, Any]) -> None:
+    """Mescla recursivamente (semântica de set(..., merge=True))."""
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+            continue
+
+        resolved = _resolve(target.get(key), value)
+        if resolved is _DELETE:
+            target.pop(key, None)
+        else:
+            target[key] = resolved
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    """Ordenação entre tipos no estilo do Firestore (None primeiro)."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, value.timestamp())
+    if isinstance(value, str):
+        return (4, value)
+    return (5, str(value))
+
+
+_OPERATORS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a is not None and a != b,
+    '<': lambda a, b: a is not None and _sort_key(a) < _sort_key(b),
+    '<=': lambda a, b: a is not None and _sort_key(a) <= _sort_key(b),
+    '>': lambda a, b: a is not None and _sort_key(a) > _sort_key(b),
+    '>=': lambda a, b: a is not None and _sort_key(a) >= _sort_key(b),
+    'in': lambda a, b: a in b,
+    'not-in': lambda a, b: a is not None and a not in b,
+    'array_contains': lambda a, b: isinstance(a, list) and b in a,
+    'array_contains_any': lambda a, b: isinstance(a, list) and any(item in a for item in b),
+}
+_OPERATORS['array-contains'] = _OPERATORS['array_contains']
+_OPERATORS['array-contains-any'] = _OPERATORS['array_contains_any']
+_OPERATORS['not_in'] = _OPERATORS['not-in']
+
+
+class FakeDocumentSnapshot:
+    """Snapshot de documento."""
+
+    def __init__(self, reference: 'FakeDocumentReference', data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field: str) -> Any:
+        return _get_field(self._data or {}, field)
+
+
+class FakeDocumentReference:
+    """Referência de documento."""
+
+    def __init__(self, client: 'FakeFirestoreClient', collection_path: str, doc_id: str):
+        self._client = client
+        self._collection_path = collection_path
+        self.id = doc_id
+        self.path = f"{collection_path}/{doc_id}"
+
+    def collection(self, name: str) -> 'FakeCollectionReference':
+        return FakeCollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, field_paths: Optional[List[str]] = None, transaction: Any = None) -> FakeDocumentSnapshot:
+        data = self._client._docs(self._collection_path).get(self.id)
+        self._client.reads += 1
+
+        if data is not None and field_paths is not None:
+            data = _project(data, field_paths)
+
+        return FakeDocumentSnapshot(self, copy.deepcopy(data) if data is not None else None)
+
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        self._client._write(self, 'set', data, merge)
+
+    def create(self, data: Dict[str, Any]) -> None:
+        if self.id in self._client._docs(self._collection_path):
+            raise ValueError(f"Documento já existe: {self.path}")
+        self._client._write(self, 'set', data, False)
+
+    def update(self, data: Dict[str, Any]) -> None:
+        if self.id not in self._client._docs(self._collection_path):
+            raise ValueError(f"Documento não encontrado: {self.path}")
+        self._client._write(self, 'update', data, False)
+
+    def delete(self) -> None:
+        self._client._write(self, 'delete', None, False)
+
+
+class FakeQuery:
+    """Consulta imutável sobre uma coleção."""
+
+    def __init__(self, client: 'FakeFirestoreClient', collection_path: str, filters=(), orders=(),
+                 limit_count: Optional[int] = None, cursor: Optional[Any] = None,
+                 fields: Optional[List[str]] = None, all_descendants: bool = False):
+        self._client = client
+        self._collection_path = collection_path
+        self._all_descendants = all_descendants
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit_count
+        self._cursor = cursor
+        self._fields = fields
+
+    def _copy(self, **changes) -> 'FakeQuery':
+        params = {
+            'filters': self._filters,
+            'orders': self._orders,
+            'limit_count': self._limit,
+            'cursor': self._cursor,
+            'fields': self._fields,
+            'all_descendants': self._all_descendants,
+        }
+        params.update(changes)
+        return FakeQuery(self._client, self._collection_path, **params)
+
+    def where(self, field_path: str = None, op_string: str = None, value: Any = None, filter: Any = None) -> 'FakeQuery':
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = 'ASCENDING') -> 'FakeQuery':
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> 'FakeQuery':
+        return self._copy(limit_count=count)
+
+    def start_after(self, document_fields_or_snapshot: Any) -> 'FakeQuery':
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def select(self, field_paths: List[str]) -> 'FakeQuery':
+        return self._copy(fields=list(field_paths))
+
+    def _matches(self, data: Dict[str, Any]) -> bool:
+        return all(_OPERATORS[op](_get_field(data, field), value) for field, op, value in self._filters)
+
+    def _sources(self) -> List[str]:
+        """Coleções consultadas (todas as de mesmo id em um collection group)."""
+        if not self._all_descendants:
+            return [self._collection_path]
+        return [path for path in list(self._client._collections) if path.rsplit('/', 1)[-1] == self._collection_path]
+
+    def stream(self, transaction: Any = None) -> Iterator[FakeDocumentSnapshot]:
+        docs = [(f"{path}/{doc_id}", path, doc_id, data)
+                for path in self._sources()
+                for doc_id, data in self._client._docs(path).items()
+                if self._matches(data)]
+
+        orders = list(self._orders) or [('__name__', 'ASCENDING')]
+        for field, direction in reversed(orders):
+            docs.sort(
+                key=lambda item: _sort_key(item[0] if field == '__name__' else _get_field(item[3], field)),
+                reverse=str(direction).upper().endswith('DESCENDING')
+            )
+
+        if self._cursor is not None:
+            cursor_path = getattr(getattr(self._cursor, 'reference', None), 'path', None)
+            paths = [item[0] for item in docs]
+            if cursor_path in paths:
+                docs = docs[paths.index(cursor_path) + 1:]
+
+        if self._limit is not None:
+            docs = docs[:self._limit]
+
+        for _, path, doc_id, data in docs:
+            self._client.reads += 1
+            data = copy.deepcopy(_project(data, self._fields) if self._fields is not None else data)
+            yield FakeDocumentSnapshot(FakeDocumentReference(self._client, path, doc_id), data)
+
+    def get(self, transaction: Any = None) -> List[FakeDocumentSnapshot]:
+        return list(self.stream())
+
+
+class FakeCollectionReference(FakeQuery):
+    """Referência de coleção."""
+
+    def __init__(self, client: 'FakeFirestoreClient', path: str):
+        super().__init__(client, path)
+        self.id = path.rsplit('/', 1)[-1]
+
+    def document(self, document_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._client, self._collection_path, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, data: Dict[str, Any]) -> Tuple[datetime, FakeDocumentReference]:
+        ref = self.document()
+        ref.set(data)
+        return datetime.now(timezone.utc), ref
+
+
+class FakeWriteBatch:
+    """Escrita em lote aplicada atomicamente no commit."""
+
+    def __init__(self, client: 'FakeFirestoreClient'):
+        self._client = client
+        self._ops: List[Tuple[str, FakeDocumentReference, Any, bool]] = []
+
+    def set(self, reference: FakeDocumentReference, data: Dict[str, Any], merge: bool = False) -> None:
+        self._ops.append(('set', reference, data, merge))
+
+    def create(self, reference: FakeDocumentReference, data: Dict[str, Any]) -> None:
+        self._ops.append(('create', reference, data, False))
+
+    def update(self, reference: FakeDocumentReference, data: Dict[str, Any]) -> None:
+        self._ops.append(('update', reference, data, False))
+
+    def delete(self, reference: FakeDocumentReference) -> None:
+        self._ops.append(('delete', reference, None, False))
+
+    def commit(self) -> List[Any]:
+        if len(self._ops) > 500:
+            raise ValueError("Escrita em lote excede 500 operações")
+        for kind, reference, data, merge in self._ops:
+            self._client._write(reference, kind, data, merge)
+        self._client.commits += 1
+        ops, self._ops = self._ops, []
+        return ops
+
+
+class FakeTransaction(FakeWriteBatch):
+    """
+    Transação: escritas acumuladas e aplicadas no commit.
+
+    Implementa o protocolo usado por firestore.transactional
+    (_begin, _commit, _rollback, _clean_up, _id, _max_attempts).
+    """
+
+    def __init__(self, client: 'FakeFirestoreClient', max_attempts: int = 5):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._id = None
+        self._read_only = False
+
+    @property
+    def in_progress(self) -> bool:
+        return self._id is not None
+
+    def get(self, ref_or_query: Any) -> Any:
+        if isinstance(ref_or_query, FakeDocumentReference):
+            return iter([ref_or_query.get(transaction=self)])
+        return ref_or_query.stream(transaction=self)
+
+    def _begin(self, retry_id: Any = None) -> None:
+        self._id = uuid.uuid4().bytes
+
+    def _clean_up(self) -> None:
+        self._ops = []
+        self._id = None
+
+    def _rollback(self) -> None:
+        self._clean_up()
+
+    def _commit(self) -> List[Any]:
+        ops = self.commit()
+        self._id = None
+        return ops
+
+
+class FakeFirestoreClient:
+    """Cliente Firestore em memória."""
+
+    def __init__(self, project: Optional[str] = None):
+        self.project = project
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+
+    def _docs(self, collection_path: str) -> Dict[str, Dict[str, Any]]:
+        return self._collections.setdefault(collection_path, {})
+
+    def _write(self, reference: FakeDocumentReference, kind: str, data: Optional[Dict[str, Any]], merge: bool) -> None:
+        docs = self._docs(reference._collection_path)
+        self.writes += 1
+
+        if kind == 'delete':
+            docs.pop(reference.id, None)
+            return
+
+        if kind == 'create' and reference.id in docs:
+            raise ValueError(f"Documento já existe: {reference.path}")
+
+        if kind == 'update':
+            current = docs[reference.id]
+            for path, value in data.items():
+                _set_field(current, path, _resolve(_get_field(current, path), value))
+            return
+
+        current = docs.get(reference.id, {}) if merge else {}
+        _merge(current, data)
+        docs[reference.id] = current
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+
+    def collection_group(self, collection_id: str) -> FakeQuery:
+        return FakeQuery(self, collection_id, all_descendants=True)
+
+    def document(self, path: str) -> FakeDocumentReference:
+        collection_path, _, doc_id = path.rpartition('/')
+        return FakeDocumentReference(self, collection_path, doc_id)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def transaction(self, max_attempts: int = 5, read_only: bool = False) -> FakeTransaction:
+        return FakeTransaction(self, max_attempts=max_attempts)
+
+    def get_all(self, references: List[FakeDocumentReference], field_paths: Optional[List[str]] = None,
+                transaction: Any = None) -> Iterator[FakeDocumentSnapshot]:
+        for reference in references:
+            yield reference.get()
+
+    def load(self, collection_path: str, documents: Dict[str, Dict[str, Any]]) -> None:
+        """Carrega documentos diretamente (sem contar escritas), para montar cenários grandes."""
+        self._docs(collection_path).update(documents)
+
+    def reset_counters(self) -> None:
+        """Zera os contadores de leituras e escritas."""
+        self.reads = self.writes = self.commits = 0
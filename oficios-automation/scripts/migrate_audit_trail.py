@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Migra o array audit_trail dos ofícios para a subcoleção oficios/{id}/audit.
+
+Cada entrada vira um documento append-only com id determinístico
+(legacy-00000, legacy-00001, ...), então a migração pode ser reexecutada
+sem duplicar entradas. O campo audit_trail é removido do ofício no mesmo
+lote da última entrada.
+
+Uso:
+    python scripts/migrate_audit_trail.py [--org-id org123] [--dry-run]
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from google.cloud import firestore
+
+# Adiciona o diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from utils.api_clients import FirestoreClient
+
+FIRESTORE_MAX_BATCH_WRITES = 500
+AUDIT_SUBCOLLECTION = 'audit'
+
+
+def migrar(db, org_id: str = None, page_size: int = 200, dry_run: bool = False):
+    """
+    Move as trilhas de auditoria embutidas para a subcoleção.
+
+    Args:
+        db: Cliente Firestore
+        org_id: Restringe a uma organização (None = todas)
+        page_size: Ofícios lidos por página
+        dry_run: Apenas conta, sem gravar
+
+    Returns:
+        Dicionário com ofícios lidos, ofícios migrados e entradas gravadas
+    """
+    query = db.collection('oficios')
+
+    if org_id:
+        query = query.where('org_id', '==', org_id)
+
+    # Projeção: não transfere conteudo_bruto nem dados extraídos
+    query = query.select(['org_id', 'audit_trail']).order_by('__name__').limit(page_size)
+
+    stats = {'lidos': 0, 'migrados': 0, 'entradas': 0}
+    ultimo = None
+
+    while True:
+        page = query.start_after(ultimo) if ultimo is not None else query
+        docs = list(page.stream())
+
+        if not docs:
+            break
+
+        ultimo = docs[-1]
+
+        for doc in docs:
+            stats['lidos'] += 1
+            doc_data = doc.to_dict()
+            trilha = doc_data.get('audit_trail')
+
+            if trilha is None:
+                continue
+
+            stats['migrados'] += 1
+            stats['entradas'] += len(trilha)
+
+            if not dry_run:
+                migrar_oficio(db, doc.reference, doc_data.get('org_id'), trilha)
+
+        print(f"   {stats['lidos']} lidos, {stats['migrados']} migrados, {stats['entradas']} entradas")
+
+    return stats
+
+
+def migrar_oficio(db, oficio_ref, org_id: str, trilha: list) -> None:
+    """
+    Grava as entradas de um ofício e remove o array (lotes de até 500 escritas).
+
+    Args:
+        db: Cliente Firestore
+        oficio_ref: Referência do ofício
+        org_id: Organização do ofício
+        trilha: Entradas do array audit_trail
+    """
+    audit_collection = oficio_ref.collection(AUDIT_SUBCOLLECTION)
+    batch = db.batch()
+    pendentes = 0
+
+    for indice, entry in enumerate(trilha):
+        entrada = FirestoreClient._audit_entry(org_id, oficio_ref.id, entry)
+        entrada['migrated_from'] = 'audit_trail'
+
+        batch.set(audit_collection.document(f"legacy-{indice:05d}"), entrada)
+        pendentes += 1
+
+        if pendentes == FIRESTORE_MAX_BATCH_WRITES - 1:
+            batch.commit()
+            batch = db.batch()
+            pendentes = 0
+
+    # Remoção do array por último: uma falha antes disso permite reexecutar
+    batch.update(oficio_ref, {'audit_trail': firestore.DELETE_FIELD})
+    batch.commit()
+
+
+def main():
+    """Executa a migração"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--org-id', help='Migra apenas uma organização')
+    parser.add_argument('--page-size', type=int, default=200, help='Ofícios por página')
+    parser.add_argument('--dry-run', action='store_true', help='Apenas conta, sem gravar')
+    args = parser.parse_args()
+
+    project_id = os.getenv('GCP_PROJECT_ID')
+
+    if not project_id:
+        print("❌ GCP_PROJECT_ID não configurado")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("MIGRAÇÃO DA TRILHA DE AUDITORIA PARA oficios/{id}/audit" + (" (dry-run)" if args.dry_run else ""))
+    print("=" * 60)
+
+    db = firestore.Client(project=project_id)
+    stats = migrar(db, args.org_id, args.page_size, args.dry_run)
+
+    print(f"\n✅ {stats['entradas']} entradas de {stats['migrados']} ofícios migradas "
+          f"({stats['lidos']} ofícios lidos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Migra os embeddings da coleção knowledge_base para outro formato de armazenamento.
+Converte arrays de floats em bytes float16/int8 (ou o inverso), página a página.
+
+O carimbo de versão não é alterado: índices já construídos continuam válidos,
+apenas a representação gravada muda.
+
+Uso:
+    python scripts/migrate_embedding_format.py --format float16 [--org-id org123] [--dry-run]
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from google.cloud import firestore
+
+# Adiciona o diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from utils.embedding_codec import FORMAT_INT8, FORMAT_LIST, STORAGE_FORMATS, decode_embedding, encode_embedding
+
+FIRESTORE_MAX_BATCH_WRITES = 500
+
+
+def migrar(db, target_format: str, org_id: str = None, page_size: int = 300, dry_run: bool = False):
+    """
+    Regrava os embeddings que ainda não estão no formato de destino.
+
+    Args:
+        db: Cliente Firestore
+        target_format: Formato de destino
+        org_id: Restringe a uma organização (None = todas)
+        page_size: Documentos lidos por página
+        dry_run: Apenas conta, sem gravar
+
+    Returns:
+        Dicionário com lidos, convertidos e bytes antes/depois
+    """
+    query = db.collection('knowledge_base')
+
+    if org_id:
+        query = query.where('org_id', '==', org_id)
+
+    query = query.order_by('__name__').limit(page_size)
+
+    stats = {'lidos': 0, 'convertidos': 0, 'bytes_antes': 0, 'bytes_depois': 0}
+    ultimo = None
+
+    while True:
+        page = query.start_after(ultimo) if ultimo is not None else query
+        docs = list(page.stream())
+
+        if not docs:
+            break
+
+        ultimo = docs[-1]
+        batch = db.batch()
+        pendentes = 0
+
+        for doc in docs:
+            stats['lidos'] += 1
+            doc_data = doc.to_dict()
+            vector = decode_embedding(doc_data)
+
+            if vector is None or doc_data.get('embedding_format', FORMAT_LIST) == target_format:
+                continue
+
+            campos = encode_embedding(vector.astype(float).tolist(), target_format)
+            if target_format != FORMAT_INT8:
+                campos['embedding_scale'] = firestore.DELETE_FIELD
+
+            stats['convertidos'] += 1
+            stats['bytes_antes'] += tamanho_armazenado(doc_data['embedding'])
+            stats['bytes_depois'] += tamanho_armazenado(campos['embedding'])
+
+            if not dry_run:
+                batch.update(doc.reference, campos)
+                pendentes += 1
+
+                if pendentes == FIRESTORE_MAX_BATCH_WRITES:
+                    batch.commit()
+                    batch = db.batch()
+                    pendentes = 0
+
+        if pendentes:
+            batch.commit()
+
+        print(f"   {stats['lidos']} lidos, {stats['convertidos']} convertidos")
+
+    return stats
+
+
+def tamanho_armazenado(valor) -> int:
+    """Tamanho de armazenamento do campo no Firestore (8 bytes por número, bytes brutos)."""
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor) + 1
+
+    return 8 * len(valor)
+
+
+def main():
+    """Executa a migração"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--format', required=True, choices=STORAGE_FORMATS, help='Formato de destino')
+    parser.add_argument('--org-id', help='Migra apenas uma organização')
+    parser.add_argument('--page-size', type=int, default=300, help='Documentos por página')
+    parser.add_argument('--dry-run', action='store_true', help='Apenas estima, sem gravar')
+    args = parser.parse_args()
+
+    project_id = os.getenv('GCP_PROJECT_ID')
+
+    if not project_id:
+        print("❌ GCP_PROJECT_ID não configurado")
+        sys.exit(1)
+
+    print("=" * 60)
+    print(f"MIGRAÇÃO DE EMBEDDINGS PARA '{args.format}'" + (" (dry-run)" if args.dry_run else ""))
+    print("=" * 60)
+
+    db = firestore.Client(project=project_id)
+    stats = migrar(db, args.format, args.org_id, args.page_size, args.dry_run)
+
+    print(f"\n✅ {stats['convertidos']} de {stats['lidos']} documentos convertidos")
+
+    if stats['bytes_antes']:
+        reducao = 1 - stats['bytes_depois'] / stats['bytes_antes']
+        print(f"📦 Embeddings: {stats['bytes_antes'] / 1e6:.1f} MB → {stats['bytes_depois'] / 1e6:.1f} MB "
+              f"({reducao:.0%} menor)")
+
+    print(f"\n💡 Configure EMBEDDING_STORAGE_FORMAT={args.format} no W4/W7 para novos documentos")
+
+
+if __name__ == "__main__":
+    main()
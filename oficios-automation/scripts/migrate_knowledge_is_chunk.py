@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Preenche is_chunk nos registros da coleção knowledge_base gravados antes do campo.
+
+A listagem de documentos do W7 filtra is_chunk == False no Firestore;
+registros sem o campo não aparecem nela até esta migração. Chunks são os
+registros com parent_id. Apenas o campo is_chunk é gravado, então a
+migração pode ser reexecutada.
+
+Uso:
+    python scripts/migrate_knowledge_is_chunk.py [--org-id org123] [--dry-run]
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from google.cloud import firestore
+
+# Adiciona o diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+FIRESTORE_MAX_BATCH_WRITES = 500
+
+
+def migrar(db, org_id: str = None, page_size: int = 300, dry_run: bool = False):
+    """
+    Grava is_chunk nos registros que ainda não têm o campo.
+
+    Args:
+        db: Cliente Firestore
+        org_id: Restringe a uma organização (None = todas)
+        page_size: Registros lidos por página
+        dry_run: Apenas conta, sem gravar
+
+    Returns:
+        Dicionário com lidos, documentos e chunks marcados
+    """
+    query = db.collection('knowledge_base')
+
+    if org_id:
+        query = query.where('org_id', '==', org_id)
+
+    # Projeção: não transfere conteúdo nem embeddings
+    query = query.select(['is_chunk', 'parent_id']).order_by('__name__').limit(page_size)
+
+    stats = {'lidos': 0, 'documentos': 0, 'chunks': 0}
+    ultimo = None
+
+    while True:
+        page = query.start_after(ultimo) if ultimo is not None else query
+        docs = list(page.stream())
+
+        if not docs:
+            break
+
+        ultimo = docs[-1]
+        batch = db.batch()
+        pendentes = 0
+
+        for doc in docs:
+            stats['lidos'] += 1
+            doc_data = doc.to_dict()
+
+            if 'is_chunk' in doc_data:
+                continue
+
+            is_chunk = bool(doc_data.get('parent_id'))
+            stats['chunks' if is_chunk else 'documentos'] += 1
+
+            if not dry_run:
+                batch.update(doc.reference, {'is_chunk': is_chunk})
+                pendentes += 1
+
+        if pendentes:
+            batch.commit()
+
+        print(f"   {stats['lidos']} lidos, {stats['documentos']} documentos e {stats['chunks']} chunks marcados")
+
+    return stats
+
+
+def main():
+    """Executa a migração"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--org-id', help='Migra apenas uma organização')
+    parser.add_argument('--page-size', type=int, default=300, help='Registros por página (até 500)')
+    parser.add_argument('--dry-run', action='store_true', help='Apenas conta, sem gravar')
+    args = parser.parse_args()
+
+    if args.page_size > FIRESTORE_MAX_BATCH_WRITES:
+        print(f"❌ --page-size deve ser no máximo {FIRESTORE_MAX_BATCH_WRITES}")
+        sys.exit(1)
+
+    project_id = os.getenv('GCP_PROJECT_ID')
+
+    if not project_id:
+        print("❌ GCP_PROJECT_ID não configurado")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("MIGRAÇÃO is_chunk EM knowledge_base" + (" (dry-run)" if args.dry_run else ""))
+    print("=" * 60)
+
+    db = firestore.Client(project=project_id)
+    stats = migrar(db, args.org_id, args.page_size, args.dry_run)
+
+    print(f"\n✅ {stats['documentos']} documentos e {stats['chunks']} chunks marcados "
+          f"({stats['lidos']} registros lidos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -150,30 +150,23 @@ def main():
     print("\n🔧 Inicializando RAG Client...")
     rag_client = RAGClient()
     
-    # Importa documentos
+    # Importa documentos (embeddings e escritas em lote)
     print("\n📥 Importando documentos...")
-    doc_ids = []
     
     for idx, doc in enumerate(DOCUMENTOS_EXEMPLO, 1):
-        print(f"\n[{idx}/{len(DOCUMENTOS_EXEMPLO)}] Processando: {doc['titulo']}")
+        print(f"\n[{idx}/{len(DOCUMENTOS_EXEMPLO)}] {doc['titulo']}")
         print(f"   Tipo: {doc['tipo']}")
         print(f"   Tamanho: {len(doc['conteudo'])} caracteres")
-        
-        try:
-            # Gera embedding e salva
-            doc_id = rag_client.add_document(
-                org_id=org_id,
-                titulo=doc['titulo'],
-                conteudo=doc['conteudo'],
-                tipo=doc['tipo'],
-                metadata=doc.get('metadata')
-            )
-            
-            doc_ids.append(doc_id)
-            print(f"   ✅ Documento salvo: {doc_id}")
-            
-        except Exception as e:
-            print(f"   ❌ Erro ao processar documento: {e}")
+    
+    resultado = rag_client.bulk_import_documents(
+        org_id=org_id,
+        documents=DOCUMENTOS_EXEMPLO
+    )
+    
+    doc_ids = [doc_id for doc_id in resultado['doc_ids'] if doc_id]
+    
+    for falha in resultado['falhas']:
+        print(f"   ❌ Erro ao processar '{falha['titulo']}': {falha['erro']}")
     
     # Resumo
     print("\n" + "=" * 60)
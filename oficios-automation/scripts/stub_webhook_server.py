@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Webhook local (Slack/Teams simulado) para testar a entrega de alertas do W2.
+
+Recebe os POSTs JSON, registra cada digest e pode simular um endpoint lento
+ou instável: latência, respostas 429/5xx com Retry-After e falhas nas
+primeiras N requisições. Ao encerrar (Ctrl+C) mostra os totais.
+
+Uso:
+    python scripts/stub_webhook_server.py --port 8099 --latencia 0.5 --falhar-primeiras 3 --status 503
+    ALERT_WEBHOOK_URL=http://localhost:8099/webhook python funcoes/W2_monitoramento_sla/main.py
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Adiciona o diretório raiz ao path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+
+class StubWebhookServer(ThreadingHTTPServer):
+    """Servidor HTTP com o comportamento configurável e os payloads recebidos."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 8099,
+        latencia: float = 0.0,
+        falhar_primeiras: int = 0,
+        taxa_falha: float = 0.0,
+        status_falha: int = 503,
+        retry_after: Optional[str] = None,
+        verbose: bool = True
+    ):
+        """
+        Inicializa o servidor.
+
+        Args:
+            port: Porta local (0 = porta livre)
+            latencia: Segundos de espera antes de cada resposta
+            falhar_primeiras: Requisições iniciais respondidas com status_falha
+            taxa_falha: Probabilidade de falha nas demais requisições (0 a 1)
+            status_falha: Status HTTP das falhas (ex: 429, 503)
+            retry_after: Valor do cabeçalho Retry-After nas falhas
+            verbose: Imprime cada requisição
+        """
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.latencia = latencia
+        self.falhar_primeiras = falhar_primeiras
+        self.taxa_falha = taxa_falha
+        self.status_falha = status_falha
+        self.retry_after = retry_after
+        self.verbose = verbose
+
+        self.recebidos: List[Dict[str, Any]] = []
+        self.respostas = Counter()
+        self.requisicoes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/webhook"
+
+    def decidir_status(self) -> int:
+        """Status da próxima resposta (falhas iniciais, depois aleatórias)."""
+        with self._lock:
+            self.requisicoes += 1
+            if self.requisicoes <= self.falhar_primeiras or random.random() < self.taxa_falha:
+                status = self.status_falha
+            else:
+                status = 200
+            self.respostas[status] += 1
+            return status
+
+    def iniciar_em_thread(self) -> threading.Thread:
+        """Atende em segundo plano (para scripts e testes locais)."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        corpo = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        servidor: StubWebhookServer = self.server
+
+        if servidor.latencia:
+            time.sleep(servidor.latencia)
+
+        status = servidor.decidir_status()
+
+        if status == 200:
+            try:
+                payload = json.loads(corpo)
+            except ValueError:
+                status = 400
+            else:
+                with servidor._lock:
+                    servidor.recebidos.append(payload)
+                if servidor.verbose:
+                    print(f"📨 {payload.get('urgencia', '?')} para {payload.get('destinatario', '?')}: "
+                          f"{len(payload.get('oficios', []))} ofício(s)")
+        elif servidor.verbose:
+            print(f"💥 Respondendo {status}")
+
+        resposta = b'ok' if status == 200 else b'erro simulado'
+        self.send_response(status)
+        if status != 200 and servidor.retry_after is not None:
+            self.send_header('Retry-After', servidor.retry_after)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(resposta)))
+        self.end_headers()
+        self.wfile.write(resposta)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    """Inicia o servidor"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8099, help='Porta local')
+    parser.add_argument('--latencia', type=float, default=0.0, help='Segundos de espera por resposta')
+    parser.add_argument('--falhar-primeiras', type=int, default=0, help='Requisições iniciais com falha')
+    parser.add_argument('--taxa-falha', type=float, default=0.0, help='Probabilidade de falha (0 a 1)')
+    parser.add_argument('--status', type=int, default=503, help='Status HTTP das falhas (ex: 429, 503)')
+    parser.add_argument('--retry-after', help='Cabeçalho Retry-After nas falhas (segundos)')
+    args = parser.parse_args()
+
+    servidor = StubWebhookServer(
+        port=args.port,
+        latencia=args.latencia,
+        falhar_primeiras=args.falhar_primeiras,
+        taxa_falha=args.taxa_falha,
+        status_falha=args.status,
+        retry_after=args.retry_after
+    )
+
+    print("=" * 60)
+    print(f"WEBHOOK DE TESTE EM {servidor.url}")
+    print("=" * 60)
+
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+    print(f"\n✅ {len(servidor.recebidos)} alertas recebidos em {servidor.requisicoes} requisições "
+          f"(respostas: {dict(servidor.respostas)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -87,7 +87,7 @@ def test_cpf_validation():
     print("TESTE: Validação de CPF")
     print("=" * 60)
     
-    from funcoes.W1_processamento_async.main import validar_cpf
+    from utils.validation import validar_cpf
     
     test_cases = [
         ("123.456.789-09", True, "CPF válido formatado"),
@@ -118,7 +118,7 @@ def test_cnpj_validation():
     print("TESTE: Validação de CNPJ")
     print("=" * 60)
     
-    from funcoes.W1_processamento_async.main import validar_cnpj
+    from utils.validation import validar_cnpj
     
     test_cases = [
         ("11.222.333/0001-81", True, "CNPJ válido formatado"),
@@ -175,6 +175,55 @@ def test_prioridade_calculation():
     return success_count == len(test_cases)
 
 
+def test_text_compaction():
+    """Testa que a compactação remove cabeçalhos/rodapés sem perder dados"""
+    print("\n" + "=" * 60)
+    print("TESTE: Compactação de Texto (cabeçalhos/rodapés)")
+    print("=" * 60)
+    
+    from utils.text_compaction import compact_text
+    
+    cabecalho = "TRIBUNAL DE JUSTIÇA - 2ª VARA CÍVEL"
+    paginas = [
+        f"{cabecalho}\nAgência 1234 Conta 5678-9\nValor R$ 1.500,00\nPágina 1 de 3",
+        f"{cabecalho}\nAgência 5678 Conta 1111-2\nValor R$ 2.300,00\nPágina 2 de 3",
+        f"{cabecalho}\nAgência 9012 Conta 3333-4\nValor R$ 700,00\nPágina 3 de 3",
+    ]
+    
+    texto_paginas = compact_text("\f".join(paginas))['texto']
+    texto_sem_separador = compact_text("\n".join(paginas))['texto']
+    texto_linhas = compact_text("Agência 1234\nAgência 5678\nAgência 9012\nDia 5\nDia 6\nDia 7")['texto']
+    compactado_numeros = compact_text("Extrato\nSaldo\n12345\n250\nPrazo em dias:\n10\nAtenciosamente")
+    texto_numeros = compactado_numeros['texto']
+    texto_numerado = compact_text("\f".join(f"Extrato da conta\nSaldo {i}00\n{i}" for i in (1, 2, 3)))['texto']
+    
+    test_cases = [
+        (texto_paginas.count(cabecalho) == 1, "Cabeçalho repetido mantido uma vez"),
+        ("Página" not in texto_paginas, "Números de página removidos"),
+        (all(a in texto_paginas for a in ("Agência 1234", "Agência 5678", "Agência 9012")), "Agências distintas preservadas"),
+        (all(v in texto_paginas for v in ("R$ 1.500,00", "R$ 2.300,00", "R$ 700,00")), "Valores distintos preservados"),
+        (texto_sem_separador.count(cabecalho) == 1, "Páginas delimitadas por número de página"),
+        (all(a in texto_sem_separador for a in ("Agência 5678", "R$ 700,00")), "Dados preservados sem form feed"),
+        (all(d in texto_linhas for d in ("Agência 9012", "Dia 5", "Dia 6", "Dia 7")), "Página única não perde linhas"),
+        (texto_numeros.split("\n") == ["Extrato", "Saldo", "12345", "250", "Prazo em dias:", "10", "Atenciosamente"]
+         and not compactado_numeros['truncado'], "Números em linhas próprias preservados"),
+        ("\n2\n" not in f"\n{texto_numerado}\n" and "Saldo 300" in texto_numerado, "Números de página soltos removidos"),
+    ]
+    
+    success_count = 0
+    
+    for resultado, descricao in test_cases:
+        status = "✅" if resultado else "❌"
+        print(f"{status} {descricao}")
+        
+        if resultado:
+            success_count += 1
+    
+    print(f"\n📊 Resultado: {success_count}/{len(test_cases)} testes passaram")
+    
+    return success_count == len(test_cases)
+
+
 def test_firestore_connection():
     """Testa conexão com Firestore"""
     print("\n" + "=" * 60)
@@ -293,6 +342,7 @@ def main():
         ("Validação CPF", test_cpf_validation),
         ("Validação CNPJ", test_cnpj_validation),
         ("Cálculo de Prioridade", test_prioridade_calculation),
+        ("Compactação de Texto", test_text_compaction),
         ("Conexão Firestore", test_firestore_connection),
     ]
     
@@ -0,0 +1,441 @@
+"""
+Entrega dos alertas de SLA via webhook (Slack/Teams).
+
+Um endpoint lento ou instável não deve serializar o monitoramento:
+  - uma única sessão HTTP com pool de conexões (keep-alive) é reaproveitada
+    entre envios e entre invocações quentes da função;
+  - os envios rodam em um pool limitado (ALERT_DELIVERY_MAX_WORKERS),
+    compartilhado por todas as organizações da execução;
+  - 429/5xx e falhas de conexão são repetidos com backoff exponencial e
+    jitter, respeitando Retry-After;
+  - cada envio respeita o prazo da execução (timeout e esperas limitados
+    ao tempo restante), e um disjuntor abre após N tentativas seguidas com
+    falha: enquanto aberto, nenhum envio é tentado;
+  - alertas não entregues (falha, prazo ou disjuntor) vão para a coleção
+    alert_outbox e são reenviados na próxima execução, com tempo limitado.
+
+Uso:
+    entrega = WebhookDelivery(url)
+    resultados = entrega.enviar_lote(payloads, deadline=time.monotonic() + 30)
+    AlertOutbox(db).adicionar(org_id, destinatario, payload, resultado['erro'])
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+ALERT_DELIVERY_MAX_WORKERS = int(os.getenv('ALERT_DELIVERY_MAX_WORKERS', '8'))
+ALERT_DELIVERY_MAX_RETRIES = int(os.getenv('ALERT_DELIVERY_MAX_RETRIES', '4'))
+ALERT_DELIVERY_TIMEOUT_SECONDS = float(os.getenv('ALERT_DELIVERY_TIMEOUT_SECONDS', '10'))
+ALERT_DELIVERY_BACKOFF_BASE_SECONDS = float(os.getenv('ALERT_DELIVERY_BACKOFF_BASE_SECONDS', '1'))
+# Teto de cada espera (inclusive Retry-After): o restante fica para o outbox
+ALERT_DELIVERY_BACKOFF_MAX_SECONDS = float(os.getenv('ALERT_DELIVERY_BACKOFF_MAX_SECONDS', '30'))
+# Disjuntor: tentativas seguidas com falha (entre todos os envios) que o abrem, e por quanto tempo
+ALERT_DELIVERY_BREAKER_THRESHOLD = int(os.getenv('ALERT_DELIVERY_BREAKER_THRESHOLD', '5'))
+ALERT_DELIVERY_BREAKER_COOLDOWN_SECONDS = float(os.getenv('ALERT_DELIVERY_BREAKER_COOLDOWN_SECONDS', '120'))
+# Tempo mínimo restante para iniciar uma requisição
+ALERT_DELIVERY_MIN_REQUEST_SECONDS = 1.0
+
+ALERT_OUTBOX_COLLECTION = 'alert_outbox'
+# Execuções em que um alerta pendente é reenviado antes de ser descartado
+ALERT_OUTBOX_MAX_ATTEMPTS = int(os.getenv('ALERT_OUTBOX_MAX_ATTEMPTS', '10'))
+# Tempo máximo de reenvio do outbox por execução (o restante fica para a seguinte)
+ALERT_OUTBOX_REPLAY_BUDGET_SECONDS = float(os.getenv('ALERT_OUTBOX_REPLAY_BUDGET_SECONDS', '30'))
+ALERT_OUTBOX_TTL_DAYS = int(os.getenv('ALERT_OUTBOX_TTL_DAYS', '7'))
+
+FIRESTORE_MAX_BATCH_WRITES = 500
+
+# Respostas que valem nova tentativa (as demais 4xx são erro do payload/URL)
+STATUS_REPETIVEIS = {408, 425, 429, 500, 502, 503, 504}
+
+
+def criar_sessao(pool_size: int = ALERT_DELIVERY_MAX_WORKERS):
+    """
+    Sessão HTTP com pool de conexões do tamanho do pool de envios.
+
+    As repetições ficam a cargo de WebhookDelivery (max_retries=0 no adapter).
+
+    Args:
+        pool_size: Conexões mantidas por host
+
+    Returns:
+        requests.Session
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    sessao = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    sessao.mount('https://', adapter)
+    sessao.mount('http://', adapter)
+
+    return sessao
+
+
+def espera_retry_after(valor: Optional[str]) -> Optional[float]:
+    """
+    Segundos indicados pelo cabeçalho Retry-After.
+
+    Args:
+        valor: Cabeçalho (segundos ou data HTTP)
+
+    Returns:
+        Segundos de espera (None se ausente ou inválido)
+    """
+    if not valor:
+        return None
+
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+
+    try:
+        data = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, data.timestamp() - time.time())
+
+
+class WebhookDelivery:
+    """Envia payloads JSON para um webhook com pool, concorrência limitada e repetição."""
+
+    def __init__(
+        self,
+        url: str,
+        max_workers: int = ALERT_DELIVERY_MAX_WORKERS,
+        max_retries: int = ALERT_DELIVERY_MAX_RETRIES,
+        timeout: float = ALERT_DELIVERY_TIMEOUT_SECONDS,
+        backoff_base: float = ALERT_DELIVERY_BACKOFF_BASE_SECONDS,
+        backoff_max: float = ALERT_DELIVERY_BACKOFF_MAX_SECONDS,
+        breaker_threshold: int = ALERT_DELIVERY_BREAKER_THRESHOLD,
+        breaker_cooldown: float = ALERT_DELIVERY_BREAKER_COOLDOWN_SECONDS,
+        session: Any = None
+    ):
+        """
+        Inicializa a entrega.
+
+        Args:
+            url: URL do webhook
+            max_workers: Envios simultâneos (também o tamanho do pool de conexões)
+            max_retries: Repetições após a primeira tentativa
+            timeout: Timeout de cada requisição em segundos
+            backoff_base: Espera base do backoff exponencial em segundos
+            backoff_max: Espera máxima entre tentativas em segundos
+            breaker_threshold: Tentativas seguidas com falha que abrem o disjuntor
+            breaker_cooldown: Segundos com o disjuntor aberto antes de tentar de novo
+            session: Sessão HTTP (padrão: criar_sessao)
+        """
+        self.url = url
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.session = session if session is not None else criar_sessao(max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='alert-delivery')
+        self._lock = threading.Lock()
+
+        self.entregues = 0
+        self.falhas = 0
+        self.repeticoes = 0
+        self.nao_tentados = 0
+        self._falhas_seguidas = 0
+        self._aberto_ate = 0.0
+
+    def _contar(self, campo: str, valor: int = 1) -> None:
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + valor)
+
+    def circuito_aberto(self) -> bool:
+        """True enquanto o disjuntor estiver aberto (webhook indisponível)."""
+        with self._lock:
+            return time.monotonic() < self._aberto_ate
+
+    def _registrar_tentativa(self, ok: bool) -> None:
+        """Atualiza o disjuntor: sucesso fecha, falhas seguidas acima do limite abrem."""
+        with self._lock:
+            if ok:
+                self._falhas_seguidas = 0
+                return
+
+            self._falhas_seguidas += 1
+            agora = time.monotonic()
+
+            if self._falhas_seguidas >= self.breaker_threshold and agora >= self._aberto_ate:
+                self._aberto_ate = agora + self.breaker_cooldown
+                logger.error(
+                    f"Webhook de alerta: {self._falhas_seguidas} falhas seguidas, envios suspensos por "
+                    f"{self.breaker_cooldown:.0f}s (alertas vão para o outbox)"
+                )
+
+    def _espera(self, tentativa: int, retry_after: Optional[float]) -> float:
+        """Retry-After do servidor ou backoff exponencial com jitter completo."""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** tentativa)))
+
+    def enviar(self, payload: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Envia um payload, repetindo 429/5xx e falhas de conexão.
+
+        Para sem nova tentativa quando o prazo termina ou o disjuntor abre;
+        tentativas == 0 indica que nenhuma requisição foi feita.
+
+        Args:
+            payload: Corpo JSON
+            deadline: Prazo (time.monotonic) da execução (None = sem limite)
+
+        Returns:
+            Dicionário com ok, status (último HTTP status ou None), tentativas e erro
+        """
+        import requests
+
+        resultado: Dict[str, Any] = {'ok': False, 'status': None, 'tentativas': 0, 'erro': None}
+
+        with span('alertas.webhook') as s:
+            for tentativa in range(self.max_retries + 1):
+                if self.circuito_aberto():
+                    resultado['erro'] = resultado['erro'] or 'disjuntor aberto'
+                    break
+
+                restante = None if deadline is None else deadline - time.monotonic()
+                if restante is not None and restante < ALERT_DELIVERY_MIN_REQUEST_SECONDS:
+                    resultado['erro'] = resultado['erro'] or 'prazo da execução esgotado'
+                    break
+
+                resultado['tentativas'] = tentativa + 1
+                retry_after = None
+                timeout = self.timeout if restante is None else min(self.timeout, restante)
+
+                try:
+                    response = self.session.post(self.url, json=payload, timeout=timeout)
+                except requests.RequestException as e:
+                    resultado['erro'] = f"{type(e).__name__}: {e}"
+                else:
+                    resultado['status'] = response.status_code
+
+                    if 200 <= response.status_code < 300:
+                        resultado['ok'] = True
+                        resultado['erro'] = None
+                        self._registrar_tentativa(True)
+                        break
+
+                    resultado['erro'] = f"HTTP {response.status_code}: {response.text[:200]}"
+
+                    if response.status_code not in STATUS_REPETIVEIS:
+                        break
+
+                    retry_after = espera_retry_after(response.headers.get('Retry-After'))
+
+                self._registrar_tentativa(False)
+
+                if tentativa < self.max_retries:
+                    espera = self._espera(tentativa, retry_after)
+
+                    # Espera que passaria do prazo: o alerta fica para o outbox
+                    if deadline is not None and time.monotonic() + espera >= deadline:
+                        break
+
+                    logger.warning(f"Webhook de alerta falhou ({resultado['erro']}), nova tentativa em {espera:.1f}s")
+                    self._contar('repeticoes')
+                    time.sleep(espera)
+
+            s.set(status_http=resultado['status'], tentativas=resultado['tentativas'], entregue=resultado['ok'])
+
+        if resultado['ok']:
+            self._contar('entregues')
+        elif resultado['tentativas']:
+            self._contar('falhas')
+        else:
+            self._contar('nao_tentados')
+
+        return resultado
+
+    def enviar_lote(self, payloads: List[Dict[str, Any]], deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Envia vários payloads em paralelo (limitado a max_workers no total).
+
+        Args:
+            payloads: Corpos JSON
+            deadline: Prazo (time.monotonic) da execução (None = sem limite)
+
+        Returns:
+            Resultados de enviar, na ordem dos payloads
+        """
+        futures = [self._pool.submit(self.enviar, payload, deadline) for payload in payloads]
+
+        return [future.result() for future in futures]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Contadores da entrega.
+
+        Returns:
+            Dicionário com entregues, falhas, repeticoes, nao_tentados e circuito_aberto
+        """
+        aberto = self.circuito_aberto()
+
+        with self._lock:
+            return {
+                'entregues': self.entregues,
+                'falhas': self.falhas,
+                'repeticoes': self.repeticoes,
+                'nao_tentados': self.nao_tentados,
+                'circuito_aberto': aberto
+            }
+
+
+class AlertOutbox:
+    """Alertas não entregues (coleção alert_outbox), reenviados nas execuções seguintes."""
+
+    def __init__(
+        self,
+        db: Any,
+        collection: str = ALERT_OUTBOX_COLLECTION,
+        max_attempts: int = ALERT_OUTBOX_MAX_ATTEMPTS,
+        ttl_days: int = ALERT_OUTBOX_TTL_DAYS
+    ):
+        """
+        Inicializa o outbox.
+
+        Args:
+            db: Cliente Firestore (firestore.Client)
+            collection: Coleção dos alertas pendentes
+            max_attempts: Reenvios antes de descartar um alerta
+            ttl_days: Validade das entradas em dias (expires_at, política de TTL)
+        """
+        self.db = db
+        self.collection = collection
+        self.max_attempts = max_attempts
+        self.ttl_days = ttl_days
+
+    @staticmethod
+    def chave(org_id: str, payload: Dict[str, Any]) -> str:
+        """
+        Id determinístico da entrada: o mesmo alerta enfileirado duas vezes
+        (ex: shard reentregue) ocupa uma única entrada.
+
+        Args:
+            org_id: ID da organização
+            payload: Corpo JSON do alerta
+
+        Returns:
+            sha256 hexadecimal
+        """
+        conteudo = json.dumps({'org_id': org_id, 'payload': payload}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+    def adicionar(self, org_id: str, destinatario: str, payload: Dict[str, Any], erro: Optional[str] = None) -> None:
+        """
+        Enfileira um alerta não entregue.
+
+        Args:
+            org_id: ID da organização
+            destinatario: Email do destinatário
+            payload: Corpo JSON do alerta
+            erro: Último erro da entrega
+        """
+        agora = datetime.utcnow()
+
+        self.db.collection(self.collection).document(self.chave(org_id, payload)).set({
+            'org_id': org_id,
+            'destinatario': destinatario,
+            'payload': payload,
+            'tentativas': 0,
+            'ultimo_erro': erro,
+            'created_at': agora,
+            'updated_at': agora,
+            'expires_at': agora + timedelta(days=self.ttl_days)
+        })
+
+    def reenviar(
+        self,
+        entrega: WebhookDelivery,
+        limit: int = 200,
+        deadline: Optional[float] = None
+    ) -> Dict[str, int]:
+        """
+        Reenvia os alertas pendentes (mais antigos primeiro).
+
+        Entregues são removidos; os que falham de novo ficam com tentativas
+        incrementado e são descartados (com log de erro) ao atingir max_attempts.
+        Os que não chegam a ser tentados (prazo esgotado ou disjuntor aberto)
+        ficam intactos para a próxima execução.
+
+        Args:
+            entrega: Entrega de webhook
+            limit: Máximo de alertas lidos nesta execução
+            deadline: Prazo (time.monotonic) do reenvio (None = sem limite)
+
+        Returns:
+            Dicionário com pendentes, reenviados, mantidos, adiados e descartados
+        """
+        if entrega.circuito_aberto():
+            logger.warning("Webhook de alerta com disjuntor aberto, reenvio do outbox adiado")
+            return {'pendentes': 0, 'reenviados': 0, 'mantidos': 0, 'adiados': 0, 'descartados': 0}
+
+        docs = list(
+            self.db.collection(self.collection)
+            .order_by('created_at')
+            .limit(limit)
+            .stream()
+        )
+
+        stats = {'pendentes': len(docs), 'reenviados': 0, 'mantidos': 0, 'adiados': 0, 'descartados': 0}
+
+        if not docs:
+            return stats
+
+        entradas = [doc.to_dict() for doc in docs]
+        resultados = entrega.enviar_lote([entrada['payload'] for entrada in entradas], deadline=deadline)
+        agora = datetime.utcnow()
+
+        operacoes = []
+        for doc, entrada, resultado in zip(docs, entradas, resultados):
+            tentativas = entrada.get('tentativas', 0) + 1
+
+            if resultado['ok']:
+                stats['reenviados'] += 1
+                operacoes.append((doc.reference, None))
+            elif not resultado['tentativas']:
+                stats['adiados'] += 1
+            elif tentativas >= self.max_attempts:
+                stats['descartados'] += 1
+                logger.error(
+                    f"Alerta para {entrada.get('destinatario')} (org {entrada.get('org_id')}) descartado após "
+                    f"{tentativas} reenvios: {resultado['erro']}"
+                )
+                operacoes.append((doc.reference, None))
+            else:
+                stats['mantidos'] += 1
+                operacoes.append((doc.reference, {
+                    'tentativas': tentativas,
+                    'ultimo_erro': resultado['erro'],
+                    'updated_at': agora
+                }))
+
+        for inicio in range(0, len(operacoes), FIRESTORE_MAX_BATCH_WRITES):
+            batch = self.db.batch()
+            for referencia, atualizacao in operacoes[inicio:inicio + FIRESTORE_MAX_BATCH_WRITES]:
+                if atualizacao is None:
+                    batch.delete(referencia)
+                else:
+                    batch.update(referencia, atualizacao)
+            batch.commit()
+
+        return stats
@@ -5,45 +5,96 @@ Implementa comunicação com Firestore, Pub/Sub e Groq LLM.
 import base64
 import json
 import os
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Type
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple, Type
 
 from google.cloud import firestore, pubsub_v1, secretmanager, storage
 from groq import Groq
 from pydantic import BaseModel
 import hashlib
 import logging
+import threading
 
 from .schema import OficioCompleto, OficioStatus, AuditTrail
+from .text_compaction import compact_text
+from .tracing import anotar, contar, traced
 
 
 class FirestoreClient:
     """Cliente para interação com o Firestore com suporte a Multi-Tenancy"""
     
-    def __init__(self, project_id: Optional[str] = None):
+    def __init__(self, project_id: Optional[str] = None, db: Optional[Any] = None):
         """
         Inicializa o cliente do Firestore.
         
         Args:
             project_id: ID do projeto GCP. Se None, usa variável de ambiente.
+            db: Cliente Firestore já criado (padrão: firestore.Client do projeto)
         """
-        self.db = firestore.Client(project=project_id)
+        self.db = db if db is not None else firestore.Client(project=project_id)
         self.oficios_collection = "oficios"
         self.organizations_collection = "organizations"
+        self.audit_subcollection = "audit"
+        
+        # Contadores de leituras/escritas de documentos (verificação de custo)
+        self._io_lock = threading.Lock()
+        self._io = {'reads': 0, 'writes': 0}
+    
+    def _count_io(self, reads: int = 0, writes: int = 0) -> None:
+        """Registra leituras e escritas de documentos."""
+        with self._io_lock:
+            self._io['reads'] += reads
+            self._io['writes'] += writes
+        
+        contar(leituras=reads, escritas=writes)
+    
+    def io_stats(self) -> Dict[str, int]:
+        """
+        Leituras e escritas de documentos feitas por este cliente.
+        
+        Returns:
+            Dicionário com reads e writes (acumulados desde a criação)
+        """
+        with self._io_lock:
+            return dict(self._io)
     
-    def get_oficio(self, org_id: str, oficio_id: str) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _check_tenancy(snapshot: Any, org_id: str, oficio_id: str) -> None:
+        """Valida que o ofício existe e pertence à organização."""
+        if not snapshot.exists:
+            raise ValueError(f"Ofício {oficio_id} não encontrado para org {org_id}")
+        
+        if (snapshot.to_dict() or {}).get('org_id') != org_id:
+            raise PermissionError(
+                f"Acesso negado: ofício {oficio_id} não pertence à organização {org_id}"
+            )
+    
+    @traced('firestore.get_oficio')
+    def get_oficio(
+        self,
+        org_id: str,
+        oficio_id: str,
+        fields: Optional[List[str]] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         Busca um ofício específico com filtro obrigatório de org_id.
         
         Args:
             org_id: ID da organização (tenant)
             oficio_id: ID do ofício
+            fields: Campos a ler (projeção); None lê o documento inteiro.
+                Evita transferir conteudo_bruto quando não é usado.
             
         Returns:
             Dicionário com os dados do ofício ou None se não encontrado
         """
         doc_ref = self.db.collection(self.oficios_collection).document(oficio_id)
-        doc = doc_ref.get()
+        
+        if fields is not None:
+            doc = doc_ref.get(field_paths=sorted(set(fields) | {'org_id'}))
+        else:
+            doc = doc_ref.get()
+        self._count_io(reads=1)
         
         if not doc.exists:
             return None
@@ -58,6 +109,7 @@ class FirestoreClient:
         
         return data
     
+    @traced('firestore.update_oficio')
     def update_oficio(
         self, 
         org_id: str, 
@@ -68,47 +120,87 @@ class FirestoreClient:
         """
         Atualiza um ofício existente com validação de Multi-Tenancy.
         
+        A verificação de tenancy e a escrita rodam na mesma transação; a
+        leitura é uma projeção do campo org_id (não transfere o documento).
+        As entradas de auditoria são criadas na subcoleção oficios/{id}/audit
+        no mesmo commit, sem crescer o documento do ofício.
+        
         Args:
             org_id: ID da organização (tenant)
             oficio_id: ID do ofício
-            data: Dados a serem atualizados
+            data: Dados a serem atualizados (uma lista em audit_trail vira
+                entradas da subcoleção)
             user_id: ID do usuário que está fazendo a atualização (para auditoria)
             
         Returns:
             True se atualização bem-sucedida
+            
+        Raises:
+            ValueError: Se o ofício não existir
+            PermissionError: Se o ofício pertencer a outra organização
         """
-        # Verifica se o ofício pertence à organização
-        existing = self.get_oficio(org_id, oficio_id)
-        if not existing:
-            raise ValueError(f"Ofício {oficio_id} não encontrado para org {org_id}")
-        
         # Adiciona timestamp de atualização
         data['updated_at'] = datetime.utcnow()
         
+        # Entradas de auditoria vão para a subcoleção oficios/{id}/audit
+        audit_entries = [
+            self._audit_entry(org_id, oficio_id, entry)
+            for entry in data.pop('audit_trail', None) or []
+        ]
+        
         # Adiciona trilha de auditoria se user_id fornecido
         if user_id:
-            audit_entry = {
+            audit_entries.append(self._audit_entry(org_id, oficio_id, {
                 'user_id': user_id,
-                'timestamp': datetime.utcnow(),
                 'action': 'update',
-                'org_id': org_id,
                 'changes': list(data.keys())
-            }
+            }))
+        
+        doc_ref = self.db.collection(self.oficios_collection).document(oficio_id)
+        audit_collection = doc_ref.collection(self.audit_subcollection)
+        transaction = self.db.transaction()
+        
+        @firestore.transactional
+        def aplicar(transaction):
+            snapshot = doc_ref.get(field_paths=['org_id'], transaction=transaction)
+            self._count_io(reads=1)
+            
+            # Verifica se o ofício pertence à organização
+            self._check_tenancy(snapshot, org_id, oficio_id)
             
-            # Adiciona à trilha de auditoria existente
-            if 'audit_trail' not in data:
-                data['audit_trail'] = firestore.ArrayUnion([audit_entry])
-            else:
-                existing_trail = existing.get('audit_trail', [])
-                existing_trail.append(audit_entry)
-                data['audit_trail'] = existing_trail
+            transaction.update(doc_ref, data)
+            
+            # Auditoria no mesmo commit: append-only, sem reescrever o ofício
+            for entry in audit_entries:
+                transaction.create(audit_collection.document(), entry)
         
         # Realiza a atualização
-        doc_ref = self.db.collection(self.oficios_collection).document(oficio_id)
-        doc_ref.update(data)
+        aplicar(transaction)
+        self._count_io(writes=1 + len(audit_entries))
         
         return True
     
+    def unit_of_work(
+        self,
+        org_id: str,
+        oficio_id: str,
+        user_id: Optional[str] = None
+    ) -> 'OficioUnitOfWork':
+        """
+        Cria uma unidade de trabalho que agrupa atualizações de várias
+        etapas em uma única escrita (ver OficioUnitOfWork).
+        
+        Args:
+            org_id: ID da organização (tenant)
+            oficio_id: ID do ofício
+            user_id: ID do usuário (para auditoria)
+            
+        Returns:
+            Unidade de trabalho (usar como context manager)
+        """
+        return OficioUnitOfWork(self, org_id, oficio_id, user_id)
+    
+    @traced('firestore.create_oficio')
     def create_oficio(self, org_id: str, data: Dict[str, Any]) -> str:
         """
         Cria um novo ofício no Firestore.
@@ -126,10 +218,114 @@ class FirestoreClient:
         data['status'] = data.get('status', OficioStatus.AGUARDANDO_PROCESSAMENTO.value)
         
         doc_ref = self.db.collection(self.oficios_collection).document()
-        doc_ref.set(data)
+        audit_entries = [
+            self._audit_entry(org_id, doc_ref.id, entry)
+            for entry in data.pop('audit_trail', None) or []
+        ]
+        
+        # Ofício e entradas de auditoria iniciais no mesmo lote
+        batch = self.db.batch()
+        batch.set(doc_ref, data)
+        
+        audit_collection = doc_ref.collection(self.audit_subcollection)
+        for entry in audit_entries:
+            batch.create(audit_collection.document(), entry)
+        
+        batch.commit()
+        self._count_io(writes=1 + len(audit_entries))
         
         return doc_ref.id
     
+    @staticmethod
+    def _audit_entry(org_id: str, oficio_id: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Normaliza uma entrada de auditoria da subcoleção oficios/{id}/audit.
+        
+        org_id e oficio_id são desnormalizados para a consulta por collection
+        group; timestamps ISO (formato legado) viram datetime para ordenação.
+        """
+        timestamp = entry.get('timestamp') or datetime.utcnow()
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+            if timestamp.tzinfo is not None:
+                timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        
+        audit_entry = dict(entry)
+        audit_entry.update({
+            'org_id': org_id,
+            'oficio_id': oficio_id,
+            'timestamp': timestamp,
+            'target_id': entry.get('target_id', oficio_id)
+        })
+        
+        return audit_entry
+    
+    @traced('firestore.list_audit_entries')
+    def list_audit_entries(
+        self,
+        org_id: str,
+        oficio_id: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Lista entradas de auditoria de ofícios, mais recentes primeiro, com paginação por cursor.
+        
+        Sem oficio_id a consulta usa o collection group "audit" filtrado por
+        org_id (requer índice org_id + timestamp DESC com escopo de collection group).
+        
+        Args:
+            org_id: ID da organização (tenant)
+            oficio_id: Restringe a um ofício (opcional)
+            limit: Número máximo de entradas
+            cursor: Cursor retornado pela página anterior
+            
+        Returns:
+            Tupla (entradas, próximo cursor ou None na última página)
+            
+        Raises:
+            ValueError: Se o ofício não existir ou o cursor for inválido
+            PermissionError: Se o ofício pertencer a outra organização
+        """
+        if oficio_id:
+            doc_ref = self.db.collection(self.oficios_collection).document(oficio_id)
+            self._check_tenancy(doc_ref.get(field_paths=['org_id']), org_id, oficio_id)
+            self._count_io(reads=1)
+            
+            query = doc_ref.collection(self.audit_subcollection)
+        else:
+            query = self.db.collection_group(self.audit_subcollection).where('org_id', '==', org_id)
+        
+        query = query.order_by('timestamp', direction=firestore.Query.DESCENDING)
+        
+        if cursor:
+            partes = cursor.split('/')
+            if len(partes) != 4 or partes[0] != self.oficios_collection or partes[2] != self.audit_subcollection:
+                raise ValueError(f"Cursor inválido: {cursor}")
+            
+            cursor_snapshot = self.db.document(cursor).get()
+            self._count_io(reads=1)
+            
+            if not cursor_snapshot.exists or cursor_snapshot.get('org_id') != org_id:
+                raise ValueError(f"Cursor inválido: {cursor}")
+            
+            query = query.start_after(cursor_snapshot)
+        
+        # Uma entrada a mais indica se existe próxima página
+        docs = list(query.limit(limit + 1).stream())
+        self._count_io(reads=max(len(docs), 1))
+        
+        entries = []
+        for doc in docs[:limit]:
+            entry = doc.to_dict()
+            entry['audit_id'] = doc.id
+            entries.append(entry)
+        
+        next_cursor = docs[limit - 1].reference.path if len(docs) > limit else None
+        
+        return entries, next_cursor
+    
+    @traced('firestore.get_organization_by_domain')
     def get_organization_by_domain(self, domain: str) -> Optional[Dict[str, Any]]:
         """
         Busca uma organização pelo domínio de e-mail.
@@ -145,6 +341,7 @@ class FirestoreClient:
         ).limit(1)
         
         results = list(query.stream())
+        self._count_io(reads=max(len(results), 1))
         
         if not results:
             return None
@@ -155,6 +352,7 @@ class FirestoreClient:
         
         return org_data
     
+    @traced('firestore.list_oficios_by_org')
     def list_oficios_by_org(
         self, 
         org_id: str, 
@@ -184,9 +382,62 @@ class FirestoreClient:
             data = doc.to_dict()
             data['oficio_id'] = doc.id
             results.append(data)
+        self._count_io(reads=max(len(results), 1))
         
         return results
     
+    @traced('firestore.list_oficios_em_risco')
+    def list_oficios_em_risco(
+        self,
+        org_id: str,
+        status: List[str],
+        data_limite_ate: str,
+        fields: Optional[List[str]] = None,
+        limit: int = 200,
+        cursor: Optional[Any] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[Any]]:
+        """
+        Lista ofícios abertos com prazo antes de um horizonte, do mais antigo ao mais novo.
+        
+        A consulta usa o índice org_id + status + data_limite: lê apenas os
+        ofícios em risco, não o histórico da organização. Ofícios sem
+        data_limite não são retornados.
+        
+        Args:
+            org_id: ID da organização
+            status: Status monitorados (até 30 valores, filtro 'in')
+            data_limite_ate: data_limite máxima (exclusiva), ISO 8601
+            fields: Projeção (None = documento inteiro)
+            limit: Ofícios por página
+            cursor: Cursor retornado pela página anterior
+            
+        Returns:
+            Tupla (ofícios com oficio_id, cursor da próxima página ou None)
+        """
+        query = self.db.collection(self.oficios_collection) \
+            .where('org_id', '==', org_id) \
+            .where('status', 'in', status) \
+            .where('data_limite', '<', data_limite_ate) \
+            .order_by('data_limite')
+        
+        if fields is not None:
+            query = query.select(fields)
+        if cursor is not None:
+            query = query.start_after(cursor)
+        
+        docs = list(query.limit(limit).stream())
+        self._count_io(reads=max(len(docs), 1))
+        
+        oficios = []
+        for doc in docs:
+            data = doc.to_dict()
+            data['oficio_id'] = doc.id
+            oficios.append(data)
+        
+        # Página cheia: o último snapshot é o cursor da próxima
+        return oficios, (docs[-1] if len(docs) == limit else None)
+    
+    @traced('firestore.log_audit_event')
     def log_audit_event(
         self,
         user_id: str,
@@ -221,9 +472,11 @@ class FirestoreClient:
         # Salva na coleção de auditoria
         audit_ref = self.db.collection('audit_trail').document()
         audit_ref.set(audit_data)
+        self._count_io(writes=1)
         
         return audit_ref.id
     
+    @traced('firestore.get_secret')
     def get_secret(self, org_id: str, secret_name: str) -> str:
         """
         Busca segredo no Google Secret Manager com escopo de organização.
@@ -262,6 +515,7 @@ class FirestoreClient:
             
             raise ValueError(f"Segredo {org_id}_{secret_name} não encontrado: {e}")
     
+    @traced('firestore.get_latest_policy')
     def get_latest_policy(self, org_id: str, policy_type: str) -> Optional[Dict[str, Any]]:
         """
         Busca a política mais recente e ativa de uma organização.
@@ -291,6 +545,7 @@ class FirestoreClient:
         
         return policy_data
     
+    @traced('firestore.update_policy')
     def update_policy(
         self,
         org_id: str,
@@ -348,6 +603,7 @@ class FirestoreClient:
         
         return doc_ref.id
     
+    @traced('firestore.register_policy_acceptance')
     def register_policy_acceptance(
         self,
         user_id: str,
@@ -386,6 +642,7 @@ class FirestoreClient:
         
         return doc_ref.id
     
+    @traced('firestore.check_policy_acceptance')
     def check_policy_acceptance(
         self,
         user_id: str,
@@ -417,6 +674,104 @@ class FirestoreClient:
         return len(results) > 0
 
 
+class OficioUnitOfWork:
+    """
+    Agrupa atualizações de várias etapas de um ofício em uma única escrita.
+    
+    Cada update() é combinado às alterações pendentes (a última escrita de
+    um campo prevalece); commit() aplica tudo com um único update_oficio
+    (uma leitura de verificação e uma escrita). Como context manager,
+    faz commit na saída, inclusive quando uma etapa posterior falha: os
+    resultados das etapas já concluídas (ex: texto extraído) são gravados
+    antes de a exceção seguir.
+    
+    Exemplo:
+        with firestore_client.unit_of_work(org_id, oficio_id, user_id='system') as uow:
+            uow.update({'conteudo_bruto': texto})
+            ...
+            uow.update({'status': 'AGUARDANDO_COMPLIANCE', 'prioridade': 'ALTA'})
+    """
+    
+    def __init__(
+        self,
+        client: FirestoreClient,
+        org_id: str,
+        oficio_id: str,
+        user_id: Optional[str] = None
+    ):
+        self.client = client
+        self.org_id = org_id
+        self.oficio_id = oficio_id
+        self.user_id = user_id
+        self._pending: Dict[str, Any] = {}
+        self.commits = 0
+    
+    @property
+    def pending(self) -> Dict[str, Any]:
+        """Alterações ainda não gravadas."""
+        return dict(self._pending)
+    
+    def update(self, data: Dict[str, Any]) -> None:
+        """
+        Registra alterações (caminhos com ponto são aceitos).
+        
+        Um campo sobrescreve alterações pendentes em seus subcampos
+        ('a' descarta 'a.b'); um subcampo de um mapa pendente é aplicado
+        dentro do mapa ('a.b' sobre 'a').
+        
+        Args:
+            data: Campos a atualizar
+        """
+        for path, value in data.items():
+            for pending_path in [p for p in self._pending if p.startswith(path + '.')]:
+                del self._pending[pending_path]
+            
+            parent = next(
+                (p for p in self._pending if path.startswith(p + '.') and isinstance(self._pending[p], dict)),
+                None
+            )
+            
+            if parent is None:
+                self._pending[path] = value
+                continue
+            
+            target = self._pending[parent] = dict(self._pending[parent])
+            parts = path[len(parent) + 1:].split('.')
+            for part in parts[:-1]:
+                target[part] = dict(target.get(part) or {})
+                target = target[part]
+            target[parts[-1]] = value
+    
+    def commit(self) -> bool:
+        """
+        Grava as alterações pendentes em uma única atualização.
+        
+        Returns:
+            True se algo foi gravado
+        """
+        if not self._pending:
+            return False
+        
+        data, self._pending = self._pending, {}
+        self.client.update_oficio(self.org_id, self.oficio_id, data, user_id=self.user_id)
+        self.commits += 1
+        
+        return True
+    
+    def __enter__(self) -> 'OficioUnitOfWork':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        try:
+            self.commit()
+        except Exception as commit_error:
+            if exc is None:
+                raise
+            logging.error(f"Falha ao gravar etapas pendentes do ofício {self.oficio_id}: {commit_error}")
+        
+        return False
+
+
 class RawTextStorageClient:
     """
     Cliente para armazenamento seguro de raw_text (LGPD compliance).
@@ -637,26 +992,47 @@ class GroqClient:
         self.client = Groq(api_key=self.api_key)
         self.model = "llama-3.1-8b-instant"  # Modelo Llama 3.1 8B
     
+    @traced('groq.extract_structured_data')
     def extract_structured_data(
         self, 
         text_content: str,
         org_id: str,
         pydantic_schema: Type[BaseModel],
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        token_budget: Optional[int] = None
     ) -> BaseModel:
         """
         Extrai dados estruturados de texto usando LLM com schema Pydantic.
         Usa Chain-of-Thought para melhorar a acurácia.
         
+        O texto é compactado antes do envio (espaços do OCR, cabeçalhos e
+        rodapés repetidos, trechos relevantes dentro do orçamento de tokens).
+        
         Args:
             text_content: Conteúdo de texto do ofício
             org_id: ID da organização (para contexto)
             pydantic_schema: Classe Pydantic que define o schema esperado
             system_prompt: Prompt de sistema customizado (opcional)
+            token_budget: Máximo de tokens do texto (padrão: LLM_INPUT_TOKEN_BUDGET)
             
         Returns:
             Instância do modelo Pydantic com dados extraídos
         """
+        compactacao = compact_text(text_content, token_budget)
+        text_content = compactacao['texto']
+        anotar(
+            modelo=self.model,
+            caracteres_entrada=len(compactacao['texto']),
+            tokens_antes=compactacao['tokens_antes'],
+            tokens_depois=compactacao['tokens_depois'],
+            truncado=compactacao['truncado']
+        )
+        
+        logging.info(
+            f"Texto para o LLM: {compactacao['tokens_antes']} → {compactacao['tokens_depois']} tokens (estimados)"
+            + (" com trechos omitidos" if compactacao['truncado'] else "")
+        )
+        
         # Schema JSON do modelo Pydantic
         schema_json = pydantic_schema.model_json_schema()
         
@@ -671,7 +1047,7 @@ Use o seguinte processo de raciocínio (Chain-of-Thought):
 3. **EXTRAÇÃO**: Gere o JSON final com os dados estruturados
 
 Schema esperado:
-{json.dumps(schema_json, indent=2, ensure_ascii=False)}
+{json.dumps(schema_json, separators=(',', ':'), ensure_ascii=False)}
 
 Contexto: Este ofício pertence à organização ID: {org_id}
 
@@ -705,6 +1081,11 @@ Retorne o JSON final conforme o schema."""
             
             # Extrai o JSON da resposta
             response_text = completion.choices[0].message.content
+            
+            usage = getattr(completion, 'usage', None)
+            if usage is not None:
+                anotar(tokens_prompt=usage.prompt_tokens, tokens_resposta=usage.completion_tokens)
+            anotar(caracteres_resposta=len(response_text or ''))
             response_json = json.loads(response_text)
             
             # Valida e converte para o modelo Pydantic
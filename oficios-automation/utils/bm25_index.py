@@ -0,0 +1,273 @@
+"""
+Índice lexical BM25 em memória para a base de conhecimento (RAG).
+Complementa a busca vetorial em consultas que dependem de termos exatos
+("Lei 105/2001", "Art. 5º", números de processo).
+
+As posições dos documentos são as mesmas do índice vetorial da organização,
+o que permite combinar os dois rankings sem consultas adicionais.
+"""
+import io
+import json
+import math
+import re
+import unicodedata
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Números compostos (105/2001, 0001234-56.2024.8.26.0100, 5º) ou palavras
+_TOKEN_RE = re.compile(r'\d+(?:[./-]\d+)*[ºª]?|[^\W\d_]+', re.UNICODE)
+_NUMBER_PART_RE = re.compile(r'\d+')
+
+STOPWORDS = frozenset(
+    'a o e é as os da de do das dos em no na nos nas um uma uns umas por para com '
+    'sem se que ao aos à às ou como mais mas foi ser são sua seu suas seus'.split()
+)
+
+
+def _remover_acentos(token: str) -> str:
+    """Remove acentos de palavras (bancário -> bancario)."""
+    decomposed = unicodedata.normalize('NFKD', token)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokeniza texto jurídico para o índice lexical.
+
+    Números compostos são mantidos inteiros e também geram suas partes
+    ("105/2001" -> "105/2001", "105", "2001"); ordinais usam "º" ("5°" e
+    "5º" são equivalentes). Palavras são minúsculas e sem acentos.
+
+    Args:
+        text: Texto
+
+    Returns:
+        Lista de tokens
+    """
+    text = text.lower().replace('°', 'º').replace('ª', 'º')
+    tokens = []
+
+    for match in _TOKEN_RE.finditer(text):
+        token = match.group(0)
+
+        if token[0].isdigit():
+            tokens.append(token)
+            parts = _NUMBER_PART_RE.findall(token)
+            if len(parts) > 1:
+                tokens.extend(parts)
+            continue
+
+        token = _remover_acentos(token)
+        if token not in STOPWORDS:
+            tokens.append(token)
+
+    return tokens
+
+
+class BM25Index:
+    """
+    Índice invertido BM25 com inserção incremental.
+
+    Cada termo guarda arrays paralelos (posição do documento, frequência),
+    lidos com np.frombuffer na consulta.
+    """
+
+    def __init__(self, version: int = 0, k1: float = 1.2, b: float = 0.75):
+        """
+        Inicializa um índice vazio.
+
+        Args:
+            version: Carimbo de versão da base de conhecimento da organização
+            k1: Saturação da frequência do termo
+            b: Normalização pelo tamanho do documento
+        """
+        self.version = version
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._doc_lens = array('i')
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_lens)
+
+    @classmethod
+    def build(cls, texts: Iterable[str], version: int = 0, **params: float) -> 'BM25Index':
+        """
+        Constrói o índice a partir dos textos, na ordem das posições.
+
+        Args:
+            texts: Texto de cada documento
+            version: Carimbo de versão
+            **params: k1 e b
+
+        Returns:
+            Índice construído
+        """
+        index = cls(version=version, **params)
+
+        for text in texts:
+            index.add(text)
+
+        return index
+
+    def add(self, text: str) -> int:
+        """
+        Adiciona um documento na próxima posição.
+
+        Args:
+            text: Texto do documento
+
+        Returns:
+            Posição atribuída
+        """
+        pos = len(self._doc_lens)
+        tokens = tokenize(text)
+        counts: Dict[str, int] = {}
+
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+
+        for token, tf in counts.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = (array('i'), array('i'))
+            postings[0].append(pos)
+            postings[1].append(tf)
+
+        self._doc_lens.append(len(tokens))
+        self._total_len += len(tokens)
+
+        return pos
+
+    def scores(self, query: str) -> Optional[np.ndarray]:
+        """
+        Calcula o score BM25 da query para todos os documentos.
+
+        Args:
+            query: Texto da query
+
+        Returns:
+            Array de scores por posição (None se nenhum termo da query estiver no índice)
+        """
+        size = len(self._doc_lens)
+        terms = [term for term in set(tokenize(query)) if term in self._postings]
+
+        if size == 0 or not terms:
+            return None
+
+        doc_lens = np.frombuffer(self._doc_lens, dtype=np.int32)
+        avgdl = max(self._total_len / size, 1.0)
+        scores = np.zeros(size, dtype=np.float32)
+
+        for term in terms:
+            positions_arr, tfs_arr = self._postings[term]
+            positions = np.frombuffer(positions_arr, dtype=np.int32)
+            tfs = np.frombuffer(tfs_arr, dtype=np.int32).astype(np.float32)
+
+            df = len(positions)
+            idf = math.log(1 + (size - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_lens[positions] / avgdl)
+
+            scores[positions] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        return scores
+
+    def search(self, query: str, top_k: int, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Busca os top_k documentos com maior score BM25.
+
+        Args:
+            query: Texto da query
+            top_k: Número de resultados
+            mask: Máscara booleana por posição; posições False são descartadas
+
+        Returns:
+            Lista de (posição, score) em ordem decrescente (apenas scores > 0)
+        """
+        scores = self.scores(query)
+
+        if scores is None or top_k <= 0:
+            return []
+
+        if mask is not None:
+            scores[~mask[:len(scores)]] = 0
+
+        candidatos = np.flatnonzero(scores)
+
+        if top_k < len(candidatos):
+            candidatos = candidatos[np.argpartition(-scores[candidatos], top_k - 1)[:top_k]]
+
+        candidatos = candidatos[np.argsort(-scores[candidatos], kind='stable')]
+
+        return [(int(pos), float(scores[pos])) for pos in candidatos]
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializa o índice (formato .npz, sem pickle).
+
+        Returns:
+            Conteúdo binário do índice
+        """
+        terms = list(self._postings)
+        lengths = np.array([len(self._postings[term][0]) for term in terms], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+        positions = np.concatenate(
+            [np.frombuffer(self._postings[term][0], dtype=np.int32) for term in terms]
+        ) if terms else np.zeros(0, dtype=np.int32)
+        tfs = np.concatenate(
+            [np.frombuffer(self._postings[term][1], dtype=np.int32) for term in terms]
+        ) if terms else np.zeros(0, dtype=np.int32)
+
+        meta = {
+            'version': self.version,
+            'k1': self.k1,
+            'b': self.b,
+            'terms': terms
+        }
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            meta=np.frombuffer(meta_bytes, dtype=np.uint8),
+            offsets=offsets,
+            positions=positions,
+            tfs=tfs,
+            doc_lens=np.frombuffer(self._doc_lens, dtype=np.int32)
+        )
+
+        return buffer.getvalue()
+
+
+def load_bm25_index(data: bytes) -> BM25Index:
+    """
+    Restaura um índice serializado por to_bytes.
+
+    Args:
+        data: Conteúdo binário do índice
+
+    Returns:
+        Índice restaurado
+    """
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        arrays = {name: arrays[name] for name in arrays.files}
+
+    meta = json.loads(arrays['meta'].tobytes().decode('utf-8'))
+    index = BM25Index(version=meta['version'], k1=meta['k1'], b=meta['b'])
+
+    offsets = arrays['offsets']
+    positions = arrays['positions'].astype(np.int32)
+    tfs = arrays['tfs'].astype(np.int32)
+
+    for i, term in enumerate(meta['terms']):
+        start, end = offsets[i], offsets[i + 1]
+        index._postings[term] = (array('i', positions[start:end].tobytes()), array('i', tfs[start:end].tobytes()))
+
+    index._doc_lens = array('i', arrays['doc_lens'].astype(np.int32).tobytes())
+    index._total_len = int(arrays['doc_lens'].sum())
+
+    return index
@@ -0,0 +1,204 @@
+"""
+Segmentação de documentos de conhecimento em chunks para vetorização.
+Janelas com sobreposição, limitadas por tokens estimados, que respeitam
+os limites de artigos e parágrafos de textos legais ("Art. 5º", "§ 1º").
+"""
+import bisect
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Estimativa usada também no agrupamento de lotes de embeddings
+CHARS_PER_TOKEN = 4
+
+DEFAULT_CHUNK_MAX_TOKENS = 512
+DEFAULT_CHUNK_OVERLAP_TOKENS = 64
+
+# Início de dispositivo legal: artigo, parágrafo, capítulo, seção ou título
+_BOUNDARY_RE = re.compile(
+    r'^[ \t]*(?:Art\.?\s*\d+|§\s*\d+|Par[áa]grafo\s+[úu]nico'
+    r'|(?:CAP[ÍI]TULO|Cap[íi]tulo|T[ÍI]TULO|T[íi]tulo|SE[ÇC][ÃA]O|Se[çc][ãa]o)\s+[IVXLCDM\d]+)',
+    re.MULTILINE
+)
+_ARTICLE_RE = re.compile(r'^[ \t]*(Art\.?\s*\d+[º°o]?(?:-[A-Z])?)', re.MULTILINE)
+_PARAGRAPH_BREAK_RE = re.compile(r'\n[ \t]*\n')
+_SENTENCE_END_RE = re.compile(r'(?<=[.;:!?])\s+')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+Span = Tuple[int, int]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estima o número de tokens de um texto (~4 caracteres por token).
+
+    Args:
+        text: Texto
+
+    Returns:
+        Número estimado de tokens
+    """
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _strip_span(text: str, start: int, end: int) -> Optional[Span]:
+    """Remove espaços nas pontas do intervalo (None se ficar vazio)."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+
+    return (start, end) if start < end else None
+
+
+def _split_units(text: str) -> List[Span]:
+    """Divide o texto em dispositivos legais e parágrafos."""
+    cuts = {0, len(text)}
+    cuts.update(match.start() for match in _BOUNDARY_RE.finditer(text))
+    cuts.update(match.end() for match in _PARAGRAPH_BREAK_RE.finditer(text))
+
+    ordered = sorted(cuts)
+    units = []
+
+    for start, end in zip(ordered, ordered[1:]):
+        span = _strip_span(text, start, end)
+        if span:
+            units.append(span)
+
+    return units
+
+
+def _split_long_unit(text: str, span: Span, max_chars: int, overlap_chars: int) -> List[Span]:
+    """
+    Divide um parágrafo maior que o limite em frases; frases ainda maiores
+    viram janelas de tamanho fixo (com sobreposição) cortadas em espaços.
+    """
+    start, end = span
+    cuts = [start] + [match.end() for match in _SENTENCE_END_RE.finditer(text, start, end)] + [end]
+    pieces = []
+
+    for piece_start, piece_end in zip(cuts, cuts[1:]):
+        piece = _strip_span(text, piece_start, piece_end)
+        if not piece:
+            continue
+
+        if piece[1] - piece[0] <= max_chars:
+            pieces.append(piece)
+            continue
+
+        window_start = piece[0]
+        while window_start < piece[1]:
+            window_end = min(window_start + max_chars, piece[1])
+
+            if window_end < piece[1]:
+                space = text.rfind(' ', window_start + max_chars // 2, window_end)
+                if space > 0:
+                    window_end = space
+
+            pieces.append((window_start, window_end))
+
+            if window_end >= piece[1]:
+                break
+
+            window_start = max(window_end - overlap_chars, window_start + 1)
+            while window_start < window_end and not text[window_start - 1].isspace():
+                window_start += 1
+
+    return pieces
+
+
+def _tail_span(text: str, span: Span, overlap_chars: int) -> Optional[Span]:
+    """Final de um dispositivo com até overlap_chars, iniciando em frase ou palavra."""
+    start, end = span
+    tail_start = max(start, end - overlap_chars)
+
+    sentence = _SENTENCE_END_RE.search(text, tail_start, end)
+    if sentence and sentence.end() < end:
+        return _strip_span(text, sentence.end(), end)
+
+    space = text.find(' ', tail_start, end)
+    if space < 0:
+        return None
+
+    return _strip_span(text, space, end)
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = DEFAULT_CHUNK_MAX_TOKENS,
+    overlap_tokens: int = DEFAULT_CHUNK_OVERLAP_TOKENS
+) -> List[Dict[str, Any]]:
+    """
+    Segmenta um texto em chunks com sobreposição.
+
+    Os cortes acontecem preferencialmente no início de artigos, parágrafos
+    (§) e blocos separados por linha em branco; a sobreposição repete os
+    últimos dispositivos do chunk anterior que caibam em overlap_tokens
+    (ou apenas o final do último, quando ele é maior que a sobreposição).
+
+    Args:
+        text: Texto completo do documento
+        max_tokens: Tamanho máximo estimado de cada chunk
+        overlap_tokens: Sobreposição máxima entre chunks consecutivos
+
+    Returns:
+        Lista de dicionários com chunk_index, conteudo, inicio, fim e secao
+        (artigo em vigor no início do chunk, se houver)
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    overlap_chars = min(overlap_tokens * CHARS_PER_TOKEN, max_chars // 2)
+
+    units: List[Span] = []
+    for span in _split_units(text):
+        if span[1] - span[0] > max_chars:
+            units.extend(_split_long_unit(text, span, max_chars, overlap_chars))
+        else:
+            units.append(span)
+
+    # (início, fim, início do conteúdo novo sem a sobreposição)
+    spans: List[Tuple[int, int, int]] = []
+    current: List[Span] = []
+    new_start = 0
+
+    for unit in units:
+        if current and unit[1] - current[0][0] > max_chars:
+            spans.append((current[0][0], current[-1][1], new_start))
+
+            carry = []
+            for previous in reversed(current):
+                if current[-1][1] - previous[0] > overlap_chars:
+                    break
+                carry.insert(0, previous)
+
+            # Último dispositivo maior que a sobreposição: repete só o final dele
+            if not carry and overlap_chars:
+                tail = _tail_span(text, current[-1], overlap_chars)
+                if tail:
+                    carry = [tail]
+
+            while carry and unit[1] - carry[0][0] > max_chars:
+                carry.pop(0)
+
+            current = carry
+            new_start = unit[0]
+
+        current.append(unit)
+
+    if current:
+        spans.append((current[0][0], current[-1][1], new_start))
+
+    articles = [(match.start(), _WHITESPACE_RE.sub(' ', match.group(1))) for match in _ARTICLE_RE.finditer(text)]
+    article_starts = [start for start, _ in articles]
+
+    chunks = []
+    for chunk_index, (start, end, new_start) in enumerate(spans):
+        pos = bisect.bisect_right(article_starts, new_start) - 1
+
+        chunks.append({
+            'chunk_index': chunk_index,
+            'conteudo': text[start:end],
+            'inicio': start,
+            'fim': end,
+            'secao': articles[pos][1] if pos >= 0 else None
+        })
+
+    return chunks
@@ -0,0 +1,304 @@
+"""
+Cache de embeddings endereçado por conteúdo.
+Chave: sha256 do modelo + texto normalizado. Camada em memória (LRU limitada
+por bytes) com store persistente opcional (SQLite local ou coleção Firestore).
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalizar_texto(text: str) -> str:
+    """Normaliza Unicode (NFC) e colapsa espaços para a chave do cache."""
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def embedding_cache_key(text: str, model: str) -> str:
+    """
+    Gera a chave do cache para um texto e modelo.
+
+    Args:
+        text: Texto vetorizado
+        model: Identificador do modelo de embedding
+
+    Returns:
+        Hash sha256 em hexadecimal
+    """
+    payload = f"{model}\x00{normalizar_texto(text)}".encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+class SQLiteEmbeddingStore:
+    """Store persistente em arquivo SQLite local (ex: volume de container ou /tmp)."""
+
+    def __init__(self, path: str):
+        """
+        Abre (ou cria) o arquivo de cache.
+
+        Args:
+            path: Caminho do arquivo SQLite
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Busca vetores pelas chaves (ausentes são omitidas)."""
+        if not keys:
+            return {}
+
+        found = {}
+
+        with self._lock:
+            # SQLite limita o número de parâmetros por consulta
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray], model: str) -> None:
+        """Grava vetores (float32) indexados pela chave."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                [(key, model, vector.tobytes()) for key, vector in items.items()]
+            )
+            self._conn.commit()
+
+
+class FirestoreEmbeddingStore:
+    """Store persistente compartilhado entre instâncias (coleção embedding_cache)."""
+
+    def __init__(self, db, collection: str = "embedding_cache"):
+        """
+        Args:
+            db: Cliente Firestore
+            collection: Nome da coleção
+        """
+        self.db = db
+        self.collection = collection
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Busca vetores com uma única leitura em lote (get_all)."""
+        if not keys:
+            return {}
+
+        refs = [self.db.collection(self.collection).document(key) for key in keys]
+        found = {}
+
+        for doc in self.db.get_all(refs):
+            if doc.exists:
+                found[doc.id] = np.frombuffer(doc.to_dict()['vector'], dtype=np.float32)
+
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray], model: str) -> None:
+        """Grava vetores como bytes float32 em escritas agrupadas."""
+        keys = list(items)
+
+        for start in range(0, len(keys), 500):
+            batch = self.db.batch()
+
+            for key in keys[start:start + 500]:
+                batch.set(self.db.collection(self.collection).document(key), {
+                    'model': model,
+                    'vector': items[key].tobytes()
+                })
+
+            batch.commit()
+
+
+class EmbeddingCache:
+    """
+    Cache LRU de embeddings limitado por bytes, com store persistente opcional.
+
+    Os vetores são mantidos como float32; contadores de acerto ficam
+    disponíveis em stats().
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, store=None):
+        """
+        Inicializa o cache.
+
+        Args:
+            max_bytes: Limite de memória ocupada pelos vetores
+            store: Store persistente (SQLiteEmbeddingStore, FirestoreEmbeddingStore ou None)
+        """
+        self.max_bytes = max_bytes
+        self.store = store
+        self._entries: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def get_many(self, texts: Sequence[str], model: str) -> List[Optional[List[float]]]:
+        """
+        Busca embeddings de vários textos (memória, depois store persistente).
+
+        Args:
+            texts: Textos
+            model: Identificador do modelo
+
+        Returns:
+            Lista com o vetor de cada texto ou None quando ausente
+        """
+        keys = [embedding_cache_key(text, model) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+
+        pendentes = {key for key in keys if key not in found}
+
+        if pendentes and self.store is not None:
+            try:
+                persistidos = self.store.get_many(list(pendentes))
+            except Exception as e:
+                logger.warning(f"Erro ao ler store de embeddings: {e}")
+                persistidos = {}
+
+            with self._lock:
+                for key, vector in persistidos.items():
+                    self._insert(key, vector)
+            found.update(persistidos)
+
+        results = []
+
+        with self._lock:
+            for key in keys:
+                vector = found.get(key)
+
+                if vector is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+
+                if key in pendentes:
+                    self.store_hits += 1
+                else:
+                    self.hits += 1
+                results.append(vector.tolist())
+
+        return results
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        """Busca o embedding de um texto (None se ausente)."""
+        return self.get_many([text], model)[0]
+
+    def put_many(self, texts: Sequence[str], embeddings: Sequence[Sequence[float]], model: str) -> None:
+        """
+        Armazena embeddings na memória e no store persistente.
+
+        Args:
+            texts: Textos
+            embeddings: Vetores correspondentes
+            model: Identificador do modelo
+        """
+        items = {
+            embedding_cache_key(text, model): np.asarray(embedding, dtype=np.float32)
+            for text, embedding in zip(texts, embeddings)
+        }
+
+        with self._lock:
+            for key, vector in items.items():
+                self._insert(key, vector)
+
+        if self.store is not None and items:
+            try:
+                self.store.put_many(items, model)
+            except Exception as e:
+                logger.warning(f"Erro ao gravar store de embeddings: {e}")
+
+    def put(self, text: str, embedding: Sequence[float], model: str) -> None:
+        """Armazena o embedding de um texto."""
+        self.put_many([text], [embedding], model)
+
+    def _insert(self, key: str, vector: np.ndarray) -> None:
+        """Insere na LRU e despeja os itens mais antigos acima do limite (requer lock)."""
+        anterior = self._entries.pop(key, None)
+        if anterior is not None:
+            self._bytes -= anterior.nbytes
+
+        if vector.nbytes > self.max_bytes:
+            return
+
+        self._entries[key] = vector
+        self._bytes += vector.nbytes
+
+        while self._bytes > self.max_bytes:
+            _, removido = self._entries.popitem(last=False)
+            self._bytes -= removido.nbytes
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Contadores do cache.
+
+        Returns:
+            Dicionário com hits, store_hits, misses, hit_rate, entries e bytes
+        """
+        with self._lock:
+            total = self.hits + self.store_hits + self.misses
+            return {
+                'hits': self.hits,
+                'store_hits': self.store_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.store_hits) / total, 4) if total else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
+
+
+def embedding_cache_from_env(db=None) -> EmbeddingCache:
+    """
+    Cria o cache conforme variáveis de ambiente.
+
+    - EMBEDDING_CACHE_MAX_BYTES: limite da LRU em memória (padrão 64 MiB)
+    - EMBEDDING_CACHE_STORE: '' (só memória), 'firestore' ou caminho de arquivo SQLite
+
+    Args:
+        db: Cliente Firestore (necessário para o store 'firestore')
+
+    Returns:
+        Cache configurado
+    """
+    max_bytes = int(os.getenv('EMBEDDING_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    store_config = os.getenv('EMBEDDING_CACHE_STORE', '')
+
+    store = None
+
+    if store_config == 'firestore' and db is not None:
+        store = FirestoreEmbeddingStore(db)
+    elif store_config:
+        store = SQLiteEmbeddingStore(store_config.replace('sqlite://', '', 1))
+
+    return EmbeddingCache(max_bytes=max_bytes, store=store)
@@ -0,0 +1,85 @@
+"""
+Formatos de armazenamento de embeddings no Firestore.
+
+- list: array de floats (formato original, ~11 bytes por dimensão no protocolo)
+- float16: bytes little-endian em meia precisão (2 bytes por dimensão)
+- int8: bytes quantizados com escala simétrica por vetor (1 byte por dimensão)
+
+Os formatos binários são lidos com np.frombuffer, sem converter cada
+valor para float do Python.
+"""
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+FORMAT_LIST = 'list'
+FORMAT_FLOAT16 = 'float16'
+FORMAT_INT8 = 'int8'
+
+STORAGE_FORMATS = (FORMAT_LIST, FORMAT_FLOAT16, FORMAT_INT8)
+
+
+def encode_embedding(embedding: Sequence[float], storage_format: str) -> Dict[str, Any]:
+    """
+    Codifica um embedding nos campos gravados no documento.
+
+    Args:
+        embedding: Vetor
+        storage_format: 'list', 'float16' ou 'int8'
+
+    Returns:
+        Campos embedding, embedding_format e (int8) embedding_scale
+    """
+    if storage_format == FORMAT_LIST:
+        return {
+            'embedding': [float(value) for value in embedding],
+            'embedding_format': FORMAT_LIST
+        }
+
+    vector = np.asarray(embedding, dtype=np.float32)
+
+    if storage_format == FORMAT_FLOAT16:
+        return {
+            'embedding': vector.astype('<f2').tobytes(),
+            'embedding_format': FORMAT_FLOAT16
+        }
+
+    if storage_format == FORMAT_INT8:
+        max_abs = float(np.max(np.abs(vector))) if vector.size else 0.0
+        scale = max_abs / 127.0 if max_abs > 0 else 1.0
+
+        return {
+            'embedding': np.clip(np.rint(vector / scale), -127, 127).astype(np.int8).tobytes(),
+            'embedding_format': FORMAT_INT8,
+            'embedding_scale': scale
+        }
+
+    raise ValueError(f"Formato de embedding desconhecido: {storage_format}")
+
+
+def decode_embedding(doc_data: Dict[str, Any]) -> Optional[np.ndarray]:
+    """
+    Lê o embedding de um documento em qualquer formato.
+
+    Documentos antigos (sem embedding_format) são tratados como 'list'.
+
+    Args:
+        doc_data: Dados do documento
+
+    Returns:
+        Vetor (float16/float32) ou None se o documento não tiver embedding
+    """
+    raw = doc_data.get('embedding')
+
+    if raw is None or len(raw) == 0:
+        return None
+
+    storage_format = doc_data.get('embedding_format', FORMAT_LIST)
+
+    if storage_format == FORMAT_FLOAT16:
+        return np.frombuffer(raw, dtype='<f2')
+
+    if storage_format == FORMAT_INT8:
+        return np.frombuffer(raw, dtype=np.int8).astype(np.float32) * np.float32(doc_data.get('embedding_scale', 1.0))
+
+    return np.asarray(raw, dtype=np.float32)
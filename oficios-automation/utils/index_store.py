@@ -0,0 +1,123 @@
+"""
+Persistência de índices vetoriais por organização.
+Permite que instâncias frias carreguem o índice pronto (arquivo local ou
+blob no GCS) em vez de varrer a coleção knowledge_base.
+"""
+import logging
+import os
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LocalIndexStore:
+    """Armazena índices em arquivos locais ({diretório}/{org_id}.npz)."""
+
+    def __init__(self, directory: str):
+        """
+        Inicializa o store local.
+
+        Args:
+            directory: Diretório onde os índices são gravados
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, org_id: str, name: str) -> str:
+        return os.path.join(self.directory, f"{org_id}.{name}")
+
+    def load(self, org_id: str, name: str = "npz") -> Optional[bytes]:
+        """
+        Lê o índice serializado da organização.
+
+        Args:
+            org_id: ID da organização
+            name: Sufixo do artefato
+
+        Returns:
+            Conteúdo binário ou None se não existir
+        """
+        path = self._path(org_id, name)
+
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def save(self, org_id: str, data: bytes, name: str = "npz") -> None:
+        """
+        Grava o índice serializado (escrita atômica via rename).
+
+        Args:
+            org_id: ID da organização
+            data: Conteúdo binário
+            name: Sufixo do artefato
+        """
+        path = self._path(org_id, name)
+        tmp_path = f"{path}.tmp"
+
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+
+        os.replace(tmp_path, path)
+
+
+class GCSIndexStore:
+    """Armazena índices em blobs do GCS (gs://{bucket}/{prefix}/{org_id}.npz)."""
+
+    def __init__(self, bucket_name: str, prefix: str = "rag_indexes"):
+        """
+        Inicializa o store no GCS.
+
+        Args:
+            bucket_name: Nome do bucket
+            prefix: Prefixo dos blobs
+        """
+        from google.cloud import storage
+
+        self.bucket = storage.Client().bucket(bucket_name)
+        self.prefix = prefix.strip('/')
+
+    def _blob(self, org_id: str, name: str):
+        return self.bucket.blob(f"{self.prefix}/{org_id}.{name}")
+
+    def load(self, org_id: str, name: str = "npz") -> Optional[bytes]:
+        """Lê o índice serializado da organização (None se não existir)."""
+        blob = self._blob(org_id, name)
+
+        if not blob.exists():
+            return None
+
+        return blob.download_as_bytes()
+
+    def save(self, org_id: str, data: bytes, name: str = "npz") -> None:
+        """Grava o índice serializado da organização."""
+        self._blob(org_id, name).upload_from_string(data, content_type='application/octet-stream')
+
+
+def index_store_from_uri(uri: Optional[str]):
+    """
+    Cria o store a partir de uma URI de configuração.
+
+    Formatos aceitos:
+    - gs://bucket/prefixo
+    - file:///caminho ou /caminho
+
+    Args:
+        uri: URI do store (vazio desabilita a persistência)
+
+    Returns:
+        Store configurado ou None
+    """
+    if not uri:
+        return None
+
+    if uri.startswith('gs://'):
+        bucket_name, _, prefix = uri[len('gs://'):].partition('/')
+        return GCSIndexStore(bucket_name, prefix or "rag_indexes")
+
+    if uri.startswith('file://'):
+        uri = uri[len('file://'):]
+
+    return LocalIndexStore(uri)
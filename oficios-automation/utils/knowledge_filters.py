@@ -0,0 +1,233 @@
+"""
+Filtros de metadados da base de conhecimento (tipo, tags e período).
+
+Os mesmos filtros são aplicados na consulta do Firestore (quando possível)
+e nos índices em memória, como máscaras booleanas calculadas antes da
+pontuação de similaridade.
+
+Formato dos filtros:
+    {
+        "tipos": ["legislacao", "politica_interna"],   # qualquer um dos tipos
+        "tags": ["sigilo", "bancário"],                # qualquer uma das tags (metadata.tags)
+        "data_inicio": "2024-01-01",                   # created_at >= data_inicio
+        "data_fim": "2024-12-31T23:59:59"              # created_at <= data_fim
+    }
+"""
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+FILTER_KEYS = ('tipos', 'tags', 'data_inicio', 'data_fim')
+
+# Limite de valores em filtros "in" / "array_contains_any" do Firestore
+FIRESTORE_MAX_DISJUNCTIONS = 30
+
+
+def _parse_datetime(value: Union[str, datetime]) -> datetime:
+    """Converte ISO 8601 ou datetime para datetime com fuso (UTC se ausente)."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+
+    return value
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Valida e normaliza filtros de metadados.
+
+    Args:
+        filters: Dicionário de filtros (chaves em FILTER_KEYS)
+
+    Returns:
+        Filtros normalizados ou None se não houver nenhum filtro efetivo
+
+    Raises:
+        ValueError: Se houver chave desconhecida ou data inválida
+    """
+    if not filters:
+        return None
+
+    desconhecidas = set(filters) - set(FILTER_KEYS)
+    if desconhecidas:
+        raise ValueError(f"Filtros desconhecidos: {sorted(desconhecidas)}")
+
+    normalized: Dict[str, Any] = {}
+
+    for key in ('tipos', 'tags'):
+        values = filters.get(key)
+        if isinstance(values, str):
+            values = [values]
+        if values:
+            normalized[key] = sorted(set(values))
+
+    for key in ('data_inicio', 'data_fim'):
+        if filters.get(key):
+            normalized[key] = _parse_datetime(filters[key])
+
+    return normalized or None
+
+
+def matches_filters(doc_data: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """
+    Verifica se um documento (ou payload do índice) atende aos filtros.
+
+    Args:
+        doc_data: Dados do documento
+        filters: Filtros normalizados
+
+    Returns:
+        True se o documento atende a todos os filtros
+    """
+    if not filters:
+        return True
+
+    if 'tipos' in filters and doc_data.get('tipo') not in filters['tipos']:
+        return False
+
+    if 'tags' in filters:
+        tags = (doc_data.get('metadata') or {}).get('tags') or []
+        if not set(tags) & set(filters['tags']):
+            return False
+
+    if 'data_inicio' in filters or 'data_fim' in filters:
+        created_at = doc_data.get('created_at')
+        if not created_at:
+            return False
+
+        created_at = _parse_datetime(created_at)
+
+        if 'data_inicio' in filters and created_at < filters['data_inicio']:
+            return False
+        if 'data_fim' in filters and created_at > filters['data_fim']:
+            return False
+
+    return True
+
+
+def apply_firestore_filters(query, filters: Optional[Dict[str, Any]]) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """
+    Aplica na consulta do Firestore os filtros suportados.
+
+    O Firestore aceita uma única disjunção por consulta: tipos usa "in" e
+    tags usa "array_contains_any" apenas quando não há filtro de tipos.
+    O restante deve ser verificado com matches_filters.
+
+    Args:
+        query: Consulta do Firestore (já filtrada por org_id)
+        filters: Filtros normalizados
+
+    Returns:
+        Tupla (consulta filtrada, filtros residuais ou None)
+    """
+    if not filters:
+        return query, None
+
+    residual: Dict[str, Any] = {}
+    disjuncao_usada = False
+
+    tipos = filters.get('tipos')
+    if tipos:
+        if len(tipos) == 1:
+            query = query.where('tipo', '==', tipos[0])
+        elif len(tipos) <= FIRESTORE_MAX_DISJUNCTIONS:
+            query = query.where('tipo', 'in', tipos)
+            disjuncao_usada = True
+        else:
+            residual['tipos'] = tipos
+
+    tags = filters.get('tags')
+    if tags:
+        if len(tags) == 1:
+            query = query.where('metadata.tags', 'array_contains', tags[0])
+        elif not disjuncao_usada and len(tags) <= FIRESTORE_MAX_DISJUNCTIONS:
+            query = query.where('metadata.tags', 'array_contains_any', tags)
+        else:
+            residual['tags'] = tags
+
+    if 'data_inicio' in filters:
+        query = query.where('created_at', '>=', filters['data_inicio'])
+    if 'data_fim' in filters:
+        query = query.where('created_at', '<=', filters['data_fim'])
+
+    return query, residual or None
+
+
+class FilterColumns:
+    """
+    Colunas de metadados de um índice em memória, para gerar máscaras.
+
+    Acompanha as posições do índice vetorial: tipo codificado como inteiro,
+    created_at em segundos desde a época e listas invertidas de tags.
+    """
+
+    def __init__(self):
+        self._tipo_codes: Dict[str, int] = {}
+        self._tipos = array('i')
+        self._created = array('d')
+        self._tags: Dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self._tipos)
+
+    def extend(self, payloads: List[Dict[str, Any]]) -> None:
+        """
+        Adiciona as colunas das posições ainda não processadas.
+
+        Args:
+            payloads: Payloads do índice (todas as posições)
+        """
+        for pos in range(len(self._tipos), len(payloads)):
+            payload = payloads[pos]
+
+            tipo = payload.get('tipo')
+            code = self._tipo_codes.setdefault(tipo, len(self._tipo_codes))
+            self._tipos.append(code)
+
+            created_at = payload.get('created_at')
+            self._created.append(_parse_datetime(created_at).timestamp() if created_at else float('nan'))
+
+            for tag in set((payload.get('metadata') or {}).get('tags') or []):
+                self._tags.setdefault(tag, array('i')).append(pos)
+
+    def mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Gera a máscara booleana das posições que atendem aos filtros.
+
+        Args:
+            filters: Filtros normalizados
+
+        Returns:
+            Máscara por posição ou None se não houver filtros
+        """
+        if not filters:
+            return None
+
+        size = len(self._tipos)
+        mask = np.ones(size, dtype=bool)
+
+        if 'tipos' in filters:
+            codes = [self._tipo_codes[tipo] for tipo in filters['tipos'] if tipo in self._tipo_codes]
+            mask &= np.isin(np.frombuffer(self._tipos, dtype=np.int32), codes)
+
+        if 'tags' in filters:
+            tag_mask = np.zeros(size, dtype=bool)
+            for tag in filters['tags']:
+                positions = self._tags.get(tag)
+                if positions:
+                    tag_mask[np.frombuffer(positions, dtype=np.int32)] = True
+            mask &= tag_mask
+
+        if 'data_inicio' in filters or 'data_fim' in filters:
+            created = np.frombuffer(self._created, dtype=np.float64)
+            # NaN (sem data) nunca atende a um filtro de período
+            if 'data_inicio' in filters:
+                mask &= created >= filters['data_inicio'].timestamp()
+            if 'data_fim' in filters:
+                mask &= created <= filters['data_fim'].timestamp()
+
+        return mask
@@ -0,0 +1,205 @@
+"""
+Cache de resultados da extração estruturada via LLM (Groq).
+
+Reentregas do Pub/Sub, ofícios duplicados e simulações que repetem o mesmo
+texto produzem a mesma chamada ao LLM. O resultado validado (OficioData) é
+reaproveitado quando texto, versão do prompt, prompt de sistema, schema,
+modelo e compactação do texto (versão e orçamento de tokens) são idênticos.
+
+As entradas ficam na coleção llm_extraction_cache do Firestore, isoladas
+por organização e com expiração (expires_at, política de TTL).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+from .text_compaction import COMPACTION_VERSION, LLM_INPUT_TOKEN_BUDGET
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando a chamada ao LLM mudar (temperatura, parsing) invalida o cache
+LLM_CACHE_VERSION = os.getenv('LLM_CACHE_VERSION', 'v1')
+LLM_CACHE_TTL_DAYS = int(os.getenv('LLM_CACHE_TTL_DAYS', '30'))
+LLM_CACHE_COLLECTION = 'llm_extraction_cache'
+
+
+def _sha256(valor: str) -> str:
+    return hashlib.sha256(valor.encode('utf-8')).hexdigest()
+
+
+def schema_hash(pydantic_schema: Type[BaseModel]) -> str:
+    """
+    Hash do JSON Schema do modelo Pydantic.
+
+    Args:
+        pydantic_schema: Classe Pydantic do resultado
+
+    Returns:
+        sha256 hexadecimal do schema serializado de forma canônica
+    """
+    return _sha256(json.dumps(pydantic_schema.model_json_schema(), sort_keys=True, ensure_ascii=False))
+
+
+def extraction_cache_key(
+    org_id: str,
+    text: str,
+    prompt_version: str,
+    pydantic_schema: Type[BaseModel],
+    model: str,
+    system_prompt: str = '',
+    token_budget: Optional[int] = None
+) -> str:
+    """
+    Gera a chave determinística de uma extração.
+
+    O prompt de sistema entra na chave para que uma edição do prompt sem
+    troca de versão não reaproveite resultados antigos. O texto enviado ao
+    LLM é compactado (utils/text_compaction.py), então a versão da
+    compactação e o orçamento de tokens também entram.
+
+    Args:
+        org_id: ID da organização
+        text: Texto enviado ao LLM
+        prompt_version: Versão do prompt (LLM_PROMPT_VERSION ou override)
+        pydantic_schema: Classe Pydantic do resultado
+        model: Nome do modelo
+        system_prompt: Prompt de sistema usado na chamada
+        token_budget: Orçamento de tokens da compactação (padrão: LLM_INPUT_TOKEN_BUDGET)
+
+    Returns:
+        sha256 hexadecimal (id do documento de cache)
+    """
+    componentes = {
+        'versao_cache': LLM_CACHE_VERSION,
+        'org_id': org_id,
+        'texto': _sha256(text),
+        'prompt_version': prompt_version,
+        'system_prompt': _sha256(system_prompt),
+        'schema': schema_hash(pydantic_schema),
+        'modelo': model,
+        'compactacao': COMPACTION_VERSION,
+        'orcamento_tokens': token_budget or LLM_INPUT_TOKEN_BUDGET
+    }
+
+    return _sha256(json.dumps(componentes, sort_keys=True))
+
+
+class LLMExtractionCache:
+    """Cache de extrações estruturadas no Firestore, com métricas."""
+
+    def __init__(self, db: Any, ttl_days: int = LLM_CACHE_TTL_DAYS, collection: str = LLM_CACHE_COLLECTION):
+        """
+        Inicializa o cache.
+
+        Args:
+            db: Cliente Firestore (firestore.Client)
+            ttl_days: Validade das entradas em dias
+            collection: Coleção das entradas
+        """
+        self.db = db
+        self.ttl_days = ttl_days
+        self.collection = collection
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _contar(self, campo: str) -> None:
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def get(self, org_id: str, key: str, pydantic_schema: Type[BaseModel]) -> Optional[BaseModel]:
+        """
+        Busca uma extração.
+
+        Falhas de leitura e entradas expiradas ou inválidas contam como miss
+        (o LLM é chamado de novo).
+
+        Args:
+            org_id: ID da organização
+            key: Chave gerada por extraction_cache_key
+            pydantic_schema: Classe Pydantic do resultado
+
+        Returns:
+            Instância validada do modelo ou None
+        """
+        try:
+            doc = self.db.collection(self.collection).document(key).get()
+            entrada = doc.to_dict() if doc.exists else None
+        except Exception as e:
+            logger.warning(f"Falha ao ler cache de extração LLM ({key[:12]}): {e}")
+            self._contar('errors')
+            self._contar('misses')
+            return None
+
+        if not entrada or entrada.get('org_id') != org_id:
+            self._contar('misses')
+            return None
+
+        expires_at = entrada.get('expires_at')
+        if expires_at and expires_at.replace(tzinfo=None) <= datetime.utcnow():
+            self._contar('misses')
+            return None
+
+        try:
+            # JSON: o modo estrito dos schemas aceita enums/datas serializados apenas em JSON
+            resultado = pydantic_schema.model_validate_json(entrada['resultado'])
+        except Exception as e:
+            logger.warning(f"Entrada de cache de extração LLM inválida ({key[:12]}): {e}")
+            self._contar('errors')
+            self._contar('misses')
+            return None
+
+        self._contar('hits')
+
+        return resultado
+
+    def put(self, org_id: str, key: str, resultado: BaseModel, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Armazena uma extração validada.
+
+        Args:
+            org_id: ID da organização
+            key: Chave gerada por extraction_cache_key
+            resultado: Instância validada do modelo
+            metadata: Campos descritivos (prompt_version, modelo) para auditoria
+        """
+        agora = datetime.utcnow()
+
+        entrada = {
+            **(metadata or {}),
+            'org_id': org_id,
+            'versao_cache': LLM_CACHE_VERSION,
+            'resultado': resultado.model_dump_json(),
+            'created_at': agora,
+            'expires_at': agora + timedelta(days=self.ttl_days)
+        }
+
+        try:
+            self.db.collection(self.collection).document(key).set(entrada)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar cache de extração LLM ({key[:12]}): {e}")
+            self._contar('errors')
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Contadores do cache.
+
+        Returns:
+            Dicionário com hits, misses, errors e hit_rate
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
@@ -0,0 +1,180 @@
+"""
+Cache de resultados de extração de texto (camada de texto do PDF / OCR).
+
+Reprocessamentos do mesmo anexo (reentregas do Pub/Sub, simulações do W6,
+threads reencaminhadas) reaproveitam o texto já extraído em vez de chamar
+a Vision API de novo.
+
+A chave é o hash do conteúdo do objeto: md5 (ou crc32c + tamanho) lido dos
+metadados do GCS, sem download; sha256 do conteúdo como alternativa. Os
+resultados ficam no bucket restrito de raw_text (RawTextStorageClient),
+isolados por organização.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando a extração mudar (thresholds, motor de OCR) invalida o cache
+OCR_CACHE_VERSION = os.getenv('OCR_CACHE_VERSION', 'v1')
+OCR_CACHE_PREFIX = 'ocr_cache'
+
+
+def _b64_para_hex(valor: str) -> str:
+    """Converte hash base64 (formato dos metadados do GCS) para hexadecimal."""
+    return binascii.hexlify(base64.b64decode(valor)).decode('ascii')
+
+
+def cache_key_from_blob(blob: Any) -> Optional[str]:
+    """
+    Gera a chave de cache a partir dos metadados do objeto no GCS.
+
+    Args:
+        blob: Blob com metadados carregados (bucket.get_blob)
+
+    Returns:
+        Chave ("md5-<hex>" ou "crc32c-<hex>-<tamanho>") ou None se não houver hash
+    """
+    if blob is None:
+        return None
+
+    if getattr(blob, 'md5_hash', None):
+        return f"md5-{_b64_para_hex(blob.md5_hash)}"
+
+    # Objetos compostos não têm md5; crc32c (32 bits) é combinado ao tamanho
+    if getattr(blob, 'crc32c', None):
+        return f"crc32c-{_b64_para_hex(blob.crc32c)}-{blob.size or 0}"
+
+    return None
+
+
+def cache_key_from_content(data: bytes) -> str:
+    """
+    Gera a chave de cache a partir do conteúdo do arquivo.
+
+    Args:
+        data: Conteúdo do arquivo
+
+    Returns:
+        Chave "sha256-<hex>"
+    """
+    return f"sha256-{hashlib.sha256(data).hexdigest()}"
+
+
+class OCRCache:
+    """Cache de extração de texto no bucket restrito de raw_text, com métricas."""
+
+    def __init__(self, raw_text_storage: Any, version: str = OCR_CACHE_VERSION):
+        """
+        Inicializa o cache.
+
+        Args:
+            raw_text_storage: RawTextStorageClient (bucket restrito)
+            version: Versão da extração (parte do caminho das entradas)
+        """
+        self.raw_text_storage = raw_text_storage
+        self.version = version
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _blob_path(self, org_id: str, key: str) -> str:
+        return f"{OCR_CACHE_PREFIX}/{self.version}/{org_id}/{key}.json"
+
+    def _contar(self, campo: str) -> None:
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def get(self, org_id: str, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Busca um resultado de extração.
+
+        Falhas de leitura contam como miss (o documento é reprocessado).
+
+        Args:
+            org_id: ID da organização
+            key: Chave de cache
+
+        Returns:
+            Resultado armazenado (texto e extracao_texto) ou None
+        """
+        if not key:
+            self._contar('misses')
+            return None
+
+        from google.api_core.exceptions import NotFound
+
+        # Download direto: um round-trip no hit, NotFound é miss
+        try:
+            blob = self.raw_text_storage.bucket.blob(self._blob_path(org_id, key))
+            entrada = json.loads(blob.download_as_bytes().decode('utf-8'))
+        except NotFound:
+            self._contar('misses')
+            return None
+        except Exception as e:
+            logger.warning(f"Falha ao ler cache de OCR ({key}): {e}")
+            self._contar('errors')
+            self._contar('misses')
+            return None
+
+        self._contar('hits')
+
+        return {'texto': entrada['texto'], 'extracao_texto': entrada['extracao_texto']}
+
+    def put(self, org_id: str, key: Optional[str], resultado: Dict[str, Any], source: str = '') -> None:
+        """
+        Armazena um resultado de extração.
+
+        Args:
+            org_id: ID da organização
+            key: Chave de cache
+            resultado: Dicionário com texto e extracao_texto
+            source: URI do arquivo de origem (auditoria)
+        """
+        if not key:
+            return
+
+        entrada = {
+            'versao': self.version,
+            'texto': resultado['texto'],
+            'extracao_texto': resultado['extracao_texto'],
+            'source': source,
+            'criado_em': datetime.utcnow().isoformat()
+        }
+
+        try:
+            blob = self.raw_text_storage.bucket.blob(self._blob_path(org_id, key))
+            blob.metadata = {
+                'org_id': org_id,
+                'lgpd_category': 'personal_data',
+                'access_level': 'restricted'
+            }
+            blob.upload_from_string(json.dumps(entrada, ensure_ascii=False), content_type='application/json')
+        except Exception as e:
+            logger.warning(f"Falha ao gravar cache de OCR ({key}): {e}")
+            self._contar('errors')
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Contadores do cache.
+
+        Returns:
+            Dicionário com hits, misses, errors e hit_rate
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
@@ -0,0 +1,291 @@
+"""
+Motor de OCR paralelo por página (Cloud Vision) para PDFs e TIFFs multipágina.
+
+Dois caminhos:
+  - Páginas específicas (ex: páginas digitalizadas de um PDF nativo): lotes
+    de até 5 páginas via batch_annotate_files, executados em paralelo.
+  - Arquivo inteiro: async_batch_annotate_files com saída JSON no GCS
+    (fragmentos de N páginas lidos em paralelo).
+
+Nos dois casos o texto de cada página é entregue em ordem assim que as
+páginas anteriores estão prontas, e todo o documento respeita um prazo
+total (orçamento de tempo de parede).
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MIME_PDF = 'application/pdf'
+MIME_TIFF = 'image/tiff'
+
+# Limite da Vision API para batch_annotate_files síncrono
+VISION_MAX_PAGES_PER_REQUEST = 5
+
+_SHARD_RE = re.compile(r'output-(\d+)-to-(\d+)\.json$')
+
+
+class OCRBudgetExceeded(TimeoutError):
+    """O OCR do documento excedeu o orçamento de tempo."""
+
+
+def mime_type_for_path(file_path: str) -> Optional[str]:
+    """
+    Tipo MIME suportado pela API de arquivos da Vision (PDF/TIFF).
+
+    Args:
+        file_path: Caminho do arquivo
+
+    Returns:
+        MIME type ou None se o arquivo deve ser tratado como imagem simples
+    """
+    path = file_path.lower()
+
+    if path.endswith('.pdf'):
+        return MIME_PDF
+    if path.endswith(('.tif', '.tiff')):
+        return MIME_TIFF
+
+    return None
+
+
+class VisionOCREngine:
+    """
+    OCR paralelo por página com limite de concorrência e prazo por documento.
+
+    Um semáforo limita as chamadas simultâneas à Vision API no processo
+    inteiro (todos os documentos); max_concurrency limita cada documento.
+    """
+
+    def __init__(
+        self,
+        vision_client: Any,
+        storage_client: Any,
+        output_bucket: str,
+        max_concurrency: Optional[int] = None,
+        global_max_concurrency: Optional[int] = None,
+        budget_seconds: Optional[float] = None,
+        async_batch_size: Optional[int] = None
+    ):
+        """
+        Inicializa o motor.
+
+        Args:
+            vision_client: vision.ImageAnnotatorClient
+            storage_client: storage.Client (saída do OCR assíncrono)
+            output_bucket: Bucket (restrito) para a saída JSON do OCR assíncrono
+            max_concurrency: Chamadas simultâneas por documento (padrão: OCR_MAX_CONCURRENCY)
+            global_max_concurrency: Chamadas simultâneas no processo (padrão: OCR_GLOBAL_MAX_CONCURRENCY)
+            budget_seconds: Prazo total por documento (padrão: OCR_DOCUMENT_BUDGET_SECONDS)
+            async_batch_size: Páginas por fragmento de saída assíncrona (padrão: OCR_ASYNC_BATCH_SIZE)
+        """
+        self.vision_client = vision_client
+        self.storage_client = storage_client
+        self.output_bucket = output_bucket
+        self.max_concurrency = max_concurrency or int(os.getenv('OCR_MAX_CONCURRENCY', '4'))
+        self.budget_seconds = budget_seconds or float(os.getenv('OCR_DOCUMENT_BUDGET_SECONDS', '240'))
+        self.async_batch_size = async_batch_size or int(os.getenv('OCR_ASYNC_BATCH_SIZE', '20'))
+        self._semaphore = threading.BoundedSemaphore(
+            global_max_concurrency or int(os.getenv('OCR_GLOBAL_MAX_CONCURRENCY', '16'))
+        )
+
+    def deadline(self) -> float:
+        """Prazo (time.monotonic) de um documento que começa agora."""
+        return time.monotonic() + self.budget_seconds
+
+    @staticmethod
+    def _restante(deadline: float, etapa: str) -> float:
+        restante = deadline - time.monotonic()
+        if restante <= 0:
+            raise OCRBudgetExceeded(f"Orçamento de OCR esgotado ({etapa})")
+        return restante
+
+    def _feature(self):
+        from google.cloud import vision
+        return vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+
+    @staticmethod
+    def _pagina(numero: int, annotation: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Resultado de uma página a partir da fullTextAnnotation (dict)."""
+        annotation = annotation or {}
+        pages = annotation.get('pages') or []
+
+        return {
+            'pagina': numero,
+            'texto': annotation.get('text', ''),
+            'confianca': round(float(pages[0].get('confidence', 0.0)), 4) if pages else None
+        }
+
+    def _annotate_pages(self, gcs_uri: str, mime_type: str, lote: List[int], deadline: float) -> List[Dict[str, Any]]:
+        """OCR síncrono de até 5 páginas (batch_annotate_files)."""
+        from google.cloud import vision
+
+        request = vision.AnnotateFileRequest(
+            input_config=vision.InputConfig(gcs_source=vision.GcsSource(uri=gcs_uri), mime_type=mime_type),
+            features=[self._feature()],
+            pages=lote
+        )
+
+        with self._semaphore:
+            response = self.vision_client.batch_annotate_files(
+                requests=[request],
+                timeout=self._restante(deadline, f"páginas {lote}")
+            )
+
+        resultados = []
+
+        for numero, page_response in zip(lote, response.responses[0].responses):
+            if page_response.error.message:
+                raise Exception(f"Erro no OCR da página {numero}: {page_response.error.message}")
+
+            annotation = page_response.full_text_annotation
+            resultados.append(self._pagina(numero, {
+                'text': annotation.text,
+                'pages': [{'confidence': page.confidence} for page in annotation.pages]
+            } if annotation else None))
+
+        return resultados
+
+    def ocr_pages(
+        self,
+        gcs_uri: str,
+        mime_type: str,
+        pages: List[int],
+        deadline: Optional[float] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        OCR de páginas específicas, em lotes paralelos, entregues em ordem.
+
+        Args:
+            gcs_uri: URI do arquivo (gs://bucket/path)
+            mime_type: MIME_PDF ou MIME_TIFF
+            pages: Números das páginas (1-based)
+            deadline: Prazo do documento (padrão: agora + budget_seconds)
+
+        Yields:
+            {pagina, texto, confianca} em ordem crescente de página
+
+        Raises:
+            OCRBudgetExceeded: Se o prazo do documento terminar
+        """
+        deadline = deadline or self.deadline()
+        pages = sorted(pages)
+        lotes = [pages[i:i + VISION_MAX_PAGES_PER_REQUEST] for i in range(0, len(pages), VISION_MAX_PAGES_PER_REQUEST)]
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(lotes))))
+        try:
+            futures = [executor.submit(self._annotate_pages, gcs_uri, mime_type, lote, deadline) for lote in lotes]
+
+            for future in futures:
+                try:
+                    yield from future.result(timeout=self._restante(deadline, gcs_uri))
+                except FuturesTimeoutError:
+                    raise OCRBudgetExceeded(f"Orçamento de OCR esgotado ({gcs_uri})")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def ocr_file(
+        self,
+        gcs_uri: str,
+        mime_type: str,
+        deadline: Optional[float] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        OCR do arquivo inteiro via async_batch_annotate_files.
+
+        A saída JSON é gravada em fragmentos no bucket restrito, lida em
+        paralelo e removida ao final. Se o prazo terminar antes da operação,
+        ela é cancelada antes da limpeza; fragmentos gravados depois disso
+        são removidos pela regra de ciclo de vida do prefixo vision_ocr/
+        (ocr_output_lifecycle.json).
+
+        Args:
+            gcs_uri: URI do arquivo (gs://bucket/path)
+            mime_type: MIME_PDF ou MIME_TIFF
+            deadline: Prazo do documento (padrão: agora + budget_seconds)
+
+        Yields:
+            {pagina, texto, confianca} em ordem crescente de página
+
+        Raises:
+            OCRBudgetExceeded: Se o prazo do documento terminar
+        """
+        from google.cloud import vision
+
+        deadline = deadline or self.deadline()
+        prefix = f"vision_ocr/{uuid.uuid4().hex}/"
+
+        request = vision.AsyncAnnotateFileRequest(
+            input_config=vision.InputConfig(gcs_source=vision.GcsSource(uri=gcs_uri), mime_type=mime_type),
+            features=[self._feature()],
+            output_config=vision.OutputConfig(
+                gcs_destination=vision.GcsDestination(uri=f"gs://{self.output_bucket}/{prefix}"),
+                batch_size=self.async_batch_size
+            )
+        )
+
+        with self._semaphore:
+            operation = self.vision_client.async_batch_annotate_files(requests=[request])
+
+        concluida = False
+
+        try:
+            try:
+                operation.result(timeout=self._restante(deadline, gcs_uri))
+                concluida = True
+            except FuturesTimeoutError:
+                raise OCRBudgetExceeded(f"Orçamento de OCR esgotado aguardando {gcs_uri}")
+
+            bucket = self.storage_client.bucket(self.output_bucket)
+            shards = sorted(
+                (blob for blob in bucket.list_blobs(prefix=prefix) if _SHARD_RE.search(blob.name)),
+                key=lambda blob: int(_SHARD_RE.search(blob.name).group(1))
+            )
+
+            executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(shards))))
+            try:
+                futures = [executor.submit(blob.download_as_bytes) for blob in shards]
+
+                for future in futures:
+                    try:
+                        shard = json.loads(future.result(timeout=self._restante(deadline, gcs_uri)))
+                    except FuturesTimeoutError:
+                        raise OCRBudgetExceeded(f"Orçamento de OCR esgotado lendo a saída de {gcs_uri}")
+
+                    for response in shard.get('responses', []):
+                        if response.get('error', {}).get('message'):
+                            raise Exception(f"Erro no OCR de {gcs_uri}: {response['error']['message']}")
+
+                        numero = response.get('context', {}).get('pageNumber', 1)
+                        yield self._pagina(numero, response.get('fullTextAnnotation'))
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+        finally:
+            if not concluida:
+                self._cancelar(operation, gcs_uri)
+            self._remover_saida(prefix)
+
+    @staticmethod
+    def _cancelar(operation: Any, gcs_uri: str) -> None:
+        """Cancela a operação assíncrona ainda em andamento (melhor esforço)."""
+        try:
+            if not operation.done():
+                operation.cancel()
+        except Exception as e:
+            logger.warning(f"Falha ao cancelar OCR assíncrono de {gcs_uri}: {e}")
+
+    def _remover_saida(self, prefix: str) -> None:
+        """Remove a saída JSON do OCR assíncrono (contém dados pessoais)."""
+        try:
+            for blob in self.storage_client.bucket(self.output_bucket).list_blobs(prefix=prefix):
+                blob.delete()
+        except Exception as e:
+            logger.warning(f"Falha ao remover saída do OCR em {prefix}: {e}")
@@ -0,0 +1,145 @@
+"""
+Extração da camada de texto de PDFs nativos (born-digital).
+
+A maioria dos ofícios chega como PDF gerado digitalmente, com texto já
+embutido. Cada página recebe um score de densidade/qualidade; apenas as
+páginas sem camada de texto (digitalizadas) ou com texto degradado seguem
+para OCR.
+"""
+import io
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Uma página só usa a camada de texto com pelo menos este número de caracteres visíveis
+PDF_TEXT_MIN_CHARS = int(os.getenv('PDF_TEXT_MIN_CHARS', '80'))
+# Score mínimo de qualidade (0-1) da camada de texto
+PDF_TEXT_MIN_SCORE = float(os.getenv('PDF_TEXT_MIN_SCORE', '0.75'))
+
+METODO_TEXT_LAYER = 'text_layer'
+METODO_OCR = 'ocr'
+
+# Glifos sem mapeamento Unicode: "(cid:123)" (pdfminer) ou caractere de substituição
+_CID_RE = re.compile(r'\(cid:\d+\)')
+_PALAVRA_RE = re.compile(r'[^\W\d_]{2,}', re.UNICODE)
+_PONTUACAO_COMUM = set('.,;:!?()[]{}"\'/-–—§ºª°%$@&*+=<>_#|\\')
+
+
+def is_pdf(data: bytes) -> bool:
+    """
+    Verifica a assinatura %PDF no início do arquivo.
+
+    Args:
+        data: Conteúdo do arquivo
+
+    Returns:
+        True se for PDF
+    """
+    return data[:1024].lstrip().startswith(b'%PDF')
+
+
+def text_density_score(texto: str) -> float:
+    """
+    Calcula o score de qualidade da camada de texto de uma página.
+
+    Combina a fração de caracteres legíveis (letras, dígitos, pontuação
+    comum) com a fração do texto coberta por palavras; glifos sem
+    mapeamento ("(cid:N)", U+FFFD) contam como ilegíveis.
+
+    Args:
+        texto: Texto extraído da página
+
+    Returns:
+        Score entre 0 e 1
+    """
+    texto_sem_cid = _CID_RE.sub('�', texto)
+    visiveis = [char for char in texto_sem_cid if not char.isspace()]
+
+    if not visiveis:
+        return 0.0
+
+    legiveis = sum(
+        1 for char in visiveis
+        if char != '�' and (char.isalnum() or char in _PONTUACAO_COMUM)
+    )
+    em_palavras = sum(len(palavra) for palavra in _PALAVRA_RE.findall(texto_sem_cid))
+
+    return round(0.6 * legiveis / len(visiveis) + 0.4 * min(1.0, em_palavras / len(visiveis) / 0.6), 4)
+
+
+def extrair_paginas_pdf(data: bytes) -> List[str]:
+    """
+    Extrai o texto embutido de cada página do PDF (pypdf).
+
+    Páginas cuja extração falha retornam texto vazio (seguem para OCR).
+
+    Args:
+        data: Conteúdo do PDF
+
+    Returns:
+        Texto de cada página, na ordem (lista vazia se o PDF não puder ser lido)
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        logger.warning("pypdf não instalado; camada de texto do PDF ignorada")
+        return []
+
+    try:
+        reader = PdfReader(io.BytesIO(data))
+        if reader.is_encrypted:
+            reader.decrypt('')
+        paginas = reader.pages
+    except Exception as e:
+        logger.warning(f"PDF não pôde ser lido pelo pypdf: {e}")
+        return []
+
+    textos = []
+
+    for numero, pagina in enumerate(paginas, start=1):
+        try:
+            textos.append(pagina.extract_text() or '')
+        except Exception as e:
+            logger.warning(f"Falha ao extrair texto da página {numero}: {e}")
+            textos.append('')
+
+    return textos
+
+
+def classificar_paginas(
+    textos: List[str],
+    min_chars: Optional[int] = None,
+    min_score: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """
+    Classifica cada página pelo caminho de extração.
+
+    Args:
+        textos: Texto da camada de cada página
+        min_chars: Mínimo de caracteres visíveis
+        min_score: Score mínimo
+
+    Returns:
+        Lista de {pagina (1-based), metodo, score, caracteres}
+    """
+    paginas = []
+
+    min_chars = PDF_TEXT_MIN_CHARS if min_chars is None else min_chars
+    min_score = PDF_TEXT_MIN_SCORE if min_score is None else min_score
+
+    for numero, texto in enumerate(textos, start=1):
+        caracteres = sum(1 for char in texto if not char.isspace())
+        score = text_density_score(texto)
+        usa_texto = caracteres >= min_chars and score >= min_score
+
+        paginas.append({
+            'pagina': numero,
+            'metodo': METODO_TEXT_LAYER if usa_texto else METODO_OCR,
+            'score': score,
+            'caracteres': caracteres
+        })
+
+    return paginas
@@ -0,0 +1,113 @@
+"""
+Cache TTL + LRU de resultados de consultas RAG.
+Cada entrada guarda a geração (carimbo de versão da base de conhecimento)
+em que foi calculada; entradas de gerações anteriores são descartadas.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class QueryResultCache:
+    """Cache LRU com expiração por tempo e validação por geração."""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600.0):
+        """
+        Inicializa o cache.
+
+        Args:
+            max_entries: Número máximo de entradas (0 desabilita o cache)
+            ttl_seconds: Tempo de vida de cada entrada
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[Hashable, Tuple[int, float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, generation: int) -> Optional[Any]:
+        """
+        Busca uma entrada válida para a geração atual.
+
+        Args:
+            key: Chave da consulta
+            generation: Geração atual da base da organização
+
+        Returns:
+            Valor armazenado ou None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            entry_generation, stored_at, value = entry
+
+            if entry_generation != generation:
+                del self._entries[key]
+                self.stale += 1
+                self.misses += 1
+                return None
+
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def put(self, key: Hashable, generation: int, value: Any) -> None:
+        """
+        Armazena o valor calculado na geração informada.
+
+        Args:
+            key: Chave da consulta
+            generation: Geração da base usada no cálculo
+            value: Resultado
+        """
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (generation, time.monotonic(), value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove todas as entradas."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Contadores do cache.
+
+        Returns:
+            Dicionário com hits, misses, hit_rate, expired, stale, evictions e entries
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'expired': self.expired,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'entries': len(self._entries)
+            }
@@ -3,13 +3,43 @@ Cliente RAG (Retrieval Augmented Generation) para busca de conhecimento contextu
 Implementa Vector Database com isolamento Multi-Tenant.
 """
 import json
+import logging
 import os
-from typing import Any, Dict, List, Optional, Tuple
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import numpy as np
 from google.cloud import aiplatform, firestore
 from openai import OpenAI
 
+from .bm25_index import BM25Index, load_bm25_index
+from .chunking import DEFAULT_CHUNK_MAX_TOKENS, DEFAULT_CHUNK_OVERLAP_TOKENS, chunk_text
+from .embedding_cache import EmbeddingCache, embedding_cache_from_env, normalizar_texto
+from .embedding_codec import FORMAT_LIST, STORAGE_FORMATS, decode_embedding, encode_embedding
+from .index_store import index_store_from_uri
+from .knowledge_filters import FilterColumns, normalize_filters
+from .query_cache import QueryResultCache
+from .vector_index import BACKEND_EXACT, INDEX_BACKENDS, ExactVectorIndex, build_index, load_index
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros aceitos em settings.rag_index (além de backend)
+INDEX_INT_PARAMS = ('nlist', 'nprobe', 'kmeans_iter')
+# Parâmetros gravados na construção do índice (mudança exige reconstrução; nprobe vale na consulta)
+INDEX_BUILD_PARAMS = ('nlist', 'kmeans_iter')
+
+# Limites por requisição de embeddings: (máximo de textos, máximo de caracteres)
+EMBEDDING_BATCH_LIMITS = {
+    'vertex': (250, 60000),
+    'openai': (2048, 800000),
+}
+
+# Firestore aceita até 500 operações por escrita em lote (uma é o carimbo de versão)
+FIRESTORE_MAX_BATCH_WRITES = 500
+
 
 class VectorDBClient:
     """
@@ -20,7 +50,13 @@ class VectorDBClient:
     def __init__(
         self, 
         project_id: Optional[str] = None,
-        embedding_model: str = "text-embedding-004"
+        embedding_model: str = "text-embedding-004",
+        index_backend: Optional[str] = None,
+        index_params: Optional[Dict[str, Any]] = None,
+        index_store: Optional[Any] = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        db: Optional[Any] = None,
+        embedding_fn: Optional[Callable[[List[str]], List[List[float]]]] = None
     ):
         """
         Inicializa o cliente de Vector Database.
@@ -28,17 +64,71 @@ class VectorDBClient:
         Args:
             project_id: ID do projeto GCP
             embedding_model: Modelo de embedding (Vertex AI ou OpenAI)
+            index_backend: Backend de busca ('exact' ou 'ivf'). Padrão: RAG_INDEX_BACKEND
+            index_params: Parâmetros do backend (ex: nlist, nprobe)
+            index_store: Store para persistir índices (padrão: RAG_INDEX_STORE)
+            embedding_cache: Cache de embeddings (padrão: EMBEDDING_CACHE_*)
+            db: Cliente Firestore (padrão: firestore.Client do projeto)
+            embedding_fn: Função de embeddings em lote que substitui Vertex AI/OpenAI
+                (ex: embedder determinístico em benchmarks offline)
         """
         self.project_id = project_id or os.getenv('GCP_PROJECT_ID')
         self.embedding_model = embedding_model
-        self.db = firestore.Client(project=self.project_id)
+        self.db = db if db is not None else firestore.Client(project=self.project_id)
         self.knowledge_collection = "knowledge_base"
+        self.versions_collection = "knowledge_base_versions"
+        
+        # Índices vetoriais em memória por org_id (reaproveitados em instâncias quentes)
+        self._org_indexes: Dict[str, ExactVectorIndex] = {}
+        # Índices lexicais BM25 alinhados às posições dos índices vetoriais
+        self._org_lexical: Dict[str, BM25Index] = {}
+        # Colunas de metadados para filtros, por org_id: (índice de origem, colunas)
+        self._org_filter_columns: Dict[str, Tuple[ExactVectorIndex, FilterColumns]] = {}
+        
+        # Backend de busca (padrão global, sobrescrito por settings.rag_index da organização)
+        self.index_backend = index_backend or os.getenv('RAG_INDEX_BACKEND', BACKEND_EXACT)
+        self.index_params = index_params if index_params is not None else {
+            'nlist': int(os.getenv('RAG_IVF_NLIST', '64')),
+            'nprobe': int(os.getenv('RAG_IVF_NPROBE', '8'))
+        }
+        # Abaixo deste tamanho a busca exata é mais rápida que a aproximada
+        self.ann_min_docs = int(os.getenv('RAG_ANN_MIN_DOCS', '5000'))
+        # settings.rag_index por org_id: (expira em, backend, parâmetros); relido após o TTL
+        self.index_config_ttl = float(os.getenv('RAG_INDEX_CONFIG_TTL_SECONDS', '300'))
+        self._org_index_config: Dict[str, Tuple[float, str, Dict[str, Any]]] = {}
+        self.index_store = index_store if index_store is not None else index_store_from_uri(
+            os.getenv('RAG_INDEX_STORE')
+        )
+        
+        # Busca híbrida: BM25 + vetorial combinados por Reciprocal Rank Fusion
+        self.hybrid_search = os.getenv('RAG_HYBRID_SEARCH', 'true').lower() == 'true'
+        self.rrf_k = int(os.getenv('RAG_RRF_K', '60'))
+        # Hits apenas lexicais precisam desta fração de min_similarity (BM25 em palavras comuns não basta)
+        self.lexical_min_similarity_ratio = float(os.getenv('RAG_LEXICAL_MIN_SIMILARITY_RATIO', '0.5'))
+        
+        # Formato dos embeddings gravados ('list', 'float16' ou 'int8'); a leitura aceita todos
+        self.embedding_storage_format = os.getenv('EMBEDDING_STORAGE_FORMAT', FORMAT_LIST)
+        if self.embedding_storage_format not in STORAGE_FORMATS:
+            raise ValueError(f"EMBEDDING_STORAGE_FORMAT inválido: {self.embedding_storage_format}")
+        
+        # Segmentação de documentos longos em chunks (tamanhos em tokens estimados)
+        self.chunk_max_tokens = int(os.getenv('RAG_CHUNK_MAX_TOKENS', str(DEFAULT_CHUNK_MAX_TOKENS)))
+        self.chunk_overlap_tokens = int(os.getenv('RAG_CHUNK_OVERLAP_TOKENS', str(DEFAULT_CHUNK_OVERLAP_TOKENS)))
+        # Hits buscados por resultado pedido (chunks do mesmo documento são agrupados)
+        self.chunk_oversample = int(os.getenv('RAG_CHUNK_OVERSAMPLE', '4'))
+        self.max_chunks_per_result = int(os.getenv('RAG_MAX_CHUNKS_PER_RESULT', '2'))
         
         # Configura cliente de embeddings
         # Prioriza Vertex AI, fallback para OpenAI
-        self.use_vertex_ai = os.getenv('USE_VERTEX_AI_EMBEDDINGS', 'true').lower() == 'true'
+        self.embedding_fn = embedding_fn
+        self.use_vertex_ai = (
+            embedding_fn is None and os.getenv('USE_VERTEX_AI_EMBEDDINGS', 'true').lower() == 'true'
+        )
+        self._vertex_model = None
         
-        if self.use_vertex_ai:
+        if embedding_fn is not None:
+            pass
+        elif self.use_vertex_ai:
             aiplatform.init(project=self.project_id, location="us-central1")
         else:
             openai_key = os.getenv('OPENAI_API_KEY')
@@ -46,10 +136,19 @@ class VectorDBClient:
                 self.openai_client = OpenAI(api_key=openai_key)
             else:
                 raise ValueError("OPENAI_API_KEY não fornecida")
+        
+        # Cache endereçado por (modelo efetivo, hash do texto)
+        self.embedding_cache = embedding_cache if embedding_cache is not None else embedding_cache_from_env(self.db)
+        if embedding_fn is not None:
+            self.embedding_cache_model = f"custom:{getattr(embedding_fn, '__name__', 'embedding_fn')}"
+        elif self.use_vertex_ai:
+            self.embedding_cache_model = f"vertex:{self.embedding_model}"
+        else:
+            self.embedding_cache_model = "openai:text-embedding-3-small"
     
     def generate_embedding(self, text: str) -> List[float]:
         """
-        Gera embedding vetorial de um texto.
+        Gera embedding vetorial de um texto (consulta o cache antes do provedor).
         
         Args:
             text: Texto a ser vetorizado
@@ -57,17 +156,104 @@ class VectorDBClient:
         Returns:
             Lista de floats representando o vetor
         """
+        cached = self.embedding_cache.get(text, self.embedding_cache_model)
+        
+        if cached is not None:
+            return cached
+        
+        if self.embedding_fn is not None:
+            embedding = list(self.embedding_fn([text])[0])
+        elif self.use_vertex_ai:
+            embedding = self._generate_embedding_vertex(text)
+        else:
+            embedding = self._generate_embedding_openai(text)
+        
+        self.embedding_cache.put(text, embedding, self.embedding_cache_model)
+        
+        return embedding
+    
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Gera embeddings de vários textos em lotes do tamanho aceito pelo provedor.
+        
+        Apenas os textos ausentes do cache são enviados ao provedor.
+        
+        Args:
+            texts: Textos a serem vetorizados
+            
+        Returns:
+            Lista de vetores, na mesma ordem dos textos
+        """
+        embeddings = self.embedding_cache.get_many(texts, self.embedding_cache_model)
+        faltantes = [idx for idx, embedding in enumerate(embeddings) if embedding is None]
+        offset = 0
+        
+        for batch in self._iter_embedding_batches([texts[idx] for idx in faltantes]):
+            batch_embeddings = self._embed_batch(batch)
+            self.embedding_cache.put_many(batch, batch_embeddings, self.embedding_cache_model)
+            
+            for idx, embedding in zip(faltantes[offset:offset + len(batch)], batch_embeddings):
+                embeddings[idx] = embedding
+            offset += len(batch)
+        
+        return embeddings
+    
+    def _iter_embedding_batches(self, texts: List[str]):
+        """
+        Agrupa textos respeitando o limite de itens e de tamanho por requisição.
+        
+        Vertex AI aceita até 250 textos (~20k tokens) por chamada; OpenAI
+        até 2048 textos (~300k tokens). O limite de tamanho é estimado em
+        caracteres (~4 caracteres por token).
+        """
         if self.use_vertex_ai:
-            return self._generate_embedding_vertex(text)
+            max_items, max_chars = EMBEDDING_BATCH_LIMITS['vertex']
         else:
-            return self._generate_embedding_openai(text)
+            max_items, max_chars = EMBEDDING_BATCH_LIMITS['openai']
+        
+        batch: List[str] = []
+        batch_chars = 0
+        
+        for text in texts:
+            if batch and (len(batch) >= max_items or batch_chars + len(text) > max_chars):
+                yield batch
+                batch = []
+                batch_chars = 0
+            
+            batch.append(text)
+            batch_chars += len(text)
+        
+        if batch:
+            yield batch
+    
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Gera embeddings de um lote em uma única chamada ao provedor."""
+        if self.embedding_fn is not None:
+            return [list(embedding) for embedding in self.embedding_fn(texts)]
+        
+        if self.use_vertex_ai:
+            embeddings = self._get_vertex_model().get_embeddings(texts)
+            return [embedding.values for embedding in embeddings]
+        
+        response = self.openai_client.embeddings.create(
+            model="text-embedding-3-small",
+            input=texts
+        )
+        
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    
+    def _get_vertex_model(self):
+        """Carrega o modelo de embedding do Vertex AI uma única vez por cliente."""
+        if self._vertex_model is None:
+            from vertexai.language_models import TextEmbeddingModel
+            
+            self._vertex_model = TextEmbeddingModel.from_pretrained(self.embedding_model)
+        
+        return self._vertex_model
     
     def _generate_embedding_vertex(self, text: str) -> List[float]:
         """Gera embedding usando Vertex AI"""
-        from vertexai.language_models import TextEmbeddingModel
-        
-        model = TextEmbeddingModel.from_pretrained(self.embedding_model)
-        embeddings = model.get_embeddings([text])
+        embeddings = self._get_vertex_model().get_embeddings([text])
         
         return embeddings[0].values
     
@@ -108,51 +294,539 @@ class VectorDBClient:
         query_embedding: List[float], 
         org_id: str, 
         top_k: int = 3,
-        min_similarity: float = 0.7
+        min_similarity: float = 0.7,
+        query_text: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
         Consulta a base de conhecimento vetorial com isolamento Multi-Tenant.
         
+        A busca é feita sobre chunks; os hits de um mesmo documento são
+        agrupados em um único resultado (similaridade do melhor chunk e
+        conteúdo dos chunks mais relevantes na ordem do texto).
+        
+        Com query_text e busca híbrida habilitada, o ranking vetorial é
+        combinado ao BM25 por RRF; hits apenas lexicais (termos exatos como
+        "Lei 105/2001") entram abaixo de min_similarity, desde que acima de
+        min_similarity * RAG_LEXICAL_MIN_SIMILARITY_RATIO.
+        
+        Filtros de metadados (ver utils/knowledge_filters.py) viram uma
+        máscara aplicada antes da pontuação vetorial e lexical.
+        
         Args:
             query_embedding: Vetor da query
             org_id: ID da organização (isolamento)
             top_k: Número de resultados
             min_similarity: Similaridade mínima (0-1)
+            query_text: Texto da query (habilita a parte lexical)
+            filters: Filtros de metadados (tipos, tags, data_inicio, data_fim)
             
         Returns:
             Lista de documentos relevantes com scores
         """
-        # Busca todos os documentos da organização
+        # CRÍTICO: O índice é sempre isolado por org_id
+        index = self.get_org_index(org_id)
+        
+        mask = self._filter_mask(org_id, index, normalize_filters(filters))
+        
+        if mask is not None and not mask.any():
+            return []
+        
+        num_hits = top_k * self.chunk_oversample
+        hits = index.search(query_embedding, num_hits, min_similarity, mask=mask)
+        
+        if query_text and self.hybrid_search:
+            lexical_hits = self.get_org_lexical_index(org_id, index).search(query_text, num_hits, mask=mask)
+            hits = self._fuse_rrf(
+                index, query_embedding, hits, lexical_hits,
+                min_similarity * self.lexical_min_similarity_ratio
+            )
+        
+        return self._collapse_hits(index, hits, top_k)
+    
+    def _filter_mask(
+        self,
+        org_id: str,
+        index: ExactVectorIndex,
+        filters: Optional[Dict[str, Any]]
+    ) -> Optional[Any]:
+        """
+        Calcula a máscara de filtros sobre as posições do índice.
+        
+        As colunas de metadados são montadas uma vez por índice e estendidas
+        conforme novos documentos são adicionados em memória.
+        """
+        if not filters:
+            return None
+        
+        entry = self._org_filter_columns.get(org_id)
+        
+        if entry is None or entry[0] is not index:
+            entry = (index, FilterColumns())
+            self._org_filter_columns[org_id] = entry
+        
+        columns = entry[1]
+        columns.extend(index.payloads)
+        
+        return columns.mask(filters)
+    
+    def _fuse_rrf(
+        self,
+        index: ExactVectorIndex,
+        query_embedding: List[float],
+        vector_hits: List[Tuple[int, float]],
+        lexical_hits: List[Tuple[int, float]],
+        lexical_min_similarity: float = 0.0
+    ) -> List[Tuple[int, float]]:
+        """
+        Combina rankings vetorial e lexical por Reciprocal Rank Fusion.
+        
+        Args:
+            index: Índice vetorial (para a similaridade dos hits só lexicais)
+            query_embedding: Vetor da query
+            vector_hits: Lista (posição, similaridade) da busca vetorial
+            lexical_hits: Lista (posição, score BM25) da busca lexical
+            lexical_min_similarity: Similaridade mínima dos hits apenas lexicais
+            
+        Returns:
+            Lista (posição, similaridade) ordenada pelo score combinado
+        """
+        if not lexical_hits:
+            return vector_hits
+        
+        fused: Dict[int, float] = {}
+        similarities = dict(vector_hits)
+        
+        lexical_only = [pos for pos, _ in lexical_hits if pos not in similarities]
+        if lexical_only:
+            similarities.update(zip(lexical_only, index.similarities(query_embedding, lexical_only).tolist()))
+        
+        # Hits lexicais sem relação semântica com a query não entram no ranking
+        lexical_hits = [
+            (pos, score) for pos, score in lexical_hits
+            if similarities[pos] >= lexical_min_similarity
+        ]
+        
+        for ranking in (vector_hits, lexical_hits):
+            for rank, (pos, _) in enumerate(ranking, 1):
+                fused[pos] = fused.get(pos, 0.0) + 1.0 / (self.rrf_k + rank)
+        
+        ordered = sorted(fused, key=lambda pos: fused[pos], reverse=True)
+        
+        return [(pos, float(similarities[pos])) for pos in ordered]
+    
+    def _collapse_hits(
+        self,
+        index: ExactVectorIndex,
+        hits: List[Tuple[int, float]],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Agrupa hits de chunks por documento pai, preservando a ordem de relevância.
+        
+        Args:
+            index: Índice consultado
+            hits: Lista (posição, similaridade) em ordem decrescente
+            top_k: Número de documentos retornados
+            
+        Returns:
+            Lista de resultados por documento
+        """
+        grupos: Dict[str, List[Tuple[int, float]]] = {}
+        
+        for pos, similarity in hits:
+            parent_id = index.payloads[pos].get('parent_id') or index.doc_ids[pos]
+            
+            if parent_id not in grupos:
+                if len(grupos) == top_k:
+                    continue
+                grupos[parent_id] = []
+            
+            if len(grupos[parent_id]) < self.max_chunks_per_result:
+                grupos[parent_id].append((pos, similarity))
+        
+        results = []
+        
+        for parent_id, grupo in grupos.items():
+            best_pos, best_similarity = grupo[0]
+            payload = index.payloads[best_pos]
+            
+            if payload.get('parent_id') is None:
+                results.append({
+                    'doc_id': parent_id,
+                    'similarity': best_similarity,
+                    **payload,
+                    'chunks': []
+                })
+                continue
+            
+            ordenados = sorted(grupo, key=lambda hit: index.payloads[hit[0]]['chunk_index'])
+            
+            results.append({
+                'doc_id': parent_id,
+                'similarity': best_similarity,
+                **payload,
+                'conteudo': "\n[...]\n".join(index.payloads[pos]['conteudo'] for pos, _ in ordenados),
+                'chunks': [
+                    {
+                        'chunk_id': index.doc_ids[pos],
+                        'chunk_index': index.payloads[pos]['chunk_index'],
+                        'secao': index.payloads[pos].get('secao'),
+                        'similarity': similarity
+                    }
+                    for pos, similarity in ordenados
+                ]
+            })
+        
+        return results
+    
+    def get_knowledge_version(self, org_id: str) -> int:
+        """
+        Lê o carimbo de versão da base de conhecimento da organização.
+        
+        O carimbo é incrementado a cada escrita em add_knowledge_document e
+        custa a leitura de um único documento pequeno.
+        
+        Args:
+            org_id: ID da organização
+            
+        Returns:
+            Versão atual (0 se a organização nunca teve escritas versionadas)
+        """
+        doc = self.db.collection(self.versions_collection).document(org_id).get()
+        
+        if not doc.exists:
+            return 0
+        
+        return int(doc.to_dict().get('version', 0))
+    
+    def get_org_index(self, org_id: str) -> ExactVectorIndex:
+        """
+        Retorna o índice vetorial da organização, reconstruindo-o apenas
+        quando o carimbo de versão mudou ou quando settings.rag_index pede
+        outro backend ou outros parâmetros de construção (nlist, kmeans_iter).
+        nprobe é aplicado na consulta, sem reconstrução.
+        
+        Args:
+            org_id: ID da organização
+            
+        Returns:
+            Índice vetorial da organização
+        """
+        version = self.get_knowledge_version(org_id)
+        backend, params = self._resolve_index_config(org_id)
+        index = self._org_indexes.get(org_id)
+        
+        if index is not None and index.version == version and self._index_matches_config(index, backend, params):
+            return self._apply_search_params(index, params)
+        
+        index = self._load_persisted_index(org_id, version, backend, params)
+        
+        if index is None:
+            index = self._build_org_index(org_id, version, backend, params)
+            self._persist_index(org_id, index)
+        
+        self._org_indexes[org_id] = index
+        
+        return self._apply_search_params(index, params)
+    
+    def _index_matches_config(self, index: ExactVectorIndex, backend: str, params: Dict[str, Any]) -> bool:
+        """True se o índice foi construído com o backend e os parâmetros de construção configurados."""
+        if backend == BACKEND_EXACT or len(index) < self.ann_min_docs:
+            backend = BACKEND_EXACT
+        
+        if index.backend != backend:
+            return False
+        
+        return all(
+            getattr(index, chave) == params[chave]
+            for chave in INDEX_BUILD_PARAMS
+            if chave in params and hasattr(index, chave)
+        )
+    
+    @staticmethod
+    def _apply_search_params(index: ExactVectorIndex, params: Dict[str, Any]) -> ExactVectorIndex:
+        """Aplica os parâmetros de consulta (nprobe) ao índice carregado."""
+        if 'nprobe' in params and hasattr(index, 'nprobe'):
+            index.nprobe = params['nprobe']
+        
+        return index
+    
+    def get_org_lexical_index(self, org_id: str, index: ExactVectorIndex) -> BM25Index:
+        """
+        Retorna o índice BM25 alinhado ao índice vetorial da organização.
+        
+        É carregado do store (artefato 'bm25') ou construído a partir dos
+        payloads do índice vetorial, sem leituras no Firestore.
+        
+        Args:
+            org_id: ID da organização
+            index: Índice vetorial atual da organização
+            
+        Returns:
+            Índice lexical
+        """
+        lexical = self._org_lexical.get(org_id)
+        
+        if lexical is not None and lexical.version == index.version and len(lexical) == len(index):
+            return lexical
+        
+        lexical = None
+        
+        if self.index_store is not None:
+            try:
+                data = self.index_store.load(org_id, name="bm25")
+                if data is not None:
+                    lexical = load_bm25_index(data)
+            except Exception as e:
+                logger.warning(f"Erro ao carregar índice BM25 persistido da org {org_id}: {e}")
+        
+        if lexical is None or lexical.version != index.version or len(lexical) != len(index):
+            lexical = BM25Index.build(
+                (self._lexical_text(payload) for payload in index.payloads),
+                version=index.version
+            )
+            logger.info(f"Índice BM25 da org {org_id} construído: {len(lexical)} documentos (versão {index.version})")
+            
+            if self.index_store is not None:
+                try:
+                    self.index_store.save(org_id, lexical.to_bytes(), name="bm25")
+                except Exception as e:
+                    logger.warning(f"Erro ao persistir índice BM25 da org {org_id}: {e}")
+        
+        self._org_lexical[org_id] = lexical
+        
+        return lexical
+    
+    @staticmethod
+    def _lexical_text(payload: Dict[str, Any]) -> str:
+        """Texto indexado no BM25 (título + conteúdo do documento ou chunk)."""
+        return f"{payload.get('titulo', '')}\n{payload.get('conteudo', '')}"
+    
+    def _load_persisted_index(
+        self,
+        org_id: str,
+        version: int,
+        backend: str,
+        params: Dict[str, Any]
+    ) -> Optional[ExactVectorIndex]:
+        """
+        Carrega o índice persistido da organização se estiver na versão e na configuração atuais.
+        
+        Args:
+            org_id: ID da organização
+            version: Versão atual do carimbo
+            backend: Backend configurado
+            params: Parâmetros configurados
+            
+        Returns:
+            Índice carregado ou None (ausente, desatualizado, de outra configuração ou corrompido)
+        """
+        if self.index_store is None:
+            return None
+        
+        try:
+            data = self.index_store.load(org_id)
+            
+            if data is None:
+                return None
+            
+            index = load_index(data)
+        except Exception as e:
+            logger.warning(f"Erro ao carregar índice persistido da org {org_id}: {e}")
+            return None
+        
+        if index.version != version:
+            return None
+        
+        if not self._index_matches_config(index, backend, params):
+            logger.info(f"Índice persistido da org {org_id} com outra configuração ({index.backend}), reconstruindo")
+            return None
+        
+        # Índices gravados antes dos filtros por período não têm created_at nos payloads
+        if index.payloads and 'created_at' not in index.payloads[0]:
+            return None
+        
+        logger.info(f"Índice {index.backend} da org {org_id} carregado do store (versão {version})")
+        
+        return index
+    
+    def _persist_index(self, org_id: str, index: ExactVectorIndex) -> None:
+        """Grava o índice no store configurado (falhas não são críticas)."""
+        if self.index_store is None:
+            return
+        
+        try:
+            self.index_store.save(org_id, index.to_bytes())
+        except Exception as e:
+            logger.warning(f"Erro ao persistir índice da org {org_id}: {e}")
+    
+    def _resolve_index_config(self, org_id: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        Resolve backend e parâmetros do índice da organização.
+        
+        Lê settings.rag_index da organização (ex: {"backend": "ivf", "nprobe": 16})
+        no máximo uma vez a cada RAG_INDEX_CONFIG_TTL_SECONDS. Configuração
+        inválida (backend desconhecido, chave não suportada, valor não
+        inteiro) é registrada no log e substituída pelos padrões.
+        
+        Args:
+            org_id: ID da organização
+            
+        Returns:
+            Tupla (backend, parâmetros)
+        """
+        agora = time.monotonic()
+        cached = self._org_index_config.get(org_id)
+        
+        if cached is not None and cached[0] > agora:
+            return cached[1], dict(cached[2])
+        
+        backend, params = self._read_index_config(org_id)
+        self._org_index_config[org_id] = (agora + self.index_config_ttl, backend, params)
+        
+        return backend, dict(params)
+    
+    def _read_index_config(self, org_id: str) -> Tuple[str, Dict[str, Any]]:
+        """Lê e valida settings.rag_index da organização (padrões se ausente ou inválido)."""
+        backend = self.index_backend
+        params = dict(self.index_params)
+        
+        try:
+            org_doc = self.db.collection('organizations').document(org_id).get()
+            
+            if org_doc.exists:
+                config = (org_doc.to_dict().get('settings') or {}).get('rag_index') or {}
+                backend, params = self._validate_index_config(config, backend, params)
+        except Exception as e:
+            logger.warning(f"Configuração de índice inválida na org {org_id}, usando padrões: {e}")
+            return self.index_backend, dict(self.index_params)
+        
+        return backend, params
+    
+    @staticmethod
+    def _validate_index_config(
+        config: Dict[str, Any],
+        backend: str,
+        params: Dict[str, Any]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Aplica settings.rag_index sobre os padrões.
+        
+        Args:
+            config: settings.rag_index da organização
+            backend: Backend padrão
+            params: Parâmetros padrão
+            
+        Returns:
+            Tupla (backend, parâmetros)
+            
+        Raises:
+            ValueError: Backend desconhecido, chave não suportada ou valor não inteiro
+        """
+        if not isinstance(config, dict):
+            raise ValueError(f"rag_index deve ser um objeto, recebido {type(config).__name__}")
+        
+        config = dict(config)
+        backend = config.pop('backend', backend)
+        
+        if backend not in INDEX_BACKENDS:
+            raise ValueError(f"backend desconhecido: {backend!r} (use {', '.join(INDEX_BACKENDS)})")
+        
+        params = dict(params)
+        for chave, valor in config.items():
+            if chave not in INDEX_INT_PARAMS:
+                raise ValueError(f"parâmetro não suportado: {chave!r}")
+            if isinstance(valor, bool):
+                raise ValueError(f"{chave} deve ser inteiro")
+            params[chave] = int(valor)
+            if params[chave] < 1:
+                raise ValueError(f"{chave} deve ser positivo")
+        
+        return backend, params
+    
+    def invalidate_org_index(self, org_id: str) -> None:
+        """Descarta os índices em memória da organização (e a configuração em cache)."""
+        self._org_indexes.pop(org_id, None)
+        self._org_index_config.pop(org_id, None)
+        self._org_lexical.pop(org_id, None)
+        self._org_filter_columns.pop(org_id, None)
+    
+    def _build_org_index(
+        self,
+        org_id: str,
+        version: int,
+        backend: str,
+        params: Dict[str, Any]
+    ) -> ExactVectorIndex:
+        """
+        Lê a coleção knowledge_base da organização e monta o índice.
+        
+        Args:
+            org_id: ID da organização
+            version: Versão lida antes da varredura
+            backend: Backend configurado (exact abaixo de RAG_ANN_MIN_DOCS)
+            params: Parâmetros do backend
+            
+        Returns:
+            Índice construído
+        """
         # CRÍTICO: Filtro obrigatório de org_id
         query = self.db.collection(self.knowledge_collection).where('org_id', '==', org_id)
         
-        results = []
+        doc_ids = []
+        embeddings = []
+        payloads = []
+        dim = None
         
         for doc in query.stream():
             doc_data = doc.to_dict()
-            doc_embedding = doc_data.get('embedding')
+            doc_embedding = decode_embedding(doc_data)
             
-            if not doc_embedding:
+            if doc_embedding is None:
                 continue
             
-            # Calcula similaridade
-            similarity = self.cosine_similarity(query_embedding, doc_embedding)
+            if dim is None:
+                dim = len(doc_embedding)
+            elif len(doc_embedding) != dim:
+                logger.warning(
+                    f"Documento {doc.id} ignorado: embedding com dimensão {len(doc_embedding)} (esperado {dim})"
+                )
+                continue
             
-            if similarity >= min_similarity:
-                results.append({
-                    'doc_id': doc.id,
-                    'similarity': similarity,
-                    'titulo': doc_data.get('titulo', ''),
-                    'conteudo': doc_data.get('conteudo', ''),
-                    'tipo': doc_data.get('tipo', 'desconhecido'),
-                    'metadata': doc_data.get('metadata', {})
-                })
+            doc_ids.append(doc.id)
+            embeddings.append(doc_embedding)
+            payloads.append(self._build_payload(doc_data))
+        
+        if backend == BACKEND_EXACT or len(doc_ids) < self.ann_min_docs:
+            backend, params = BACKEND_EXACT, {}
         
-        # Ordena por similaridade decrescente
-        results.sort(key=lambda x: x['similarity'], reverse=True)
+        logger.info(
+            f"Índice vetorial ({backend}) da org {org_id} construído: "
+            f"{len(doc_ids)} documentos (versão {version})"
+        )
         
-        # Retorna top_k
-        return results[:top_k]
+        return build_index(backend, doc_ids, embeddings, payloads, version=version, **params)
+    
+    @staticmethod
+    def _build_payload(doc_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Campos de um documento (ou chunk) retornados junto com cada resultado."""
+        created_at = doc_data.get('created_at')
+        
+        if created_at is not None and not isinstance(created_at, datetime):
+            # SERVER_TIMESTAMP de uma escrita local ainda não resolvido
+            created_at = datetime.now(timezone.utc)
+        
+        return {
+            'titulo': doc_data.get('titulo', ''),
+            'conteudo': doc_data.get('conteudo', ''),
+            'tipo': doc_data.get('tipo', 'desconhecido'),
+            'metadata': doc_data.get('metadata', {}),
+            'parent_id': doc_data.get('parent_id'),
+            'chunk_index': doc_data.get('chunk_index'),
+            'secao': doc_data.get('secao'),
+            'created_at': created_at.isoformat() if created_at else None
+        }
     
     def add_knowledge_document(
         self,
@@ -165,6 +839,9 @@ class VectorDBClient:
         """
         Adiciona documento à base de conhecimento.
         
+        Conteúdos maiores que chunk_max_tokens são divididos em chunks
+        (registros filhos com parent_id) vetorizados em lote.
+        
         Args:
             org_id: ID da organização
             titulo: Título do documento
@@ -175,26 +852,369 @@ class VectorDBClient:
         Returns:
             ID do documento criado
         """
-        # Gera embedding do conteúdo
-        embedding = self.generate_embedding(conteudo)
+        records = self._prepare_records(org_id, titulo, conteudo, tipo, metadata)
+        
+        # Gera embeddings dos chunks (o registro pai não tem embedding)
+        embeddings = iter(self.generate_embeddings([text for _, _, text in records if text is not None]))
+        for _, doc_data, text in records:
+            if text is not None:
+                doc_data['embedding'] = next(embeddings)
+        
+        # Salva no Firestore e incrementa o carimbo de versão na mesma escrita
+        erros = self._commit_in_batches(org_id, [(0, doc_ref, doc_data) for doc_ref, doc_data, _ in records])
+        
+        if erros:
+            raise erros[0]
+        
+        return records[0][0].id
+    
+    def add_knowledge_documents(
+        self,
+        org_id: str,
+        documents: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Adiciona vários documentos com embeddings em lote e escritas agrupadas.
+        
+        Documentos longos são divididos em chunks como em add_knowledge_document.
+        Falhas de um documento (conteúdo vazio, erro de embedding ou de
+        escrita) são reportadas individualmente sem abortar os demais.
+        
+        Args:
+            org_id: ID da organização
+            documents: Lista de dicionários com titulo, conteudo, tipo e metadata
+            
+        Returns:
+            Dicionário com doc_ids (na ordem de entrada, None se falhou) e falhas
+        """
+        doc_ids: List[Optional[str]] = [None] * len(documents)
+        falhas: List[Dict[str, Any]] = []
+        falhou = set()
+        
+        def registrar_falha(idx: int, erro: Exception) -> None:
+            if idx in falhou:
+                return
+            falhou.add(idx)
+            falhas.append({
+                'index': idx,
+                'titulo': documents[idx].get('titulo'),
+                'erro': str(erro)
+            })
+        
+        # 1. Valida entradas
+        validos = []
+        for idx, doc in enumerate(documents):
+            if not doc.get('titulo') or not doc.get('conteudo'):
+                registrar_falha(idx, ValueError("Campos obrigatórios: titulo, conteudo"))
+            else:
+                validos.append(idx)
+        
+        # 2. Divide em registros (documento único ou pai + chunks)
+        records = {
+            idx: self._prepare_records(
+                org_id,
+                documents[idx]['titulo'],
+                documents[idx]['conteudo'],
+                documents[idx].get('tipo', 'documento'),
+                documents[idx].get('metadata')
+            )
+            for idx in validos
+        }
+        pendentes = [
+            (idx, doc_data, text)
+            for idx in validos
+            for _, doc_data, text in records[idx]
+            if text is not None
+        ]
+        
+        # 3. Reaproveita embeddings em cache (ex: reimportação do mesmo arquivo)
+        cached = self.embedding_cache.get_many([text for _, _, text in pendentes], self.embedding_cache_model)
+        faltantes = []
+        
+        for item, embedding in zip(pendentes, cached):
+            if embedding is None:
+                faltantes.append(item)
+            else:
+                item[1]['embedding'] = embedding
+        
+        # 4. Gera os demais em lotes (isola o item com erro se o lote falhar)
+        offset = 0
+        
+        for batch in self._iter_embedding_batches([text for _, _, text in faltantes]):
+            itens = faltantes[offset:offset + len(batch)]
+            offset += len(batch)
+            
+            try:
+                batch_embeddings = self._embed_batch(batch)
+                self.embedding_cache.put_many(batch, batch_embeddings, self.embedding_cache_model)
+                for (_, doc_data, _), embedding in zip(itens, batch_embeddings):
+                    doc_data['embedding'] = embedding
+            except Exception as e:
+                logger.warning(f"Erro no lote de embeddings ({len(batch)} textos), tentando individualmente: {e}")
+                
+                for idx, doc_data, texto in itens:
+                    if idx in falhou:
+                        continue
+                    try:
+                        doc_data['embedding'] = self.generate_embedding(texto)
+                    except Exception as item_error:
+                        registrar_falha(idx, item_error)
+        
+        # 5. Grava em lotes de até 500 operações (um documento não é gravado pela metade)
+        erros = self._commit_in_batches(org_id, [
+            (idx, doc_ref, doc_data)
+            for idx in validos if idx not in falhou
+            for doc_ref, doc_data, _ in records[idx]
+        ])
+        
+        for idx in validos:
+            if idx in erros:
+                registrar_falha(idx, erros[idx])
+            elif idx not in falhou:
+                doc_ids[idx] = records[idx][0][0].id
+        
+        falhas.sort(key=lambda falha: falha['index'])
+        
+        return {
+            'total': len(documents),
+            'importados': len(documents) - len(falhas),
+            'doc_ids': doc_ids,
+            'falhas': falhas
+        }
+    
+    def _prepare_records(
+        self,
+        org_id: str,
+        titulo: str,
+        conteudo: str,
+        tipo: str,
+        metadata: Optional[Dict[str, Any]]
+    ) -> List[Tuple[Any, Dict[str, Any], Optional[str]]]:
+        """
+        Monta os registros de um documento, ainda sem embeddings.
+        
+        Documentos que cabem em um chunk geram um único registro. Os demais
+        geram um registro pai (sem embedding, com num_chunks) seguido dos
+        chunks com parent_id, chunk_index, secao e is_chunk=True.
+        
+        Returns:
+            Lista de (referência, dados, texto a vetorizar ou None); o
+            primeiro item é sempre o registro principal do documento
+        """
+        collection = self.db.collection(self.knowledge_collection)
+        chunks = chunk_text(conteudo, self.chunk_max_tokens, self.chunk_overlap_tokens)
+        
+        if len(chunks) <= 1:
+            return [(collection.document(), self._build_doc_data(org_id, titulo, conteudo, tipo, metadata), conteudo)]
+        
+        parent_ref = collection.document()
+        parent_data = {
+            'org_id': org_id,  # CRÍTICO: Isolamento
+            'titulo': titulo,
+            'tipo': tipo,
+            'metadata': metadata or {},
+            'num_chunks': len(chunks),
+            'content_length': len(conteudo),
+            'is_chunk': False,
+            'created_at': firestore.SERVER_TIMESTAMP,
+            'embedding_model': self.embedding_model
+        }
+        records = [(parent_ref, parent_data, None)]
+        
+        for chunk in chunks:
+            chunk_data = self._build_doc_data(org_id, titulo, chunk['conteudo'], tipo, metadata)
+            chunk_data.update({
+                'is_chunk': True,
+                'parent_id': parent_ref.id,
+                'chunk_index': chunk['chunk_index'],
+                'secao': chunk['secao']
+            })
+            records.append((collection.document(), chunk_data, chunk['conteudo']))
         
-        # Prepara documento
-        doc_data = {
+        return records
+    
+    def _build_doc_data(
+        self,
+        org_id: str,
+        titulo: str,
+        conteudo: str,
+        tipo: str,
+        metadata: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Monta o documento de conhecimento a ser gravado (embedding é preenchido depois)."""
+        return {
             'org_id': org_id,  # CRÍTICO: Isolamento
             'titulo': titulo,
             'conteudo': conteudo,
             'tipo': tipo,
-            'embedding': embedding,
             'metadata': metadata or {},
+            # Listagem de documentos filtra por is_chunk no Firestore
+            'is_chunk': False,
             'created_at': firestore.SERVER_TIMESTAMP,
             'embedding_model': self.embedding_model
         }
+    
+    def _commit_in_batches(
+        self,
+        org_id: str,
+        entries: List[Tuple[int, Any, Dict[str, Any]]]
+    ) -> Dict[int, Exception]:
+        """
+        Grava registros em lotes de até 500 operações, mantendo os registros
+        de um mesmo documento no mesmo lote sempre que couberem.
+        
+        Se um lote falha, os registros já gravados dos documentos afetados
+        são removidos e os restantes deles não são gravados.
         
-        # Salva no Firestore
-        doc_ref = self.db.collection(self.knowledge_collection).document()
-        doc_ref.set(doc_data)
+        Args:
+            org_id: ID da organização
+            entries: Lista de (índice do documento, referência, dados), agrupada por documento
+            
+        Returns:
+            Dicionário {índice do documento: erro} dos documentos que falharam
+        """
+        tamanho_lote = FIRESTORE_MAX_BATCH_WRITES - 1
+        lotes = []
+        lote = []
         
-        return doc_ref.id
+        for _, grupo in groupby(entries, key=lambda entry: entry[0]):
+            grupo = list(grupo)
+            
+            if lote and len(lote) + len(grupo) > tamanho_lote:
+                lotes.append(lote)
+                lote = []
+            
+            for entry in grupo:
+                if len(lote) == tamanho_lote:
+                    lotes.append(lote)
+                    lote = []
+                lote.append(entry)
+        
+        if lote:
+            lotes.append(lote)
+        
+        erros: Dict[int, Exception] = {}
+        gravados: Dict[int, List[Any]] = defaultdict(list)
+        
+        for lote in lotes:
+            lote = [entry for entry in lote if entry[0] not in erros]
+            
+            if not lote:
+                continue
+            
+            try:
+                self._commit_knowledge_writes(org_id, [(doc_ref, doc_data) for _, doc_ref, doc_data in lote])
+            except Exception as e:
+                logger.error(f"Erro ao gravar lote de {len(lote)} registros: {e}")
+                
+                for idx in {entry[0] for entry in lote}:
+                    erros[idx] = e
+                    self._rollback_knowledge_writes(org_id, gravados.pop(idx, []))
+                continue
+            
+            for idx, doc_ref, _ in lote:
+                gravados[idx].append(doc_ref)
+        
+        return erros
+    
+    def _rollback_knowledge_writes(self, org_id: str, doc_refs: List[Any]) -> None:
+        """Remove registros de um documento gravado pela metade (melhor esforço)."""
+        if not doc_refs:
+            return
+        
+        version_ref = self.db.collection(self.versions_collection).document(org_id)
+        tamanho_lote = FIRESTORE_MAX_BATCH_WRITES - 1
+        
+        try:
+            for start in range(0, len(doc_refs), tamanho_lote):
+                batch = self.db.batch()
+                for doc_ref in doc_refs[start:start + tamanho_lote]:
+                    batch.delete(doc_ref)
+                batch.set(version_ref, {
+                    'version': firestore.Increment(1),
+                    'updated_at': firestore.SERVER_TIMESTAMP
+                }, merge=True)
+                batch.commit()
+        except Exception as e:
+            logger.error(f"Erro ao remover {len(doc_refs)} registros parciais da org {org_id}: {e}")
+        
+        self.invalidate_org_index(org_id)
+    
+    def _commit_knowledge_writes(self, org_id: str, writes: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        """
+        Grava documentos de conhecimento e incrementa o carimbo de versão
+        da organização na mesma escrita em lote.
+        
+        Args:
+            org_id: ID da organização
+            writes: Lista de (referência do documento, dados)
+        """
+        version_ref = self.db.collection(self.versions_collection).document(org_id)
+        
+        batch = self.db.batch()
+        for doc_ref, doc_data in writes:
+            batch.set(doc_ref, self._encode_for_storage(doc_data))
+        batch.set(version_ref, {
+            'version': firestore.Increment(1),
+            'updated_at': firestore.SERVER_TIMESTAMP
+        }, merge=True)
+        batch.commit()
+        
+        self._apply_local_writes(org_id, [
+            (doc_ref.id, doc_data['embedding'], doc_data)
+            for doc_ref, doc_data in writes
+            if doc_data.get('embedding')
+        ])
+    
+    def _encode_for_storage(self, doc_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Converte o embedding do registro para o formato de armazenamento configurado."""
+        if not doc_data.get('embedding'):
+            return doc_data
+        
+        return {**doc_data, **encode_embedding(doc_data['embedding'], self.embedding_storage_format)}
+    
+    def _apply_local_writes(
+        self,
+        org_id: str,
+        writes: List[Tuple[str, List[float], Dict[str, Any]]]
+    ) -> None:
+        """
+        Aplica uma escrita em lote ao índice em memória, se houver um carregado.
+        
+        O índice só é mantido se nenhuma outra instância escreveu na base
+        da organização desde a última leitura do carimbo; caso contrário é
+        descartado e reconstruído na próxima consulta.
+        """
+        index = self._org_indexes.get(org_id)
+        
+        if index is None:
+            return
+        
+        expected_version = index.version + 1
+        
+        # O índice lexical só acompanha se estiver alinhado ao vetorial
+        lexical = self._org_lexical.get(org_id)
+        if lexical is not None and (lexical.version != index.version or len(lexical) != len(index)):
+            self._org_lexical.pop(org_id, None)
+            lexical = None
+        
+        try:
+            for doc_id, embedding, doc_data in writes:
+                payload = self._build_payload(doc_data)
+                index.add(doc_id, embedding, payload)
+                if lexical is not None:
+                    lexical.add(self._lexical_text(payload))
+        except ValueError as e:
+            logger.warning(f"Índice da org {org_id} descartado: {e}")
+            self.invalidate_org_index(org_id)
+            return
+        
+        if self.get_knowledge_version(org_id) == expected_version:
+            index.version = expected_version
+            if lexical is not None:
+                lexical.version = expected_version
+        else:
+            self.invalidate_org_index(org_id)
 
 
 class RAGClient:
@@ -203,49 +1223,96 @@ class RAGClient:
     Orquestra VectorDB e geração de contexto enriquecido.
     """
     
-    def __init__(self, project_id: Optional[str] = None):
+    def __init__(
+        self,
+        project_id: Optional[str] = None,
+        index_backend: Optional[str] = None,
+        index_store: Optional[Any] = None,
+        query_cache: Optional[QueryResultCache] = None,
+        vector_db: Optional[VectorDBClient] = None
+    ):
         """
         Inicializa o cliente RAG.
         
+        O índice vetorial de cada organização é carregado sob demanda na
+        primeira consulta (do store persistido ou da coleção knowledge_base).
+        
         Args:
             project_id: ID do projeto GCP
+            index_backend: Backend de busca ('exact' ou 'ivf')
+            index_store: Store para persistir índices por organização
+            query_cache: Cache de resultados (padrão: RAG_QUERY_CACHE_SIZE / RAG_QUERY_CACHE_TTL)
+            vector_db: Cliente de Vector Database já configurado (ignora os parâmetros acima)
         """
-        self.vector_db = VectorDBClient(project_id=project_id)
+        self.vector_db = vector_db if vector_db is not None else VectorDBClient(
+            project_id=project_id,
+            index_backend=index_backend,
+            index_store=index_store
+        )
+        
+        # Resultados por (org, query, parâmetros), válidos enquanto o carimbo de versão não muda
+        self.query_cache = query_cache if query_cache is not None else QueryResultCache(
+            max_entries=int(os.getenv('RAG_QUERY_CACHE_SIZE', '256')),
+            ttl_seconds=float(os.getenv('RAG_QUERY_CACHE_TTL', '600'))
+        )
     
     def search_and_retrieve(
         self, 
         query_text: str, 
         org_id: str,
         top_k: int = 3,
-        min_similarity: float = 0.7
+        min_similarity: float = 0.7,
+        filters: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Busca e recupera conhecimento relevante com isolamento Multi-Tenant.
         
+        Resultados e contexto formatado ficam em cache até o TTL expirar ou
+        a base da organização receber uma escrita (carimbo de versão); um
+        acerto custa apenas a leitura do carimbo.
+        
         Args:
             query_text: Texto da query (ex: "Bloqueio Judicial de Contas")
             org_id: ID da organização (isolamento)
             top_k: Número de resultados
             min_similarity: Similaridade mínima
+            filters: Filtros de metadados, ex: {"tipos": ["legislacao", "politica_interna"]}
             
         Returns:
             Dicionário com resultados e contexto formatado
         """
+        normalized_filters = normalize_filters(filters)
+        cache_key = (
+            org_id,
+            normalizar_texto(query_text),
+            top_k,
+            min_similarity,
+            json.dumps(normalized_filters, sort_keys=True, default=str) if normalized_filters else None
+        )
+        generation = self.vector_db.get_knowledge_version(org_id)
+        
+        cached = self.query_cache.get(cache_key, generation)
+        if cached is not None:
+            return {**cached, 'query': query_text, 'cache_hit': True}
+        
         # 1. Gera embedding da query
         query_embedding = self.vector_db.generate_embedding(query_text)
         
         # 2. Busca na base de conhecimento (com isolamento de org_id)
+        # Vetorial + BM25 (RRF) para não perder termos exatos como "Lei 105/2001"
         results = self.vector_db.query_knowledge_base(
             query_embedding=query_embedding,
             org_id=org_id,
             top_k=top_k,
-            min_similarity=min_similarity
+            min_similarity=min_similarity,
+            query_text=query_text,
+            filters=normalized_filters
         )
         
         # 3. Formata contexto enriquecido
         contexto_formatado = self._format_context(results)
         
-        return {
+        response = {
             'query': query_text,
             'org_id': org_id,
             'num_results': len(results),
@@ -253,6 +1320,22 @@ class RAGClient:
             'contexto_formatado': contexto_formatado,
             'has_relevant_knowledge': len(results) > 0
         }
+        
+        self.query_cache.put(cache_key, generation, response)
+        
+        return {**response, 'cache_hit': False}
+    
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Estatísticas dos caches de consulta e de embeddings.
+        
+        Returns:
+            Dicionário com query_cache e embedding_cache
+        """
+        return {
+            'query_cache': self.query_cache.stats(),
+            'embedding_cache': self.vector_db.embedding_cache.stats()
+        }
     
     def _format_context(self, results: List[Dict[str, Any]]) -> str:
         """
@@ -316,32 +1399,19 @@ class RAGClient:
         self,
         org_id: str,
         documents: List[Dict[str, Any]]
-    ) -> List[str]:
+    ) -> Dict[str, Any]:
         """
         Importa múltiplos documentos em lote.
         
+        Embeddings são gerados em lotes do tamanho aceito pelo provedor e
+        os documentos gravados com escritas agrupadas do Firestore.
+        
         Args:
             org_id: ID da organização
             documents: Lista de dicionários com titulo, conteudo, tipo
             
         Returns:
-            Lista de IDs dos documentos criados
+            Dicionário com total, importados, doc_ids (None nas posições que
+            falharam) e falhas ({index, titulo, erro})
         """
-        doc_ids = []
-        
-        for doc in documents:
-            doc_id = self.add_document(
-                org_id=org_id,
-                titulo=doc['titulo'],
-                conteudo=doc['conteudo'],
-                tipo=doc.get('tipo', 'documento'),
-                metadata=doc.get('metadata')
-            )
-            doc_ids.append(doc_id)
-        
-        return doc_ids
-
-
-
-
-
+        return self.vector_db.add_knowledge_documents(org_id=org_id, documents=documents)
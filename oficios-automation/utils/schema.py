@@ -205,7 +205,10 @@ class OficioCompleto(BaseModel):
     dados_extraidos: Optional[OficioData] = None
     conteudo_bruto: Optional[str] = None
     anexos_urls: List[str] = Field(default_factory=list)
-    audit_trail: List[AuditTrail] = Field(default_factory=list)
+    audit_trail: List[AuditTrail] = Field(
+        default_factory=list,
+        description="Legado: a auditoria fica na subcoleção oficios/{id}/audit"
+    )
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     assigned_user_id: Optional[str] = Field(None, description="Usuário responsável")
@@ -0,0 +1,391 @@
+"""
+Compactação do texto de ofícios antes da extração estruturada via LLM.
+
+Saídas longas de OCR (extratos anexados, dezenas de páginas) estouram a
+janela de contexto e aumentam a latência. O texto é normalizado, perde
+cabeçalhos/rodapés repetidos e números de página e, se ainda exceder o
+orçamento de tokens, mantém apenas os trechos relevantes: cabeçalho,
+solicitações, cláusula de prazo, documentos (CPF/CNPJ) e assinatura.
+
+As páginas chegam separadas por form feed (SEPARADOR_PAGINAS); sem ele,
+as linhas de número de página marcam o fim de cada página. Uma linha só
+com um número ("3", "- 3 -") só é número de página quando está na borda
+das páginas e segue a sequência das páginas anteriores (1, 2, 3...);
+valores e prazos em linhas próprias ("250", "10") são mantidos.
+"""
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+# Orçamento de tokens do texto do ofício enviado ao LLM
+LLM_INPUT_TOKEN_BUDGET = int(os.getenv('LLM_INPUT_TOKEN_BUDGET', '6000'))
+
+# Incrementar quando a compactação mudar: entra na chave do cache de extração LLM
+COMPACTION_VERSION = 'v3'
+
+# Separador de páginas no texto extraído (OCR e camada de texto do PDF)
+SEPARADOR_PAGINAS = '\f'
+
+# Linhas curtas repetidas no topo/rodapé de pelo menos N páginas são cabeçalho/rodapé
+REPEATED_LINE_MIN_COUNT = 3
+REPEATED_LINE_MAX_CHARS = 120
+# Linhas do início e do fim de cada página consideradas cabeçalho/rodapé
+REPEATED_LINE_EDGE_LINES = 3
+
+# Caracteres do início do documento sempre mantidos (cabeçalho: órgão, número, processo)
+HEADER_CHARS = 1500
+
+MARCADOR_OMISSAO = '[...]'
+
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]', re.UNICODE)
+_ESPACOS_RE = re.compile(r'[ \t\u00a0\u200b]+')
+_HIFENIZACAO_RE = re.compile(r'(\w)-\n(\w)')
+_LINHAS_VAZIAS_RE = re.compile(r'\n{3,}')
+# Contador de página dentro de uma linha ("Página 3 de 40", "fls. 12"): único trecho normalizado
+_CONTADOR_PAGINA_RE = re.compile(
+    r'\b(?:p[áa]g(?:ina)?\.?|fls?\.?|folha)\s*\d{1,4}(?:\s*(?:/|de)\s*\d{1,4})?',
+    re.IGNORECASE
+)
+_NUMERO_PAGINA_RE = re.compile(
+    r'^\s*(?:[-–—]\s*)?(?:p[áa]g(?:ina)?\.?|fls?\.?|folha)?\s*\d{1,4}'
+    r'(?:\s*(?:/|de)\s*\d{1,4})?\s*(?:[-–—])?\s*$',
+    re.IGNORECASE
+)
+
+# Relevância de cada parágrafo (peso por padrão encontrado)
+_PADROES_RELEVANCIA = [
+    # Solicitações
+    (re.compile(r'\b(solicit|requisit|requer|determin|encaminh|inform|fornec|bloque|quebra|apresent)', re.IGNORECASE), 3),
+    # Cláusula de prazo
+    (re.compile(r'\b(prazo|dias? (?:úteis|corridos)|sob pena|improrrog|no prazo de|até \d)', re.IGNORECASE), 4),
+    # Processo, autoridade
+    (re.compile(r'\d{7}-?\d{2}\.?\d{4}\.?\d\.?\d{2}\.?\d{4}'), 3),
+    (re.compile(r'\b(processo|autos|of[íi]cio n|vara|ju[íi]z|ju[íi]za|delegad|promotor|procurador|tribunal)', re.IGNORECASE), 2),
+    # Documentos validados depois da extração (validate_document_fields)
+    (re.compile(r'\b\d{3}\.?\d{3}\.?\d{3}-?\d{2}\b|\b\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}\b'), 3),
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estima o número de tokens do texto.
+
+    Usa tiktoken (cl100k_base, vocabulário próximo ao do Llama 3) quando
+    instalado; caso contrário, uma estimativa local por palavras e
+    pontuação (palavras longas contam como várias peças).
+
+    Args:
+        text: Texto
+
+    Returns:
+        Número estimado de tokens
+    """
+    encoding = _tiktoken_encoding()
+
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return sum(1 + (len(peca) - 1) // 6 for peca in _TOKEN_RE.findall(text))
+
+
+_ENCODING_CACHE: Dict[str, object] = {}
+
+
+def _tiktoken_encoding():
+    if 'encoding' not in _ENCODING_CACHE:
+        try:
+            import tiktoken
+            _ENCODING_CACHE['encoding'] = tiktoken.get_encoding('cl100k_base')
+        except Exception:
+            _ENCODING_CACHE['encoding'] = None
+
+    return _ENCODING_CACHE['encoding']
+
+
+def normalize_whitespace(text: str) -> str:
+    """
+    Normaliza espaços do OCR: une palavras hifenizadas na quebra de linha,
+    colapsa espaços e remove linhas vazias excedentes. Os separadores de
+    página (form feed) são preservados.
+
+    Args:
+        text: Texto bruto
+
+    Returns:
+        Texto normalizado
+    """
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+    paginas = []
+    for pagina in text.split(SEPARADOR_PAGINAS):
+        pagina = _HIFENIZACAO_RE.sub(r'\1\2', pagina)
+        linhas = [_ESPACOS_RE.sub(' ', linha).strip() for linha in pagina.split('\n')]
+        paginas.append(_LINHAS_VAZIAS_RE.sub('\n\n', '\n'.join(linhas)).strip())
+
+    return SEPARADOR_PAGINAS.join(paginas).strip(SEPARADOR_PAGINAS)
+
+
+def _bordas(linhas: List[str]) -> List[int]:
+    """Índices das linhas preenchidas no início e no fim da página."""
+    preenchidas = [indice for indice, linha in enumerate(linhas) if linha]
+    return sorted(set(preenchidas[:REPEATED_LINE_EDGE_LINES] + preenchidas[-REPEATED_LINE_EDGE_LINES:]))
+
+
+def _numeros_pagina(
+    linhas: List[str],
+    posicoes: List[Tuple[int, int]],
+    min_count: int
+) -> Set[Tuple[int, int]]:
+    """
+    Posições que são números de página.
+
+    Contadores explícitos ("Página 3 de 40", "fls. 12") sempre contam;
+    números soltos só quando formam uma sequência (n, n+1, ...) de pelo
+    menos min_count ocorrências, cada uma em outra página ou separada da
+    anterior por alguma linha de conteúdo.
+
+    Args:
+        linhas: Linha de cada posição candidata
+        posicoes: Posições (página, linha) candidatas, na ordem do texto
+        min_count: Tamanho mínimo da sequência de números soltos
+
+    Returns:
+        Posições dos números de página
+    """
+    numeros = set()
+    sequencias: List[List[Tuple[int, int]]] = []
+    abertas: Dict[int, List[Tuple[int, int]]] = {}
+
+    for linha, posicao in zip(linhas, posicoes):
+        if not _NUMERO_PAGINA_RE.match(linha):
+            continue
+
+        if _CONTADOR_PAGINA_RE.search(linha):
+            numeros.add(posicao)
+            continue
+
+        numero = int(re.search(r'\d+', linha).group())
+        sequencia = abertas.pop(numero, None)
+        if sequencia is not None:
+            pagina, indice = sequencia[-1]
+            if posicao[0] == pagina and posicao[1] - indice < 2:
+                sequencia = None
+        if sequencia is None:
+            sequencia = []
+            sequencias.append(sequencia)
+        sequencia.append(posicao)
+
+        if len(sequencia) >= len(abertas.get(numero + 1, [])):
+            abertas[numero + 1] = sequencia
+
+    for sequencia in sequencias:
+        if len(sequencia) >= min_count:
+            numeros.update(sequencia)
+
+    return numeros
+
+
+def _paginas(text: str, min_count: int) -> Tuple[List[List[str]], Set[Tuple[int, int]]]:
+    """
+    Linhas de cada página e posições (página, linha) dos números de página.
+
+    Com form feed, os números de página são procurados nas bordas de cada
+    página; sem ele, os números de página encerram as páginas.
+    """
+    if SEPARADOR_PAGINAS in text:
+        paginas = [pagina.split('\n') for pagina in text.split(SEPARADOR_PAGINAS)]
+        posicoes = [(i, j) for i, linhas in enumerate(paginas) for j in _bordas(linhas)]
+        return paginas, _numeros_pagina([paginas[i][j] for i, j in posicoes], posicoes, min_count)
+
+    linhas = text.split('\n')
+    posicoes = [(0, j) for j, linha in enumerate(linhas) if linha]
+    fins = {j for _, j in _numeros_pagina([linhas[j] for _, j in posicoes], posicoes, min_count)}
+
+    paginas: List[List[str]] = [[]]
+    numeros = set()
+    for j, linha in enumerate(linhas):
+        if j in fins:
+            numeros.add((len(paginas) - 1, len(paginas[-1])))
+        paginas[-1].append(linha)
+        if j in fins:
+            paginas.append([])
+
+    if not any(paginas[-1]):
+        paginas.pop()
+
+    return paginas or [[]], numeros
+
+
+def _assinatura(linha: str) -> str:
+    """Chave de repetição: apenas contadores de página são normalizados (dados nunca se fundem)."""
+    return _CONTADOR_PAGINA_RE.sub('#', linha.lower())
+
+
+def strip_repeated_lines(text: str, min_count: int = REPEATED_LINE_MIN_COUNT) -> str:
+    """
+    Remove números de página e cabeçalhos/rodapés repetidos entre páginas.
+
+    Uma linha curta que aparece no início ou no fim (REPEATED_LINE_EDGE_LINES
+    linhas) de pelo menos min_count páginas é mantida apenas na primeira
+    ocorrência. Somente contadores de página ("Página 3 de 40") são
+    ignorados na comparação; linhas com outros números (agência, conta,
+    valores) só são removidas se forem idênticas. Números soltos só são
+    removidos em sequência de páginas (ver _numeros_pagina): texto de uma
+    única página não perde nenhuma linha.
+
+    Args:
+        text: Texto normalizado (páginas separadas por form feed)
+        min_count: Páginas mínimas para considerar cabeçalho/rodapé
+
+    Returns:
+        Texto sem as linhas repetidas, páginas unidas por linha em branco
+    """
+    paginas, numeros = _paginas(text, min_count)
+
+    contagem: Counter = Counter()
+    for i, linhas in enumerate(paginas):
+        contagem.update({
+            _assinatura(linhas[j]) for j in _bordas(linhas)
+            if (i, j) not in numeros and len(linhas[j]) <= REPEATED_LINE_MAX_CHARS
+        })
+
+    repetidas = {chave for chave, paginas_com_linha in contagem.items() if paginas_com_linha >= min_count}
+
+    vistas = set()
+    resultado = []
+
+    for i, linhas in enumerate(paginas):
+        for j, linha in enumerate(linhas):
+            if (i, j) in numeros:
+                continue
+
+            chave = _assinatura(linha)
+            if linha and chave in repetidas:
+                if chave in vistas:
+                    continue
+                vistas.add(chave)
+
+            resultado.append(linha)
+
+        resultado.append('')
+
+    return _LINHAS_VAZIAS_RE.sub('\n\n', '\n'.join(resultado)).strip()
+
+
+def _blocos(text: str, max_tokens: int) -> List[str]:
+    """Parágrafos do texto; parágrafos longos (OCR sem linhas em branco) viram blocos de linhas."""
+    blocos = []
+
+    for paragrafo in text.split('\n\n'):
+        if not paragrafo.strip():
+            continue
+
+        if estimate_tokens(paragrafo) <= max_tokens:
+            blocos.append(paragrafo)
+            continue
+
+        atual: List[str] = []
+        tokens_atual = 0
+        for linha in paragrafo.split('\n'):
+            tokens_linha = estimate_tokens(linha)
+            if atual and tokens_atual + tokens_linha > max_tokens:
+                blocos.append('\n'.join(atual))
+                atual, tokens_atual = [], 0
+            atual.append(linha)
+            tokens_atual += tokens_linha
+
+        if atual:
+            blocos.append('\n'.join(atual))
+
+    return blocos
+
+
+def _relevancia(paragrafo: str) -> int:
+    return sum(peso for padrao, peso in _PADROES_RELEVANCIA if padrao.search(paragrafo))
+
+
+def select_sections(text: str, token_budget: int) -> str:
+    """
+    Mantém os trechos relevantes dentro do orçamento de tokens.
+
+    O cabeçalho (início do documento) e o último parágrafo (assinatura)
+    são sempre mantidos; os demais parágrafos entram por relevância
+    (solicitações, prazo, processo/autoridade, CPF/CNPJ) e, no empate, pela
+    posição, até esgotar o orçamento. A ordem original é preservada e trechos omitidos viram "[...]".
+
+    Args:
+        text: Texto normalizado
+        token_budget: Máximo de tokens
+
+    Returns:
+        Texto dentro do orçamento (o próprio texto se já couber)
+    """
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    paragrafos = _blocos(text, max(1, token_budget // 8))
+    tokens = [estimate_tokens(p) for p in paragrafos]
+
+    obrigatorios = set()
+    caracteres = 0
+    for indice, paragrafo in enumerate(paragrafos):
+        if caracteres >= HEADER_CHARS:
+            break
+        obrigatorios.add(indice)
+        caracteres += len(paragrafo)
+    obrigatorios.add(len(paragrafos) - 1)
+
+    selecionados = set()
+    usados = 0
+
+    candidatos = sorted(obrigatorios) + sorted(
+        (i for i in range(len(paragrafos)) if i not in obrigatorios),
+        key=lambda i: (-_relevancia(paragrafos[i]), i)
+    )
+
+    for indice in candidatos:
+        if usados + tokens[indice] > token_budget:
+            continue
+        selecionados.add(indice)
+        usados += tokens[indice]
+
+    partes = []
+    anterior = -1
+    for indice in sorted(selecionados):
+        if indice != anterior + 1:
+            partes.append(MARCADOR_OMISSAO)
+        partes.append(paragrafos[indice])
+        anterior = indice
+
+    if anterior != len(paragrafos) - 1:
+        partes.append(MARCADOR_OMISSAO)
+
+    return '\n\n'.join(partes)
+
+
+def compact_text(text: str, token_budget: Optional[int] = None) -> Dict[str, object]:
+    """
+    Prepara o texto do ofício para o LLM.
+
+    Args:
+        text: Texto extraído (camada de texto do PDF e/ou OCR)
+        token_budget: Máximo de tokens (padrão: LLM_INPUT_TOKEN_BUDGET)
+
+    Returns:
+        Dicionário com texto compactado, tokens_antes, tokens_depois e truncado
+        (True se trechos foram omitidos por orçamento)
+    """
+    token_budget = token_budget or LLM_INPUT_TOKEN_BUDGET
+    tokens_antes = estimate_tokens(text)
+
+    limpo = strip_repeated_lines(normalize_whitespace(text))
+    compactado = select_sections(limpo, token_budget)
+
+    return {
+        'texto': compactado,
+        'tokens_antes': tokens_antes,
+        'tokens_depois': estimate_tokens(compactado),
+        'truncado': compactado != limpo
+    }
+
@@ -0,0 +1,253 @@
+"""
+Rastreamento leve (spans) do pipeline de ofícios.
+
+Cada span mede a duração de uma etapa (OCR, LLM, validação, chamadas ao
+Firestore) e carrega atributos como tamanho do texto, páginas, tokens e
+leituras/escritas. Os spans terminados são:
+  - exportados via OpenTelemetry (TRACING_EXPORTER=otel, se instalado) ou
+    registrados como uma linha JSON no log (TRACING_EXPORTER=log, habilitado
+    no W1 e no worker); o padrão (none) não exporta;
+  - agregados no Rastro ativo, cujo resumo é gravado no documento do
+    ofício (metricas_processamento) para planejamento de capacidade.
+
+O Rastro ativo e o span atual ficam em contextvars: cada thread (ou
+estágio do worker) ativa o rastro do ofício que está processando.
+
+Uso:
+    rastro = Rastro(oficio_id=oficio_id, org_id=org_id)
+    with rastro.ativo():
+        with span('w1.ocr', arquivo=file_path) as s:
+            ...
+            s.set(caracteres=len(texto))
+    rastro.resumo()
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# otel | log | none (apenas o resumo do Rastro). Padrão none: as demais funções
+# também usam o FirestoreClient instrumentado e não devem logar cada chamada
+TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', 'none').lower()
+TRACING_SERVICE_NAME = os.getenv('TRACING_SERVICE_NAME', 'oficios-automation')
+
+_rastro_atual: contextvars.ContextVar[Optional['Rastro']] = contextvars.ContextVar('rastro_atual', default=None)
+_span_atual: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('span_atual', default=None)
+
+_TRACER_CACHE: Dict[str, Any] = {}
+_TRACER_LOCK = threading.Lock()
+
+
+def _tracer():
+    """Tracer do OpenTelemetry (None se desabilitado ou não instalado)."""
+    if TRACING_EXPORTER != 'otel':
+        return None
+
+    with _TRACER_LOCK:
+        if 'tracer' not in _TRACER_CACHE:
+            _TRACER_CACHE['tracer'] = _configurar_otel()
+
+    return _TRACER_CACHE['tracer']
+
+
+def _configurar_otel():
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logger.warning("TRACING_EXPORTER=otel, mas opentelemetry-api não está instalado: usando log JSON")
+        return None
+
+    # Sem provider configurado (ex: opentelemetry-instrument), exporta via OTLP se o SDK estiver instalado
+    if type(trace.get_tracer_provider()).__name__ == 'ProxyTracerProvider':
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+            provider = TracerProvider(resource=Resource.create({'service.name': TRACING_SERVICE_NAME}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            trace.set_tracer_provider(provider)
+        except ImportError:
+            logger.warning("opentelemetry-sdk/exporter OTLP não instalados: spans sem exportação")
+
+    return trace.get_tracer(__name__)
+
+
+class Span:
+    """Etapa medida: nome, atributos e duração."""
+
+    def __init__(self, nome: str, atributos: Dict[str, Any]):
+        self.nome = nome
+        self.atributos = dict(atributos)
+        self.duracao_ms: Optional[float] = None
+        self.status = 'ok'
+        self._otel = None
+
+    def set(self, **atributos: Any) -> None:
+        """Define atributos (tamanhos, tokens, contagens)."""
+        self.atributos.update(atributos)
+
+    def add(self, **contadores: float) -> None:
+        """Soma contadores (ex: leituras/escritas de várias chamadas)."""
+        for chave, valor in contadores.items():
+            self.atributos[chave] = self.atributos.get(chave, 0) + valor
+
+
+class Rastro:
+    """Agrega os spans do processamento de um ofício."""
+
+    def __init__(self, **atributos: Any):
+        """
+        Inicializa o rastro.
+
+        Args:
+            **atributos: Identificação incluída em todos os spans (ex: oficio_id, org_id)
+        """
+        self.atributos = atributos
+        self._inicio = time.monotonic()
+        self._etapas: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def ativo(self) -> Iterator['Rastro']:
+        """Torna este o rastro atual no contexto (thread) corrente."""
+        token = _rastro_atual.set(self)
+        try:
+            yield self
+        finally:
+            _rastro_atual.reset(token)
+
+    def registrar(self, span_terminado: Span) -> None:
+        """Agrega um span: chamadas e duração somadas; atributos numéricos somados."""
+        with self._lock:
+            etapa = self._etapas.setdefault(span_terminado.nome, {'chamadas': 0, 'duracao_ms': 0.0})
+            etapa['chamadas'] += 1
+            etapa['duracao_ms'] = round(etapa['duracao_ms'] + span_terminado.duracao_ms, 1)
+
+            if span_terminado.status != 'ok':
+                etapa['erros'] = etapa.get('erros', 0) + 1
+
+            for chave, valor in span_terminado.atributos.items():
+                if chave in self.atributos:
+                    continue
+                if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    etapa[chave] = etapa.get(chave, 0) + valor
+                elif isinstance(valor, (str, bool)) or valor is None:
+                    etapa[chave] = valor
+
+    def resumo(self) -> Dict[str, Any]:
+        """
+        Resumo para o documento do ofício.
+
+        Returns:
+            Dicionário com duracao_total_ms e etapas ({nome: {chamadas, duracao_ms, atributos}})
+        """
+        with self._lock:
+            return {
+                'duracao_total_ms': round((time.monotonic() - self._inicio) * 1000, 1),
+                'etapas': {nome: dict(etapa) for nome, etapa in self._etapas.items()}
+            }
+
+
+def rastro_atual() -> Optional[Rastro]:
+    """Rastro ativo no contexto corrente (None fora de um processamento)."""
+    return _rastro_atual.get()
+
+
+@contextlib.contextmanager
+def span(nome: str, **atributos: Any) -> Iterator[Span]:
+    """
+    Mede uma etapa.
+
+    Args:
+        nome: Nome da etapa (ex: w1.ocr, groq.extract_structured_data, firestore.update_oficio)
+        **atributos: Atributos iniciais (tamanhos, ids)
+
+    Yields:
+        Span, para definir atributos durante a etapa
+    """
+    rastro = _rastro_atual.get()
+    atual = Span(nome, {**(rastro.atributos if rastro else {}), **atributos})
+    token = _span_atual.set(atual)
+    tracer = _tracer()
+    inicio = time.perf_counter()
+
+    otel_cm = tracer.start_as_current_span(nome) if tracer is not None else contextlib.nullcontext()
+
+    with otel_cm as otel_span:
+        try:
+            yield atual
+        except BaseException as e:
+            atual.status = 'erro'
+            atual.set(erro=type(e).__name__)
+            raise
+        finally:
+            atual.duracao_ms = round((time.perf_counter() - inicio) * 1000, 1)
+            _span_atual.reset(token)
+
+            # otel sem tracer (opentelemetry não instalado) volta ao log JSON
+            if otel_span is not None:
+                _exportar_otel(otel_span, atual)
+            elif TRACING_EXPORTER in ('log', 'otel'):
+                _exportar_log(atual)
+
+            if rastro is not None:
+                rastro.registrar(atual)
+
+
+def _exportar_otel(otel_span: Any, terminado: Span) -> None:
+    for chave, valor in terminado.atributos.items():
+        if isinstance(valor, (str, bool, int, float)):
+            otel_span.set_attribute(chave, valor)
+    otel_span.set_attribute('duracao_ms', terminado.duracao_ms)
+
+    if terminado.status != 'ok':
+        from opentelemetry.trace import Status, StatusCode
+        otel_span.set_status(Status(StatusCode.ERROR))
+
+
+def _exportar_log(terminado: Span) -> None:
+    logger.info(json.dumps({
+        'span': terminado.nome,
+        'duracao_ms': terminado.duracao_ms,
+        'status': terminado.status,
+        **terminado.atributos
+    }, ensure_ascii=False, default=str))
+
+
+def anotar(**atributos: Any) -> None:
+    """Define atributos no span atual (sem efeito fora de um span)."""
+    atual = _span_atual.get()
+    if atual is not None:
+        atual.set(**atributos)
+
+
+def contar(**contadores: float) -> None:
+    """Soma contadores no span atual (sem efeito fora de um span)."""
+    atual = _span_atual.get()
+    if atual is not None:
+        atual.add(**contadores)
+
+
+def traced(nome: str) -> Callable:
+    """
+    Decorator que mede cada chamada da função como um span.
+
+    Args:
+        nome: Nome do span
+    """
+    def decorator(funcao: Callable) -> Callable:
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            with span(nome):
+                return funcao(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -2,91 +2,109 @@
 Módulo de validação de dados de ofícios.
 Funções auxiliares para validação de documentos e cálculos de prioridade.
 """
+import operator
 import re
 from datetime import datetime, timedelta
-from typing import Dict, Tuple
+from typing import Dict, Iterable, List, Tuple
 
 from .schema import OficioData
 
 
-def validar_cpf(cpf: str) -> bool:
-    """
-    Valida um CPF brasileiro usando o algoritmo de dígitos verificadores.
-    
-    Args:
-        cpf: String com o CPF (com ou sem formatação)
-        
-    Returns:
-        True se CPF válido, False caso contrário
-    """
-    # Remove caracteres não numéricos
-    cpf = re.sub(r'[^0-9]', '', cpf)
-    
-    # Verifica se tem 11 dígitos
-    if len(cpf) != 11:
+# Candidatos a documento em uma única varredura: CNPJ (mais longo) antes de CPF
+_DOCUMENTO_RE = re.compile(
+    r'\b(?:'
+    r'(?P<cnpj>\d{2}[.\s]?\d{3}[.\s]?\d{3}[-/.\s]?\d{4}[-.\s]?\d{2})'
+    r'|(?P<cpf>\d{3}[.\s]?\d{3}[.\s]?\d{3}[-.\s]?\d{2})'
+    r')\b'
+)
+
+# '0'..'9' -> bytes 0..9: o vetor de dígitos é indexado direto, sem int() por caractere
+_DIGITOS = {ord(str(d)): d for d in range(10)}
+_NAO_DIGITOS_RE = re.compile(r'[^0-9]')
+
+_PESOS_CPF_1 = (10, 9, 8, 7, 6, 5, 4, 3, 2)
+_PESOS_CPF_2 = (11, 10, 9, 8, 7, 6, 5, 4, 3, 2)
+_PESOS_CNPJ_1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_PESOS_CNPJ_2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+
+
+def _vetor_digitos(documento: str) -> bytes:
+    """Dígitos do documento como bytes 0..9 (sem a pontuação)."""
+    return _NAO_DIGITOS_RE.sub('', documento).translate(_DIGITOS).encode('latin-1')
+
+
+def _cpf_valido(d: bytes) -> bool:
+    if len(d) != 11 or d.count(d[0]) == 11:
         return False
     
-    # Verifica se todos os dígitos são iguais (CPF inválido)
-    if cpf == cpf[0] * 11:
+    # map para no fim dos pesos: soma os 9 (ou 10) primeiros dígitos sem fatiar o vetor
+    digito1 = sum(map(operator.mul, _PESOS_CPF_1, d)) * 10 % 11 % 10
+    if d[9] != digito1:
         return False
     
-    # Valida primeiro dígito verificador
-    soma = sum(int(cpf[i]) * (10 - i) for i in range(9))
-    digito1 = (soma * 10 % 11) % 10
-    
-    if int(cpf[9]) != digito1:
+    return d[10] == sum(map(operator.mul, _PESOS_CPF_2, d)) * 10 % 11 % 10
+
+
+def _cnpj_valido(d: bytes) -> bool:
+    if len(d) != 14 or d.count(d[0]) == 14:
         return False
     
-    # Valida segundo dígito verificador
-    soma = sum(int(cpf[i]) * (11 - i) for i in range(10))
-    digito2 = (soma * 10 % 11) % 10
-    
-    if int(cpf[10]) != digito2:
+    resto = sum(map(operator.mul, _PESOS_CNPJ_1, d)) % 11
+    if d[12] != (0 if resto < 2 else 11 - resto):
         return False
     
-    return True
+    resto = sum(map(operator.mul, _PESOS_CNPJ_2, d)) % 11
+    return d[13] == (0 if resto < 2 else 11 - resto)
+
+
+def validar_cpf(cpf: str) -> bool:
+    """
+    Valida um CPF brasileiro.
+    
+    Args:
+        cpf: String com o CPF (com ou sem formatação)
+        
+    Returns:
+        True se CPF válido
+    """
+    return _cpf_valido(_vetor_digitos(cpf))
 
 
 def validar_cnpj(cnpj: str) -> bool:
     """
-    Valida um CNPJ brasileiro usando o algoritmo de dígitos verificadores.
+    Valida um CNPJ brasileiro.
     
     Args:
         cnpj: String com o CNPJ (com ou sem formatação)
         
     Returns:
-        True se CNPJ válido, False caso contrário
+        True se CNPJ válido
     """
-    # Remove caracteres não numéricos
-    cnpj = re.sub(r'[^0-9]', '', cnpj)
-    
-    # Verifica se tem 14 dígitos
-    if len(cnpj) != 14:
-        return False
-    
-    # Verifica se todos os dígitos são iguais (CNPJ inválido)
-    if cnpj == cnpj[0] * 14:
-        return False
-    
-    # Valida primeiro dígito verificador
-    peso = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-    soma = sum(int(cnpj[i]) * peso[i] for i in range(12))
-    digito1 = (soma % 11)
-    digito1 = 0 if digito1 < 2 else 11 - digito1
-    
-    if int(cnpj[12]) != digito1:
-        return False
-    
-    # Valida segundo dígito verificador
-    peso = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-    soma = sum(int(cnpj[i]) * peso[i] for i in range(13))
-    digito2 = (soma % 11)
-    digito2 = 0 if digito2 < 2 else 11 - digito2
-    
-    if int(cnpj[13]) != digito2:
-        return False
-    
-    return True
+    return _cnpj_valido(_vetor_digitos(cnpj))
+
+
+def _novo_resultado() -> Dict[str, list]:
+    return {
+        'cpfs_validos': [],
+        'cpfs_invalidos': [],
+        'cnpjs_validos': [],
+        'cnpjs_invalidos': []
+    }
+
+
+def _varrer(texto: str, resultado: Dict[str, list], memo: Dict[Tuple[str, str], bool]) -> None:
+    """Uma passada do regex combinado; memo evita revalidar o mesmo documento."""
+    for match in _DOCUMENTO_RE.finditer(texto):
+        tipo = match.lastgroup
+        documento = match.group(tipo)
+    
+        valido = memo.get((tipo, documento))
+        if valido is None:
+            digitos = _vetor_digitos(documento)
+            valido = _cnpj_valido(digitos) if tipo == 'cnpj' else _cpf_valido(digitos)
+            memo[(tipo, documento)] = valido
+    
+        resultado[f"{tipo}s_validos" if valido else f"{tipo}s_invalidos"].append(documento)
 
 
 def extrair_e_validar_documentos(texto: str) -> Dict[str, list]:
@@ -99,33 +117,34 @@ def extrair_e_validar_documentos(texto: str) -> Dict[str, list]:
     Returns:
         Dicionário com listas de CPFs e CNPJs válidos e inválidos
     """
-    # Padrões regex para CPF e CNPJ
-    cpf_pattern = r'\b\d{3}[\.\s]?\d{3}[\.\s]?\d{3}[\-\.\s]?\d{2}\b'
-    cnpj_pattern = r'\b\d{2}[\.\s]?\d{3}[\.\s]?\d{3}[\-\/\.\s]?\d{4}[\-\.\s]?\d{2}\b'
+    resultado = _novo_resultado()
+    _varrer(texto or '', resultado, {})
     
-    cpfs_encontrados = re.findall(cpf_pattern, texto)
-    cnpjs_encontrados = re.findall(cnpj_pattern, texto)
+    return resultado
+
+
+def extrair_e_validar_documentos_em_lote(textos: Iterable[str]) -> List[Dict[str, list]]:
+    """
+    Encontra e valida CPFs e CNPJs em vários textos.
     
-    resultado = {
-        'cpfs_validos': [],
-        'cpfs_invalidos': [],
-        'cnpjs_validos': [],
-        'cnpjs_invalidos': []
-    }
+    Documentos repetidos entre os textos (ex: o mesmo CNPJ em todas as
+    páginas) são validados uma única vez.
     
-    for cpf in cpfs_encontrados:
-        if validar_cpf(cpf):
-            resultado['cpfs_validos'].append(cpf)
-        else:
-            resultado['cpfs_invalidos'].append(cpf)
+    Args:
+        textos: Textos a serem analisados
+        
+    Returns:
+        Um dicionário por texto, no formato de extrair_e_validar_documentos
+    """
+    memo: Dict[Tuple[str, str], bool] = {}
+    resultados = []
     
-    for cnpj in cnpjs_encontrados:
-        if validar_cnpj(cnpj):
-            resultado['cnpjs_validos'].append(cnpj)
-        else:
-            resultado['cnpjs_invalidos'].append(cnpj)
+    for texto in textos:
+        resultado = _novo_resultado()
+        _varrer(texto or '', resultado, memo)
+        resultados.append(resultado)
     
-    return resultado
+    return resultados
 
 
 def calcular_data_limite(data_recebimento: datetime, prazo_dias: int) -> str:
@@ -187,17 +206,15 @@ def validate_document_fields(data: OficioData) -> Tuple[bool, Dict[str, any]]:
         - is_valid: True se todas as validações passaram
         - informacoes_adicionais: Dict com documentos validados, data_limite_iso e prioridade
     """
-    # 1. Valida documentos no texto
-    documentos_validados = extrair_e_validar_documentos(data.raw_text)
-    
-    # Também verifica no nome da autoridade
-    docs_autoridade = extrair_e_validar_documentos(data.autoridade_nome)
-    
-    # Combina os resultados
-    for key in documentos_validados.keys():
-        documentos_validados[key].extend(docs_autoridade[key])
-        # Remove duplicatas
-        documentos_validados[key] = list(set(documentos_validados[key]))
+    # 1. Valida documentos no texto e no nome da autoridade (uma varredura por campo)
+    documentos_validados = _novo_resultado()
+    for resultado in extrair_e_validar_documentos_em_lote([data.raw_text, data.autoridade_nome]):
+        for key, documentos in resultado.items():
+            documentos_validados[key].extend(documentos)
+    
+    # Remove duplicatas mantendo a ordem de aparição
+    for key in documentos_validados:
+        documentos_validados[key] = list(dict.fromkeys(documentos_validados[key]))
     
     # Verifica se há documentos inválidos (warning, não bloqueia)
     tem_documentos_invalidos = (
@@ -0,0 +1,521 @@
+"""
+Índice vetorial em memória para a base de conhecimento (RAG).
+Mantém, por organização, uma matriz float32 contígua com linhas L2-normalizadas
+e um array paralelo de IDs de documentos.
+
+Backends disponíveis:
+- exact: busca exata (brute-force) por produto matriz-vetor
+- ivf: busca aproximada IVF-flat (k-means sobre as linhas + nprobe listas)
+"""
+import io
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BACKEND_EXACT = "exact"
+BACKEND_IVF = "ivf"
+
+
+def normalizar_vetor(vetor: Sequence[float]) -> np.ndarray:
+    """
+    Converte um vetor para float32 e normaliza pela norma L2.
+
+    Args:
+        vetor: Vetor de entrada
+
+    Returns:
+        Array float32 normalizado (vetor nulo é mantido como zeros)
+    """
+    arr = np.asarray(vetor, dtype=np.float32).ravel()
+    norma = float(np.linalg.norm(arr))
+
+    if norma == 0:
+        return arr
+
+    return arr / norma
+
+
+class ExactVectorIndex:
+    """
+    Índice exato (brute-force) por similaridade de cosseno.
+
+    As linhas da matriz são normalizadas na inserção, de modo que uma
+    consulta é um único produto matriz-vetor seguido de argpartition.
+    """
+
+    backend = BACKEND_EXACT
+
+    def __init__(self, dim: Optional[int] = None, version: int = 0):
+        """
+        Inicializa um índice vazio.
+
+        Args:
+            dim: Dimensão dos vetores (definida no primeiro add se None)
+            version: Carimbo de versão da base de conhecimento da organização
+        """
+        self.dim = dim
+        self.version = version
+        self._matrix = np.zeros((0, dim or 0), dtype=np.float32)
+        self._size = 0
+        self.doc_ids: List[str] = []
+        self.payloads: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Visão da matriz com as linhas ocupadas (n x dim)."""
+        return self._matrix[:self._size]
+
+    @classmethod
+    def build(
+        cls,
+        doc_ids: List[str],
+        embeddings: List[Sequence[float]],
+        payloads: List[Dict[str, Any]],
+        version: int = 0,
+        **params: Any
+    ) -> 'ExactVectorIndex':
+        """
+        Constrói o índice de uma só vez a partir de listas paralelas.
+
+        Args:
+            doc_ids: IDs dos documentos
+            embeddings: Vetores dos documentos
+            payloads: Dados retornados junto com cada resultado
+            version: Carimbo de versão
+            **params: Parâmetros específicos do backend
+
+        Returns:
+            Índice construído
+        """
+        index = cls(version=version, **params)
+
+        if not doc_ids:
+            return index
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        normas = np.linalg.norm(matrix, axis=1, keepdims=True)
+        normas[normas == 0] = 1.0
+
+        index.dim = matrix.shape[1]
+        index._matrix = np.ascontiguousarray(matrix / normas)
+        index._size = matrix.shape[0]
+        index.doc_ids = list(doc_ids)
+        index.payloads = list(payloads)
+        index._train()
+
+        return index
+
+    def _train(self) -> None:
+        """Gancho executado após build (backends aproximados treinam aqui)."""
+
+    def add(self, doc_id: str, embedding: Sequence[float], payload: Dict[str, Any]) -> None:
+        """
+        Adiciona um documento ao índice (capacidade cresce por duplicação).
+
+        Args:
+            doc_id: ID do documento
+            embedding: Vetor do documento
+            payload: Dados retornados junto com o resultado
+        """
+        vetor = normalizar_vetor(embedding)
+
+        if self.dim is None:
+            self.dim = len(vetor)
+            self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+
+        if len(vetor) != self.dim:
+            raise ValueError(
+                f"Dimensão do embedding ({len(vetor)}) difere da dimensão do índice ({self.dim})"
+            )
+
+        if self._size == self._matrix.shape[0]:
+            nova_capacidade = max(16, self._matrix.shape[0] * 2)
+            novo = np.zeros((nova_capacidade, self.dim), dtype=np.float32)
+            novo[:self._size] = self._matrix[:self._size]
+            self._matrix = novo
+
+        self._matrix[self._size] = vetor
+        self._size += 1
+        self.doc_ids.append(doc_id)
+        self.payloads.append(payload)
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        top_k: int,
+        min_similarity: float = 0.0,
+        mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Busca os top_k vizinhos mais similares.
+
+        Args:
+            query_embedding: Vetor da query
+            top_k: Número de resultados
+            min_similarity: Similaridade mínima (0-1)
+            mask: Máscara booleana por posição; apenas posições True são pontuadas
+
+        Returns:
+            Lista de (posição no índice, similaridade) em ordem decrescente
+        """
+        if self._size == 0 or top_k <= 0:
+            return []
+
+        query = self._check_query(query_embedding)
+
+        if mask is not None:
+            return self._search_positions(np.flatnonzero(mask[:self._size]), query, top_k, min_similarity)
+
+        return _top_k(np.arange(self._size), self.matrix @ query, top_k, min_similarity)
+
+    def _check_query(self, query_embedding: Sequence[float]) -> np.ndarray:
+        """Normaliza a query e valida a dimensão."""
+        query = normalizar_vetor(query_embedding)
+
+        if len(query) != self.dim:
+            raise ValueError(
+                f"Dimensão da query ({len(query)}) difere da dimensão do índice ({self.dim})"
+            )
+
+        return query
+
+    def _search_positions(
+        self,
+        positions: np.ndarray,
+        query: np.ndarray,
+        top_k: int,
+        min_similarity: float
+    ) -> List[Tuple[int, float]]:
+        """Pontua exatamente apenas as posições indicadas."""
+        if positions.size == 0:
+            return []
+
+        return _top_k(positions, self._matrix[positions] @ query, top_k, min_similarity)
+
+    def similarities(self, query_embedding: Sequence[float], positions: Sequence[int]) -> np.ndarray:
+        """
+        Calcula a similaridade da query com posições específicas do índice.
+
+        Args:
+            query_embedding: Vetor da query
+            positions: Posições no índice
+
+        Returns:
+            Similaridades na ordem das posições
+        """
+        query = normalizar_vetor(query_embedding)
+
+        return self.matrix[np.asarray(positions, dtype=np.int64)] @ query
+
+    def _params(self) -> Dict[str, Any]:
+        """Parâmetros do backend persistidos junto com o índice."""
+        return {}
+
+    def _extra_arrays(self) -> Dict[str, np.ndarray]:
+        """Arrays adicionais persistidos pelo backend."""
+        return {}
+
+    def _load_extra_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        """Restaura os arrays adicionais do backend."""
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializa o índice (formato .npz, sem pickle).
+
+        Returns:
+            Conteúdo binário do índice
+        """
+        meta = {
+            'backend': self.backend,
+            'version': self.version,
+            'dim': self.dim,
+            'params': self._params(),
+            'doc_ids': self.doc_ids,
+            'payloads': self.payloads
+        }
+        meta_bytes = json.dumps(meta, ensure_ascii=False, default=str).encode('utf-8')
+
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            matrix=self.matrix,
+            meta=np.frombuffer(meta_bytes, dtype=np.uint8),
+            **self._extra_arrays()
+        )
+
+        return buffer.getvalue()
+
+
+class IVFFlatIndex(ExactVectorIndex):
+    """
+    Índice aproximado IVF-flat.
+
+    As linhas são particionadas em nlist grupos por k-means esférico; a
+    consulta compara a query com os centróides e pontua exatamente apenas
+    as nprobe listas mais próximas. Quanto maior nprobe, maior o recall@k
+    (nprobe == nlist equivale à busca exata).
+    """
+
+    backend = BACKEND_IVF
+
+    def __init__(
+        self,
+        dim: Optional[int] = None,
+        version: int = 0,
+        nlist: int = 64,
+        nprobe: int = 8,
+        kmeans_iter: int = 10,
+        seed: int = 0
+    ):
+        """
+        Inicializa um índice IVF vazio.
+
+        Args:
+            dim: Dimensão dos vetores
+            version: Carimbo de versão
+            nlist: Número de listas (centróides)
+            nprobe: Número de listas visitadas por consulta
+            kmeans_iter: Iterações do k-means no treino
+            seed: Semente para inicialização dos centróides
+        """
+        super().__init__(dim=dim, version=version)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.kmeans_iter = kmeans_iter
+        self.seed = seed
+        self.centroids = np.zeros((0, dim or 0), dtype=np.float32)
+        self._lists: List[np.ndarray] = []
+
+    def _train(self) -> None:
+        """Treina os centróides por k-means esférico e monta as listas."""
+        n = self._size
+        k = min(self.nlist, n)
+
+        if k == 0:
+            return
+
+        matrix = self.matrix
+        rng = np.random.default_rng(self.seed)
+        centroids = matrix[rng.choice(n, size=k, replace=False)].copy()
+
+        for _ in range(self.kmeans_iter):
+            assign = self._assign(centroids)
+            counts = np.bincount(assign, minlength=k)
+            order = np.argsort(assign, kind='stable')
+            starts = np.cumsum(counts) - counts
+            ocupados = counts > 0
+
+            sums = np.zeros_like(centroids)
+            sums[ocupados] = np.add.reduceat(matrix[order], starts[ocupados], axis=0)
+
+            vazios = ~ocupados
+            if vazios.any():
+                # Reinicia grupos vazios com linhas aleatórias
+                sums[vazios] = matrix[rng.choice(n, size=int(vazios.sum()))]
+
+            normas = np.linalg.norm(sums, axis=1, keepdims=True)
+            normas[normas == 0] = 1.0
+            centroids = (sums / normas).astype(np.float32)
+
+        self.centroids = centroids
+        self._build_lists(self._assign(centroids))
+
+    def _assign(self, centroids: np.ndarray, block: int = 4096) -> np.ndarray:
+        """Atribui cada linha ao centróide mais similar (em blocos)."""
+        matrix = self.matrix
+        assign = np.empty(self._size, dtype=np.int64)
+
+        for start in range(0, self._size, block):
+            end = min(start + block, self._size)
+            assign[start:end] = np.argmax(matrix[start:end] @ centroids.T, axis=1)
+
+        return assign
+
+    def _build_lists(self, assign: np.ndarray) -> None:
+        """Agrupa as posições por centróide."""
+        order = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=len(self.centroids))
+        self._lists = np.split(order, np.cumsum(counts)[:-1])
+
+    def add(self, doc_id: str, embedding: Sequence[float], payload: Dict[str, Any]) -> None:
+        """
+        Adiciona um documento à lista do centróide mais próximo.
+
+        Os centróides não são re-treinados; o índice é reconstruído quando
+        a versão da base muda por escrita de outra instância.
+        """
+        super().add(doc_id, embedding, payload)
+
+        if len(self.centroids) == 0:
+            return
+
+        pos = self._size - 1
+        lista = int(np.argmax(self.centroids @ self._matrix[pos]))
+        self._lists[lista] = np.append(self._lists[lista], pos)
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        top_k: int,
+        min_similarity: float = 0.0,
+        mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Busca aproximada visitando as nprobe listas mais próximas.
+
+        Com máscara, os candidatos das listas são filtrados antes da
+        pontuação; se o conjunto filtrado for menor que os candidatos, ele
+        é pontuado exatamente (filtros seletivos não perdem recall).
+
+        Args:
+            query_embedding: Vetor da query
+            top_k: Número de resultados
+            min_similarity: Similaridade mínima (0-1)
+            mask: Máscara booleana por posição; apenas posições True são pontuadas
+
+        Returns:
+            Lista de (posição no índice, similaridade) em ordem decrescente
+        """
+        if len(self.centroids) == 0:
+            return super().search(query_embedding, top_k, min_similarity, mask)
+
+        if self._size == 0 or top_k <= 0:
+            return []
+
+        query = self._check_query(query_embedding)
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        candidatos = np.concatenate([self._lists[p] for p in probes])
+
+        if mask is not None:
+            mask = mask[:self._size]
+            permitidos = int(np.count_nonzero(mask))
+
+            if permitidos <= candidatos.size:
+                return self._search_positions(np.flatnonzero(mask), query, top_k, min_similarity)
+
+            candidatos = candidatos[mask[candidatos]]
+
+        return self._search_positions(candidatos, query, top_k, min_similarity)
+
+    def _params(self) -> Dict[str, Any]:
+        return {
+            'nlist': self.nlist,
+            'nprobe': self.nprobe,
+            'kmeans_iter': self.kmeans_iter,
+            'seed': self.seed
+        }
+
+    def _extra_arrays(self) -> Dict[str, np.ndarray]:
+        sizes = np.array([len(lista) for lista in self._lists], dtype=np.int64)
+        members = np.concatenate(self._lists) if self._lists else np.zeros(0, dtype=np.int64)
+
+        return {
+            'centroids': self.centroids,
+            'list_sizes': sizes,
+            'list_members': members
+        }
+
+    def _load_extra_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        self.centroids = np.ascontiguousarray(arrays['centroids'], dtype=np.float32)
+        sizes = arrays['list_sizes']
+        self._lists = np.split(arrays['list_members'].astype(np.int64), np.cumsum(sizes)[:-1]) if len(sizes) else []
+
+
+INDEX_BACKENDS = {
+    BACKEND_EXACT: ExactVectorIndex,
+    BACKEND_IVF: IVFFlatIndex,
+}
+
+
+def _top_k(
+    posicoes: np.ndarray,
+    scores: np.ndarray,
+    top_k: int,
+    min_similarity: float
+) -> List[Tuple[int, float]]:
+    """
+    Seleciona os top_k scores (argpartition) e filtra por similaridade mínima.
+
+    Args:
+        posicoes: Posições no índice correspondentes a cada score
+        scores: Similaridades
+        top_k: Número de resultados
+        min_similarity: Similaridade mínima
+
+    Returns:
+        Lista de (posição, similaridade) em ordem decrescente
+    """
+    if top_k < len(scores):
+        melhores = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        melhores = np.arange(len(scores))
+
+    melhores = melhores[np.argsort(-scores[melhores], kind='stable')]
+
+    return [
+        (int(posicoes[i]), float(scores[i]))
+        for i in melhores
+        if scores[i] >= min_similarity
+    ]
+
+
+def build_index(
+    backend: str,
+    doc_ids: List[str],
+    embeddings: List[Sequence[float]],
+    payloads: List[Dict[str, Any]],
+    version: int = 0,
+    **params: Any
+) -> ExactVectorIndex:
+    """
+    Constrói um índice do backend indicado.
+
+    Args:
+        backend: 'exact' ou 'ivf'
+        doc_ids: IDs dos documentos
+        embeddings: Vetores dos documentos
+        payloads: Dados retornados junto com cada resultado
+        version: Carimbo de versão
+        **params: Parâmetros do backend (ex: nlist, nprobe)
+
+    Returns:
+        Índice construído
+    """
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Backend de índice desconhecido: {backend}")
+
+    return INDEX_BACKENDS[backend].build(doc_ids, embeddings, payloads, version=version, **params)
+
+
+def load_index(data: bytes) -> ExactVectorIndex:
+    """
+    Restaura um índice serializado por to_bytes.
+
+    Args:
+        data: Conteúdo binário do índice
+
+    Returns:
+        Índice restaurado (backend conforme metadados)
+    """
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        arrays = {name: arrays[name] for name in arrays.files}
+
+    meta = json.loads(arrays.pop('meta').tobytes().decode('utf-8'))
+    cls = INDEX_BACKENDS[meta['backend']]
+
+    index = cls(dim=meta['dim'], version=meta['version'], **meta['params'])
+    index._matrix = np.ascontiguousarray(arrays.pop('matrix'), dtype=np.float32)
+    index._size = index._matrix.shape[0]
+    index.doc_ids = meta['doc_ids']
+    index.payloads = meta['payloads']
+    index._load_extra_arrays(arrays)
+
+    return index